@@ -1,5 +1,14 @@
-from django.contrib import admin
-from .models import Department, Employee, Asset, AssetTransaction
+import zipfile
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
+
+from .face_batch import collect_face_photos, register_faces_in_bulk
+from .face_embeddings import delete_employee_face_encoding
+from .models import Department, Employee, FaceEmbedding, Asset, AssetTransaction
 
 @admin.register(Department)
 class DepartmentAdmin(admin.ModelAdmin):
@@ -15,12 +24,90 @@ class DepartmentAdmin(admin.ModelAdmin):
         return obj.assets.count()
     asset_count.short_description = 'Assets'
 
+class FaceEmbeddingInline(admin.TabularInline):
+    model = FaceEmbedding
+    fields = ('quality_score', 'created_at')
+    readonly_fields = ('quality_score', 'created_at')
+    extra = 0
+    can_delete = True
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+class FaceBatchUploadForm(forms.Form):
+    archive = forms.FileField(
+        help_text='Zip of photos named after employee IDs: E1001.jpg, E1001_2.jpg or E1001/front.jpg'
+    )
+    skip_registered = forms.BooleanField(
+        required=False, help_text='Leave employees who already have face data alone'
+    )
+
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
     list_display = ('name', 'employee_id', 'department', 'phone_number', 'is_active', 'created_at')
     list_filter = ('department', 'is_active', 'created_at')
     search_fields = ('user__first_name', 'user__last_name', 'employee_id', 'user__email')
     readonly_fields = ('created_at', 'updated_at')
+    inlines = [FaceEmbeddingInline]
+    actions = ['register_faces_from_photos']
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not FaceEmbedding:
+            return super().save_formset(request, form, formset, change)
+        # Deleting a template also updates (or clears) the employee's face data
+        formset.save(commit=False)
+        for embedding in formset.deleted_objects:
+            delete_employee_face_encoding(form.instance, embedding.pk)
+
+    @admin.action(description='Register faces from a zip of photos')
+    def register_faces_from_photos(self, request, queryset):
+        """Bulk registration (see face_batch) limited to the selected employees"""
+        # Photos are encoded within the request: larger batches go through
+        # `manage.py register_faces`
+        limit = getattr(settings, 'FACE_ADMIN_REGISTRATION_LIMIT', 50)
+        if queryset.count() > limit:
+            self.message_user(
+                request,
+                f'Select at most {limit} employees, or register larger batches with '
+                f'`manage.py register_faces`',
+                messages.ERROR,
+            )
+            return None
+
+        result = None
+        if 'apply' in request.POST:
+            form = FaceBatchUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                try:
+                    photos = collect_face_photos(form.cleaned_data['archive'])
+                except zipfile.BadZipFile:
+                    form.add_error('archive', 'Not a valid zip file')
+                else:
+                    result = register_faces_in_bulk(
+                        photos,
+                        employees=queryset.filter(is_active=True),
+                        workers=getattr(settings, 'FACE_WORKER_PROCESSES', 0),
+                        skip_registered=form.cleaned_data['skip_registered'],
+                    )
+                    failed = sum(row['status'] == 'failed' for row in result['employees'])
+                    self.message_user(
+                        request,
+                        f"{result['registered']} employees registered, {failed} failed, "
+                        f"{len(result['unmatched'])} photos unmatched",
+                        messages.WARNING if failed or result['unmatched'] else messages.SUCCESS,
+                    )
+        else:
+            form = FaceBatchUploadForm()
+
+        return TemplateResponse(request, 'admin/assets/employee/register_faces.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Register faces from photos',
+            'opts': self.model._meta,
+            'queryset': queryset,
+            'form': form,
+            'result': result,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
 
 @admin.register(Asset)
 class AssetAdmin(admin.ModelAdmin):
@@ -1,6 +1,33 @@
+import multiprocessing
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AssetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.assets'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+    def start_face_recognition_warmup(self):
+        """
+        Load the face recognition models in the background when
+        FACE_RECOGNITION_WARMUP is on. Called by the server entry points
+        (config/wsgi.py, config/asgi.py), not ready(), so management commands,
+        tests and shells do not pay for it.
+        """
+        # Face worker processes load the models in their own initializer
+        is_face_worker = multiprocessing.parent_process() is not None
+        if getattr(settings, 'FACE_RECOGNITION_WARMUP', False) and not is_face_worker:
+            from .face_recognition_service import warm_up_face_recognition_service
+
+            # In the background so start-up is not blocked; an early request
+            # simply waits on the same model loading
+            threading.Thread(
+                target=warm_up_face_recognition_service,
+                name='face-recognition-warmup',
+                daemon=True,
+            ).start()
@@ -0,0 +1,336 @@
+"""
+Dashboard payloads, each built from a handful of aggregate queries.
+
+Every count the dashboard shows comes from conditional aggregation
+(Count(..., filter=Q(...))) over one table per query, and the weekly and
+monthly trends from a single group-by each, instead of one COUNT per status,
+day and month. Transaction totals and trends are summed from
+DailyTransactionRollup (see rollups.py), so they cost the same however long
+the transaction history gets; only the rolling last-day / last-week windows
+read AssetTransaction, through its transaction_date index.
+
+The payloads are cached (cached_dashboard_payload) until a write to an asset,
+transaction, employee or department invalidates them (see signals.py), or
+DASHBOARD_CACHE_TIMEOUT passes, which bounds how stale the rolling windows get.
+"""
+import hashlib
+import json
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.http import quote_etag
+
+from .models import Asset, AssetTransaction, DailyTransactionRollup, Department, Employee
+
+ASSET_STATUSES = ("assigned", "available", "maintenance", "retired")
+
+
+def asset_totals(since=None) -> Dict:
+    """Asset count, count per status and total purchase cost (+ created since ``since``)"""
+    aggregates = {
+        "total": Count("id"),
+        "total_value": Sum("purchase_cost"),
+        **{status: Count("id", filter=Q(status=status)) for status in ASSET_STATUSES},
+    }
+    if since is not None:
+        aggregates["created_since"] = Count("id", filter=Q(created_at__gte=since))
+    return Asset.objects.aggregate(**aggregates)
+
+
+def employee_totals(since=None) -> Dict:
+    """Active employees (+ employees created since ``since``)"""
+    aggregates = {"active": Count("id", filter=Q(is_active=True))}
+    if since is not None:
+        aggregates["created_since"] = Count("id", filter=Q(created_at__gte=since))
+    return Employee.objects.aggregate(**aggregates)
+
+
+def transaction_totals(week_ago, day_ago) -> Dict:
+    totals = DailyTransactionRollup.objects.aggregate(
+        total=Sum("count"),
+        verified=Sum("count", filter=Q(face_verified=True)),
+    )
+    recent = AssetTransaction.objects.filter(transaction_date__gte=week_ago).aggregate(
+        last_week=Count("id"),
+        issues_last_day=Count(
+            "id", filter=Q(transaction_date__gte=day_ago, transaction_type="issue")
+        ),
+        returns_last_day=Count(
+            "id", filter=Q(transaction_date__gte=day_ago, transaction_type="return")
+        ),
+    )
+    return {key: value or 0 for key, value in {**totals, **recent}.items()}
+
+
+def _issue_return_counts():
+    return {
+        "issues": Sum("count", filter=Q(transaction_type="issue")),
+        "returns": Sum("count", filter=Q(transaction_type="return")),
+    }
+
+
+def _issue_return_counts_by_id(condition=Q()):
+    return {
+        "issues": Count("id", filter=condition & Q(transaction_type="issue")),
+        "returns": Count("id", filter=condition & Q(transaction_type="return")),
+    }
+
+
+def daily_transaction_counts(days: int = 7) -> List[Dict]:
+    """Issues and returns per day for the last ``days`` days, oldest first"""
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    rows = (
+        DailyTransactionRollup.objects.filter(date__gte=start)
+        .values("date")
+        .annotate(**_issue_return_counts())
+        .order_by()
+    )
+    counts = {row["date"]: row for row in rows}
+
+    daily = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = counts.get(day, {})
+        daily.append(
+            {
+                "date": day.strftime("%Y-%m-%d"),
+                "label": day.strftime("%a"),
+                "issues": row.get("issues") or 0,
+                "returns": row.get("returns") or 0,
+            }
+        )
+    return daily
+
+
+def monthly_transaction_counts(year: int) -> List[Dict]:
+    """Issues and returns for each month of ``year``"""
+    rows = (
+        DailyTransactionRollup.objects.filter(date__year=year)
+        .annotate(month=TruncMonth("date"))
+        .values("month")
+        .annotate(**_issue_return_counts())
+        .order_by()
+    )
+    counts = {row["month"].month: row for row in rows}
+
+    return [
+        {
+            "month": month,
+            "month_name": date(year, month, 1).strftime("%b"),
+            "issues": counts.get(month, {}).get("issues") or 0,
+            "returns": counts.get(month, {}).get("returns") or 0,
+        }
+        for month in range(1, 13)
+    ]
+
+
+def employee_transaction_counts(employee, now=None) -> Dict:
+    """
+    Transaction counts of one employee: totals by type, face verified, last 30
+    days and the six trend windows of employee_stats_view, in one query over the
+    employee's transactions (the rollup has no per-employee dimension).
+    """
+    now = now or timezone.now()
+    month_start = now.replace(day=1)
+    windows = []
+    for i in range(6):
+        start = month_start - timedelta(days=30 * i)
+        end = month_start - timedelta(days=30 * (i - 1)) if i < 5 else now
+        windows.insert(0, (start, Q(transaction_date__gte=start, transaction_date__lt=end)))
+
+    aggregates = {
+        "total": Count("id"),
+        **_issue_return_counts_by_id(),
+        "verified": Count("id", filter=Q(face_verification_success=True)),
+        "recent": Count("id", filter=Q(transaction_date__gte=now - timedelta(days=30))),
+    }
+    for index, (_start, window) in enumerate(windows):
+        aggregates[f"window_{index}"] = Count("id", filter=window)
+        for key, count in _issue_return_counts_by_id(window).items():
+            aggregates[f"window_{index}_{key}"] = count
+    counts = AssetTransaction.objects.filter(employee=employee).aggregate(**aggregates)
+
+    counts["monthly_trends"] = [
+        {
+            "month": start.strftime("%Y-%m"),
+            "month_name": start.strftime("%b %Y"),
+            "total_transactions": counts.pop(f"window_{index}"),
+            "issues": counts.pop(f"window_{index}_issues"),
+            "returns": counts.pop(f"window_{index}_returns"),
+        }
+        for index, (start, _window) in enumerate(windows)
+    ]
+    return counts
+
+
+def department_distribution() -> List[Dict]:
+    """Active employees and assets of every department, by name"""
+    return list(
+        Department.objects.annotate(
+            employee_count=Count(
+                "employees", filter=Q(employees__is_active=True), distinct=True
+            ),
+            asset_count=Count("assets", distinct=True),
+        )
+        .values("name", "employee_count", "asset_count")
+        .order_by("name")
+    )
+
+
+def build_dashboard_stats() -> Dict:
+    """Payload of dashboard_stats_view"""
+    now = timezone.now()
+    yesterday = now - timedelta(days=1)
+
+    assets = asset_totals(since=yesterday)
+    employees = employee_totals(since=yesterday)
+    transactions = transaction_totals(week_ago=now - timedelta(days=7), day_ago=yesterday)
+    departments = department_distribution()
+    weekly_data = [
+        {key: day[key] for key in ("date", "issues", "returns")}
+        for day in daily_transaction_counts(7)
+    ]
+
+    total_employees = employees["active"]
+    total_assets = assets["total"]
+    total_departments = len(departments)
+    assets_assigned = assets["assigned"]
+
+    verification_rate = 0
+    if transactions["total"] > 0:
+        verification_rate = round((transactions["verified"] / transactions["total"]) * 100, 2)
+
+    return {
+        # Basic counts
+        "total_employees": total_employees,
+        "total_assets": total_assets,
+        "total_departments": total_departments,
+        # Asset status
+        "assets_assigned": assets_assigned,
+        "assets_available": assets["available"],
+        "assets_maintenance": assets["maintenance"],
+        "assets_retired": assets["retired"],
+        # Transactions
+        "recent_transactions": transactions["last_week"],
+        "total_transactions": transactions["total"],
+        # Time-based data
+        "weekly_data": weekly_data,
+        "monthly_data": monthly_transaction_counts(now.year),
+        # Department data
+        "department_distribution": departments,
+        # Value and verification stats
+        "total_asset_value": float(assets["total_value"] or 0),
+        "verification_rate": verification_rate,
+        "successful_verifications": transactions["verified"],
+        # Recent activity (last 24 hours)
+        "recent_activity": {
+            "new_employees": employees["created_since"],
+            "new_assets": assets["created_since"],
+            "recent_issues": transactions["issues_last_day"],
+            "recent_returns": transactions["returns_last_day"],
+        },
+        # Computed metrics
+        "asset_utilization_rate": round(
+            (assets_assigned / total_assets * 100) if total_assets > 0 else 0, 2
+        ),
+        "average_assets_per_department": round(
+            total_assets / total_departments if total_departments > 0 else 0, 2
+        ),
+        "average_assets_per_employee": round(
+            assets_assigned / total_employees if total_employees > 0 else 0, 2
+        ),
+    }
+
+
+def build_dashboard_summary() -> Dict:
+    """Payload of dashboard_summary_view"""
+    now = timezone.now()
+    assets = asset_totals()
+    return {
+        "employees": employee_totals()["active"],
+        "assets": assets["total"],
+        "departments": Department.objects.count(),
+        "recent_transactions": AssetTransaction.objects.filter(
+            transaction_date__gte=now - timedelta(days=7)
+        ).count(),
+        "assets_assigned": assets["assigned"],
+        "timestamp": now.isoformat(),
+    }
+
+
+def build_dashboard_charts() -> Dict:
+    """Payload of dashboard_charts_data_view"""
+    assets = asset_totals()
+    departments = (
+        Department.objects.annotate(asset_count=Count("assets", distinct=True))
+        .values("name", "asset_count")
+        .filter(asset_count__gt=0)
+        .order_by("name")
+    )
+    return {
+        "asset_status": {
+            "labels": [status.capitalize() for status in ASSET_STATUSES],
+            "values": [assets[status] for status in ASSET_STATUSES],
+        },
+        "weekly_transactions": daily_transaction_counts(7),
+        "department_assets": {
+            "labels": [department["name"] for department in departments],
+            "values": [department["asset_count"] for department in departments],
+        },
+    }
+
+
+DASHBOARD_PAYLOADS = {
+    "stats": build_dashboard_stats,
+    "summary": build_dashboard_summary,
+    "charts": build_dashboard_charts,
+}
+DASHBOARD_GENERATION_KEY = "dashboard:generation"
+
+
+def _dashboard_generation() -> int:
+    generation = cache.get(DASHBOARD_GENERATION_KEY)
+    if generation is None:
+        # Seeded from the clock rather than 1, so a generation key that was
+        # evicted never comes back with a number payloads were cached under
+        cache.add(DASHBOARD_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(DASHBOARD_GENERATION_KEY)
+    return generation
+
+
+def cached_dashboard_payload(name: str) -> Tuple[Dict, str]:
+    """
+    Payload ``name`` (see DASHBOARD_PAYLOADS) and its ETag, built at most once
+    per generation and DASHBOARD_CACHE_TIMEOUT
+    """
+    key = f"dashboard:{name}"
+    generation = _dashboard_generation()
+    cached = cache.get(key, version=generation)
+    if cached is None:
+        payload = DASHBOARD_PAYLOADS[name]()
+        digest = hashlib.md5(
+            json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder).encode()
+        ).hexdigest()
+        cached = (payload, quote_etag(digest))
+        cache.set(key, cached, settings.DASHBOARD_CACHE_TIMEOUT, version=generation)
+    return cached
+
+
+def invalidate_dashboard_cache():
+    """
+    Start a new generation, so payloads cached before it (including ones still
+    being built from data read before the write) are never served again
+    """
+    try:
+        cache.incr(DASHBOARD_GENERATION_KEY)
+    except ValueError:
+        # Not set yet or evicted
+        cache.set(DASHBOARD_GENERATION_KEY, time.time_ns(), timeout=None)
@@ -0,0 +1,385 @@
+"""
+Bulk face registration for onboarding many employees at once.
+
+Photos come from a directory or a zip archive and are matched to employees
+by Employee.employee_id, taken from the file name or the folder holding it:
+
+    E1001.jpg                       one photo
+    E1002_front.jpg, E1002-2.jpg    several photos, prefix up to "_" or "-"
+    E1003/front.jpg, E1003/side.jpg several photos in a folder per employee
+
+Photos go through the same checks as the registration endpoint (pre-check,
+detection and encoding, quality thresholds) with the encoding spread over a
+pool of worker processes. Each employee's accepted photos - best quality
+first, at most FACE_MAX_TEMPLATES, all matching the best one - replace their
+enrolled templates in a single bulk write.
+
+The same machinery re-encodes stored templates from their retained
+enrollment photos after an encoder change (reencode_face_templates).
+"""
+import logging
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .face_embeddings import (
+    current_face_embeddings,
+    current_face_encoder,
+    face_encoding_cache,
+    pack_face_encoding,
+    read_enrollment_image,
+    store_face_encodings_bulk,
+)
+from .face_index import schedule_face_index_refresh
+from .face_recognition_service import get_face_recognition_service
+from .face_worker import _initialize_worker, encode_face_in_worker
+from .models import Employee, FaceEmbedding
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# employee_id is [A-Z0-9]{1,20}, so anything after one of these is a photo label
+_LABEL_SEPARATOR = re.compile(r"[_\-\s.]")
+
+# Photo = (path inside the source, image bytes)
+Photo = Tuple[str, bytes]
+
+
+def collect_face_photos(source) -> List[Photo]:
+    """
+    Read the photos of a directory, a zip file path or an uploaded zip file
+
+    Hidden files and zip metadata (e.g. __MACOSX/) are skipped.
+    """
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        photos = []
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if _is_photo(name):
+                    path = os.path.join(root, name)
+                    with open(path, "rb") as f:
+                        photos.append((os.path.relpath(path, source), f.read()))
+        return photos
+
+    with zipfile.ZipFile(source) as archive:
+        return [
+            (info.filename, archive.read(info))
+            for info in sorted(archive.infolist(), key=lambda info: info.filename)
+            if not info.is_dir()
+            and not info.filename.startswith("__MACOSX/")
+            and _is_photo(os.path.basename(info.filename))
+        ]
+
+
+def _is_photo(name: str) -> bool:
+    return not name.startswith(".") and name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def match_photos_to_employees(photos: List[Photo], employee_ids) -> Tuple[Dict[str, List[Photo]], List[str]]:
+    """
+    Group photos by employee_id
+
+    Returns:
+        ({employee_id: [photo, ...]}, paths of photos matching no employee)
+    """
+    employee_ids = set(employee_ids)
+    matched = {}
+    unmatched = []
+    for photo in photos:
+        path = photo[0].replace("\\", "/")
+        stem = os.path.splitext(os.path.basename(path))[0].upper()
+        folder = os.path.basename(os.path.dirname(path)).upper()
+        for candidate in (stem, _LABEL_SEPARATOR.split(stem)[0], folder):
+            if candidate in employee_ids:
+                matched.setdefault(candidate, []).append(photo)
+                break
+        else:
+            unmatched.append(photo[0])
+    return matched, unmatched
+
+
+def face_batch_executor(workers: int) -> Optional[ProcessPoolExecutor]:
+    """
+    Process pool for encoding a batch, set up like the request-time pool
+    (face_worker); None for ``workers`` <= 1, which encodes in this process
+    """
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_initialize_worker,
+    )
+
+
+def encode_images(images: List[bytes], executor: Optional[ProcessPoolExecutor] = None) -> List[Optional[Dict]]:
+    """Face data (or None) for each image, spread over ``executor`` if given"""
+    if executor is None or len(images) < 2:
+        service = get_face_recognition_service()
+        return [service.encode_face_from_base64(image) for image in images]
+    encoded = executor.map(encode_face_in_worker, images, chunksize=4)
+    return [face_data for face_data, _timings in encoded]
+
+
+def validate_face_photos(images: List[bytes], workers: int = 1) -> List[Dict]:
+    """
+    Quality-validate and encode each image like the registration endpoint
+
+    Returns:
+        One validate_face_data result per image; valid ones carry face_data
+    """
+    service = get_face_recognition_service()
+
+    # The pre-check is cheap: run it here so unusable photos never reach a worker
+    results = [service.precheck_image(image) for image in images]
+    pending = [i for i, result in enumerate(results) if result is None]
+
+    executor = face_batch_executor(min(workers, len(pending)))
+    try:
+        face_data = encode_images([images[i] for i in pending], executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for i, data in zip(pending, face_data):
+        results[i] = service.validate_face_data(data)
+    return results
+
+
+def register_faces_in_bulk(
+    photos: List[Photo],
+    employees=None,
+    workers: int = 1,
+    skip_registered: bool = False,
+    dry_run: bool = False,
+) -> Dict:
+    """
+    Register faces for many employees from their photos
+
+    Args:
+        photos: From collect_face_photos
+        employees: Employees that may be registered (default: all active)
+        workers: Processes to encode photos with
+        skip_registered: Leave employees who already have face data alone
+        dry_run: Validate and report without writing anything
+
+    Returns:
+        {"employees": [per-employee report row], "unmatched": [photo paths],
+         "registered": count, "templates": count}
+    """
+    if employees is None:
+        employees = Employee.objects.filter(is_active=True)
+    employees = {
+        employee.employee_id: employee for employee in employees.select_related("user")
+    }
+    matched, unmatched = match_photos_to_employees(photos, employees)
+
+    report = {}
+    to_validate = []  # (employee_id, path, image)
+    for employee_id, employee_photos in sorted(matched.items()):
+        employee = employees[employee_id]
+        row = report[employee_id] = {
+            "employee_id": employee_id,
+            "name": employee.name,
+            "photos": len(employee_photos),
+            "accepted": 0,
+            "templates": 0,
+            "status": "failed",
+            "quality_score": None,
+            "sharpness": None,
+            "brightness": None,
+            "issues": [],
+        }
+        if skip_registered and employee.face_recognition_data:
+            row["status"] = "skipped"
+            row["issues"].append("Already has registered face data")
+            continue
+        to_validate.extend((employee_id, path, image) for path, image in employee_photos)
+
+    results = validate_face_photos([image for _, _, image in to_validate], workers=workers)
+
+    accepted = {}  # employee_id: [(face_data, photo), ...]
+    for (employee_id, path, image), result in zip(to_validate, results):
+        if result["is_valid"]:
+            accepted.setdefault(employee_id, []).append((result["face_data"], image))
+            report[employee_id]["accepted"] += 1
+        else:
+            report[employee_id]["issues"].extend(
+                f"{os.path.basename(path)}: {issue}" for issue in result["issues"]
+            )
+
+    service = get_face_recognition_service()
+    max_templates = getattr(settings, "FACE_MAX_TEMPLATES", 5)
+    registrations = []
+    for employee_id, faces in accepted.items():
+        row = report[employee_id]
+        faces.sort(key=lambda face: face[0]["quality"]["score"], reverse=True)
+        best = np.asarray(faces[0][0]["encoding"])
+
+        # SECURITY: like add_employee_face_template, every extra template must
+        # be the same person as the best photo
+        templates = [faces[0]]
+        for face_data, image in faces[1:]:
+            face_distance = service.template_distance(
+                np.atleast_2d(best), np.asarray(face_data["encoding"])
+            )
+            if face_distance > service.tolerance:
+                row["issues"].append(
+                    f"A photo does not match the employee's best photo (distance {face_distance:.3f})"
+                )
+            elif len(templates) < max_templates:
+                templates.append((face_data, image))
+
+        quality = faces[0][0]["quality"]
+        row.update(
+            status="valid" if dry_run else "registered",
+            templates=len(templates),
+            quality_score=round(quality["score"], 3),
+            sharpness=round(quality["sharpness"], 2),
+            brightness=round(quality["brightness"], 2),
+        )
+        registrations.append((employees[employee_id], templates))
+
+    templates_written = 0
+    if registrations and not dry_run:
+        with transaction.atomic():
+            templates_written = store_face_encodings_bulk(registrations)
+            # The bulk write skips the model signals that normally do this
+            for employee, _templates in registrations:
+                face_encoding_cache.invalidate(employee.pk)
+                schedule_face_index_refresh(employee.pk)
+
+    logger.info(
+        f"Bulk face registration: {len(registrations)} employees, "
+        f"{templates_written} templates, {len(unmatched)} unmatched photos"
+        + (" (dry run)" if dry_run else "")
+    )
+    return {
+        "employees": list(report.values()),
+        "unmatched": unmatched,
+        "registered": 0 if dry_run else len(registrations),
+        "templates": templates_written,
+    }
+
+
+def stale_face_templates():
+    """
+    Templates from another encoder that have an enrollment photo and no
+    re-encoded copy yet (a re-encoded copy shares the photo)
+    """
+    reencoded = current_face_embeddings().exclude(source_image="").values("source_image")
+    return (
+        FaceEmbedding.objects.exclude(encoder=current_face_encoder())
+        .exclude(source_image="")
+        .exclude(source_image__in=reencoded)
+        .filter(employee__is_active=True)
+    )
+
+
+def reencode_face_templates(batch_size: int = 64, workers: int = 1, limit: Optional[int] = None, progress=None) -> Dict:
+    """
+    Re-encode stale templates from their enrollment photos with the current encoder
+
+    The re-encoded copy is added next to the old template, so processes still
+    on the old encoder keep working until prune_stale_face_templates. Each
+    batch is committed on its own and finished templates are not selected
+    again: the job can be stopped and re-run at any point.
+
+    Args:
+        progress: Called with the running totals after each batch
+
+    Returns:
+        {"reencoded": count, "failed": [{"template_id", "employee_id", "error"}]}
+    """
+    totals = {"reencoded": 0, "failed": []}
+    last_pk = 0
+    executor = face_batch_executor(workers)
+    try:
+        processed = 0
+        while limit is None or processed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - processed)
+            # Walk by primary key so templates failing this run are not retried in a loop
+            batch = list(
+                stale_face_templates().filter(pk__gt=last_pk).select_related("employee").order_by("pk")[:size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            processed += len(batch)
+
+            images = [read_enrollment_image(template) for template in batch]
+            readable = [(template, image) for template, image in zip(batch, images) if image]
+            encoded = encode_images([image for _template, image in readable], executor)
+
+            new_templates = []
+            for template, image in zip(batch, images):
+                if not image:
+                    totals["failed"].append(_reencode_failure(template, "Enrollment image is missing"))
+            for (template, _image), face_data in zip(readable, encoded):
+                if face_data is None:
+                    totals["failed"].append(_reencode_failure(template, "No single face found by the current encoder"))
+                    continue
+                new_templates.append(
+                    FaceEmbedding(
+                        employee=template.employee,
+                        vector=pack_face_encoding(face_data["encoding"]),
+                        quality_score=face_data["quality"]["score"],
+                        model_name=face_data["model_name"],
+                        encoder=face_data["encoder"],
+                        dims=len(face_data["encoding"]),
+                        source_image=template.source_image.name,
+                    )
+                )
+
+            employee_ids = {template.employee_id for template in new_templates}
+            with transaction.atomic():
+                FaceEmbedding.objects.bulk_create(new_templates)
+                # Bulk writes skip the signals: updated_at expires the encoding
+                # cache of every process, the index is refreshed here
+                Employee.objects.filter(pk__in=employee_ids).update(updated_at=timezone.now())
+                for employee_id in employee_ids:
+                    face_encoding_cache.invalidate(employee_id)
+                    schedule_face_index_refresh(employee_id)
+
+            totals["reencoded"] += len(new_templates)
+            if progress is not None:
+                progress(totals)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    logger.info(
+        f"Re-encoded {totals['reencoded']} face templates with {current_face_encoder()}, "
+        f"{len(totals['failed'])} failed"
+    )
+    return totals
+
+
+def _reencode_failure(template, error: str) -> Dict:
+    return {"template_id": template.pk, "employee_id": template.employee.employee_id, "error": error}
+
+
+def prune_stale_face_templates() -> int:
+    """
+    Delete templates from other encoders for employees who have a current one
+
+    Run once every process uses the current encoder. Employees with no
+    current template keep their old ones (they still need re-enrolling).
+    """
+    covered = current_face_embeddings().values("employee_id")
+    deleted, _ = (
+        FaceEmbedding.objects.exclude(encoder=current_face_encoder())
+        .filter(employee_id__in=covered)
+        .delete()
+    )
+    return deleted
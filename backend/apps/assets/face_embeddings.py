@@ -0,0 +1,361 @@
+"""
+Binary storage for employee face encodings.
+
+Encodings are stored in FaceEmbedding.vector as a 4-byte header followed by
+little-endian float32 values, so a stored vector is ~4x smaller than the
+JSON list it replaces and decodes without copying via np.frombuffer.
+
+An employee can have several FaceEmbedding rows ("templates", e.g. enrolled
+in different sessions or lighting); a captured face is compared against all
+of them and the closest one counts.
+
+Each row records the encoder that produced it. Only templates from the
+current encoder are used, so after an encoder change old templates sit
+unused until they are re-encoded from their enrollment photo
+(manage.py reencode_face_embeddings).
+"""
+import json
+import logging
+import struct
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Employee, FaceEmbedding
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_FORMAT_VERSION = 1
+
+# format version, reserved flags, dimensions - keeps the payload 4-byte aligned
+_HEADER = struct.Struct("<BBH")
+_DTYPE = np.dtype("<f4")
+
+# dlib's ResNet face embedding network, the only one face_recognition ships
+FACE_ENCODER_NETWORK = "dlib_resnet_v1"
+
+
+# Revision of the image preprocessing feeding the encoder (decoding,
+# orientation, channel order). Bump it whenever that changes the pixels the
+# encoder sees for images it accepted before: templates of an older revision
+# are then stale and picked up by reencode_face_embeddings. Still 1: the
+# cv2.imdecode path reproduces the original PIL pipeline pixel for pixel.
+FACE_PREPROCESSING_REVISION = 1
+
+
+def face_encoder_name(
+    landmarks: str, color_order: str = "bgr", preprocessing: int = FACE_PREPROCESSING_REVISION
+) -> str:
+    """
+    Encoder identifier: the network, the landmark model aligning its input,
+    the input's channel order ("bgr" being the original, unsuffixed one) and
+    the preprocessing revision (1 being the original, unsuffixed one)
+    """
+    name = f"{FACE_ENCODER_NETWORK}-{landmarks}"
+    if color_order != "bgr":
+        name = f"{name}-{color_order}"
+    if preprocessing != 1:
+        name = f"{name}-p{preprocessing}"
+    return name
+
+
+def current_face_encoder() -> str:
+    return face_encoder_name(
+        getattr(settings, "FACE_ENCODER_LANDMARKS", "large"),
+        getattr(settings, "FACE_ENCODER_COLOR_ORDER", "bgr"),
+    )
+
+
+def current_face_embeddings():
+    """FaceEmbedding rows comparable with encodings produced now"""
+    return FaceEmbedding.objects.filter(encoder=current_face_encoder())
+
+
+def pack_face_encoding(encoding) -> bytes:
+    """Pack a face encoding (list or array of floats) into versioned bytes"""
+    vector = np.asarray(encoding, dtype=_DTYPE).ravel()
+    return _HEADER.pack(EMBEDDING_FORMAT_VERSION, 0, vector.size) + vector.tobytes()
+
+
+def unpack_face_encoding(data) -> np.ndarray:
+    """
+    Decode packed bytes into a read-only float32 array.
+
+    The array is a view over ``data`` (bytes or the memoryview returned by
+    the database driver), no copy is made.
+    """
+    buffer = memoryview(data)
+    version, _flags, dims = _HEADER.unpack_from(buffer)
+    if version != EMBEDDING_FORMAT_VERSION:
+        raise ValueError(f"Unsupported face embedding format version: {version}")
+    return np.frombuffer(buffer, dtype=_DTYPE, count=dims, offset=_HEADER.size)
+
+
+def load_employee_face_encodings(employee) -> Optional[np.ndarray]:
+    """
+    Get an employee's enrolled templates as a (templates, dims) matrix.
+
+    Falls back to an ``encoding`` list inside face_recognition_data for rows
+    written directly through the employee serializers.
+    """
+    vectors = current_face_embeddings().filter(employee=employee).values_list(
+        "vector", flat=True
+    )
+    encodings = [unpack_face_encoding(vector) for vector in vectors]
+    if encodings:
+        return np.vstack(encodings)
+
+    if FaceEmbedding.objects.filter(employee=employee).exists():
+        logger.warning(
+            f"Employee {employee.pk} only has face templates from another encoder "
+            f"than {current_face_encoder()}; they need re-encoding"
+        )
+        return None
+
+    if not employee.face_recognition_data:
+        return None
+
+    try:
+        legacy_encoding = json.loads(employee.face_recognition_data).get("encoding")
+    except (ValueError, AttributeError):
+        logger.error(f"Invalid face_recognition_data for employee {employee.pk}")
+        return None
+
+    if not legacy_encoding:
+        return None
+    return np.asarray(legacy_encoding, dtype=_DTYPE).reshape(1, -1)
+
+
+def load_employee_face_quality(employee) -> dict:
+    """Get the stored quality metrics from the face_recognition_data metadata"""
+    try:
+        return json.loads(employee.face_recognition_data).get("quality", {})
+    except (TypeError, ValueError, AttributeError):
+        return {}
+
+
+class FaceEncodingCache:
+    """
+    In-process LRU cache of decoded face templates (one matrix per employee).
+
+    Entries are keyed by employee id and tagged with the employee's
+    updated_at, so a re-registration saved by another worker process is
+    picked up on the next lookup even without a local invalidation.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, employee) -> Optional[Tuple[np.ndarray, dict]]:
+        with self._lock:
+            entry = self._entries.get(employee.pk)
+            if entry is None or entry[0] != employee.updated_at:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(employee.pk)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, employee, encoding: np.ndarray, quality: dict):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[employee.pk] = (employee.updated_at, encoding, quality)
+            self._entries.move_to_end(employee.pk)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, employee_id):
+        with self._lock:
+            if self._entries.pop(employee_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+face_encoding_cache = FaceEncodingCache(
+    getattr(settings, "FACE_ENCODING_CACHE_SIZE", 1024)
+)
+
+
+def get_cached_employee_face_encodings(employee) -> Tuple[Optional[np.ndarray], dict]:
+    """
+    Get (templates matrix, stored quality) for an employee, decoding from
+    the database only on a cache miss
+    """
+    cached = face_encoding_cache.get(employee)
+    if cached is not None:
+        return cached
+
+    encodings = load_employee_face_encodings(employee)
+    quality = load_employee_face_quality(employee)
+    if encodings is not None:
+        face_encoding_cache.put(employee, encodings, quality)
+    return encodings, quality
+
+
+def store_employee_face_encoding(employee, face_data, image_data: Optional[bytes] = None):
+    """
+    Replace all of the employee's templates with ``face_data``
+    (the dict returned by FaceRecognitionService.encode_face_from_base64),
+    keeping ``image_data`` (the enrollment photo) for re-encoding
+    """
+    with transaction.atomic():
+        FaceEmbedding.objects.filter(employee=employee).delete()
+        return _add_template(employee, face_data, image_data)
+
+
+def append_employee_face_encoding(employee, face_data, image_data: Optional[bytes] = None):
+    """
+    Enroll ``face_data`` as an additional template for the employee
+
+    Raises:
+        ValidationError: The employee already has FACE_MAX_TEMPLATES templates
+    """
+    max_templates = getattr(settings, "FACE_MAX_TEMPLATES", 5)
+    with transaction.atomic():
+        # Lock the employee row so concurrent enrollments respect the limit
+        Employee.objects.select_for_update().get(pk=employee.pk)
+        if current_face_embeddings().filter(employee=employee).count() >= max_templates:
+            raise ValidationError(
+                f"Employee already has the maximum of {max_templates} face templates"
+            )
+        return _add_template(employee, face_data, image_data)
+
+
+def delete_employee_face_encoding(employee, template_id) -> bool:
+    """Remove one template; returns False if the employee has no such template"""
+    with transaction.atomic():
+        deleted, _ = FaceEmbedding.objects.filter(employee=employee, pk=template_id).delete()
+        if not deleted:
+            return False
+
+        remaining = current_face_embeddings().filter(employee=employee).count()
+        if remaining:
+            metadata = json.loads(employee.face_recognition_data or "{}")
+            metadata["template_count"] = remaining
+            employee.face_recognition_data = json.dumps(metadata)
+        else:
+            employee.face_recognition_data = None
+        employee.save()
+        return True
+
+
+def store_face_encodings_bulk(registrations) -> int:
+    """
+    Replace the templates of many employees at once (bulk onboarding)
+
+    Args:
+        registrations: List of (employee, [(face_data, enrollment photo), ...])
+            pairs, each employee's best template first
+
+    Returns:
+        Number of templates written
+
+    Bulk writes bypass model signals: callers must invalidate the encoding
+    cache and the identification index for these employees.
+    """
+    now = timezone.now()
+    employees = []
+    templates = []
+    for employee, faces in registrations:
+        templates.extend(
+            _new_template(employee, face_data, image_data) for face_data, image_data in faces
+        )
+        employee.face_recognition_data = _face_metadata(faces[0][0], len(faces))
+        # Set explicitly: bulk_update skips auto_now, and the encoding cache of
+        # other processes is keyed on it
+        employee.updated_at = now
+        employees.append(employee)
+
+    with transaction.atomic():
+        FaceEmbedding.objects.filter(employee__in=employees).delete()
+        FaceEmbedding.objects.bulk_create(templates, batch_size=500)
+        Employee.objects.bulk_update(
+            employees, ["face_recognition_data", "updated_at"], batch_size=500
+        )
+    return len(templates)
+
+
+def _add_template(employee, face_data, image_data: Optional[bytes] = None) -> FaceEmbedding:
+    template = _new_template(employee, face_data, image_data)
+    template.save()
+
+    employee.face_recognition_data = _face_metadata(
+        face_data, current_face_embeddings().filter(employee=employee).count()
+    )
+    employee.save()
+    return template
+
+
+def _new_template(employee, face_data, image_data: Optional[bytes] = None) -> FaceEmbedding:
+    """Unsaved FaceEmbedding for ``face_data``, with its enrollment photo stored"""
+    encoding = face_data["encoding"]
+    template = FaceEmbedding(
+        employee=employee,
+        vector=pack_face_encoding(encoding),
+        quality_score=face_data["quality"]["score"],
+        model_name=face_data.get("model_name", ""),
+        encoder=face_data.get("encoder", current_face_encoder()),
+        dims=len(encoding),
+    )
+    if image_data and getattr(settings, "FACE_RETAIN_ENROLLMENT_IMAGES", True):
+        extension = ".png" if image_data.startswith(b"\x89PNG") else ".jpg"
+        template.source_image.save(
+            f"{employee.employee_id}{extension}", ContentFile(image_data), save=False
+        )
+    return template
+
+
+def read_enrollment_image(template) -> Optional[bytes]:
+    """The template's retained enrollment photo, or None if there is none"""
+    if not template.source_image:
+        return None
+    try:
+        with template.source_image.open("rb") as f:
+            return f.read()
+    except (OSError, ValueError) as e:
+        logger.error(f"Cannot read enrollment image of face template {template.pk}: {e}")
+        return None
+
+
+def _face_metadata(face_data, template_count: int) -> str:
+    # Metadata only - the encodings themselves live in FaceEmbedding
+    return json.dumps(
+        {
+            "quality": face_data["quality"],
+            "registered_date": str(timezone.now()),
+            "image_dimensions": face_data["image_dimensions"],
+            "embedding_dimensions": len(face_data["encoding"]),
+            "template_count": template_count,
+        }
+    )
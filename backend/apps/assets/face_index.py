@@ -0,0 +1,431 @@
+"""
+In-memory index of registered face encodings for 1:N identification.
+
+All active employees' enrolled templates are held in one contiguous float32
+matrix so a captured face is compared against everyone with a single
+vectorized distance computation. With FACE_INDEX_BACKEND = 'ivf' the rows are also
+bucketed by k-means centroids so a search only scores a few buckets.
+"""
+import logging
+import os
+import threading
+import time
+from itertools import chain
+from typing import List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .face_embeddings import current_face_embeddings, unpack_face_encoding
+
+logger = logging.getLogger(__name__)
+
+
+class FaceEmbeddingIndex:
+    """
+    Float32 matrix of active employees' encodings, one row per enrolled
+    template; an employee's distance is the minimum over their templates.
+
+    The index is built lazily on first search and kept current through
+    refresh_employee(), which the model signals call after each commit.
+    Other worker processes pick up changes when their copy is older than
+    FACE_INDEX_REFRESH_SECONDS.
+    """
+
+    def __init__(self, refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._employee_ids = np.empty(0, dtype=np.int64)
+        self._rows = {}  # employee id -> rows of their templates in _matrix
+        self._size = 0
+        self._built_at = None
+
+    @property
+    def size(self) -> int:
+        """Number of indexed templates"""
+        return self._size
+
+    @property
+    def employee_count(self) -> int:
+        return len(self._rows)
+
+    def build(self):
+        """Load every active employee's templates from the database"""
+        embeddings = (
+            current_face_embeddings()
+            .filter(employee__is_active=True)
+            .order_by("employee_id", "created_at")
+            .values_list("employee_id", "vector")
+        )
+
+        employee_ids = []
+        vectors = []
+        for employee_id, vector in embeddings.iterator(chunk_size=2000):
+            employee_ids.append(employee_id)
+            vectors.append(unpack_face_encoding(vector))
+
+        self.load(employee_ids, np.vstack(vectors) if vectors else None)
+        logger.info(
+            f"Face index built with {self._size} templates for {self.employee_count} employees"
+        )
+
+    def load(self, employee_ids, matrix: Optional[np.ndarray]):
+        """Replace the index contents with ``matrix`` (one row per template, owner in employee_ids)"""
+        with self._lock:
+            if matrix is not None and len(matrix):
+                self._matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+            else:
+                self._matrix = np.empty((0, 0), dtype=np.float32)
+            self._employee_ids = np.asarray(employee_ids, dtype=np.int64)
+            self._rows = {}
+            for row, employee_id in enumerate(employee_ids):
+                self._rows.setdefault(int(employee_id), []).append(row)
+            self._size = len(self._employee_ids)
+            self._built_at = time.monotonic()
+            self._after_load()
+
+    def _after_load(self):
+        """Hook for subclasses to derive their structures from the new matrix"""
+
+    def ensure_built(self):
+        with self._lock:
+            stale = self._built_at is None or (
+                self.refresh_seconds
+                and time.monotonic() - self._built_at > self.refresh_seconds
+            )
+        if stale:
+            self.build()
+
+    def _reserve(self, dims: int):
+        """Grow the matrix geometrically so appends stay amortised O(1)"""
+        capacity = len(self._matrix)
+        if self._size < capacity:
+            return
+
+        capacity = max(16, capacity * 2)
+        matrix = np.empty((capacity, dims), dtype=np.float32)
+        employee_ids = np.empty(capacity, dtype=np.int64)
+        if self._size:
+            matrix[: self._size] = self._matrix[: self._size]
+            employee_ids[: self._size] = self._employee_ids[: self._size]
+        self._matrix = matrix
+        self._employee_ids = employee_ids
+        self._after_reserve(capacity)
+
+    def _after_reserve(self, capacity: int):
+        """Hook for subclasses keeping per-row arrays of their own"""
+
+    def upsert(self, employee_id: int, encodings: np.ndarray):
+        """Replace the employee's rows with ``encodings`` (one template or a matrix of them)"""
+        encodings = np.atleast_2d(encodings)
+        with self._lock:
+            if self._built_at is None:
+                return  # built lazily with current data on first search
+
+            self.remove(employee_id)
+            rows = []
+            for encoding in encodings:
+                self._reserve(encoding.size)
+                row = self._size
+                self._matrix[row] = encoding
+                self._employee_ids[row] = employee_id
+                self._size += 1
+                self._after_row_set(row)
+                rows.append(row)
+            self._rows[employee_id] = rows
+
+    def _after_row_set(self, row: int):
+        """Hook called after a row is written"""
+
+    def remove(self, employee_id: int):
+        with self._lock:
+            # Highest rows first, so the last row moved into each gap never
+            # belongs to this employee
+            for row in sorted(self._rows.pop(employee_id, ()), reverse=True):
+                self._remove_row(row)
+
+    def _remove_row(self, row: int):
+        """Move the last row into the gap to keep the matrix contiguous"""
+        self._before_row_removed(row)
+        last = self._size - 1
+        if row != last:
+            moved_id = int(self._employee_ids[last])
+            self._matrix[row] = self._matrix[last]
+            self._employee_ids[row] = moved_id
+            moved_rows = self._rows[moved_id]
+            moved_rows[moved_rows.index(last)] = row
+            self._after_row_moved(last, row)
+        self._size = last
+
+    def _before_row_removed(self, row: int):
+        """Hook called before a row is removed (and the last row moved into it)"""
+
+    def _after_row_moved(self, source: int, target: int):
+        """Hook called when the last row is moved into a removed row's slot"""
+
+    def refresh_employee(self, employee_id: int):
+        """Re-read one employee's templates and update or drop their rows"""
+        if self._built_at is None:
+            return
+
+        vectors = current_face_embeddings().filter(
+            employee_id=employee_id, employee__is_active=True
+        ).values_list("vector", flat=True)
+        encodings = [unpack_face_encoding(vector) for vector in vectors]
+        if encodings:
+            self.upsert(employee_id, np.vstack(encodings))
+        else:
+            self.remove(employee_id)
+
+    def search(
+        self, encoding: np.ndarray, limit: int = 5, max_distance: Optional[float] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Find the closest employees to ``encoding``
+
+        Returns:
+            List of (employee id, face distance) pairs, closest first
+        """
+        self.ensure_built()
+
+        query = np.asarray(encoding, dtype=np.float32)
+        with self._lock:
+            if self._size == 0:
+                return []
+            rows = self._candidate_rows(query)
+            if rows is None:
+                employee_ids = self._employee_ids[: self._size].copy()
+                distances = np.linalg.norm(self._matrix[: self._size] - query, axis=1)
+            else:
+                employee_ids = self._employee_ids[rows]
+                distances = np.linalg.norm(self._matrix[rows] - query, axis=1)
+
+        if not len(distances):
+            return []
+
+        return _closest_employees(employee_ids, distances, limit, max_distance)
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows worth scoring for ``query``; None means score every row"""
+        return None
+
+
+def _closest_employees(
+    employee_ids: np.ndarray, distances: np.ndarray, limit: int, max_distance: Optional[float]
+) -> List[Tuple[int, float]]:
+    """
+    The ``limit`` employees with the smallest per-row distance, each counted
+    once at their best template
+    """
+    # Sort only the closest few rows, unless several templates of the same
+    # employees leave fewer than ``limit`` distinct matches among them
+    candidates = min(limit * 4, len(distances))
+    while True:
+        nearest = np.argpartition(distances, candidates - 1)[:candidates]
+        nearest = nearest[np.argsort(distances[nearest])]
+
+        matches = {}
+        for i in nearest:
+            if max_distance is not None and distances[i] > max_distance:
+                break
+            matches.setdefault(int(employee_ids[i]), float(distances[i]))
+            if len(matches) == limit:
+                break
+
+        exhausted = candidates == len(distances) or (
+            max_distance is not None and distances[nearest[-1]] > max_distance
+        )
+        if len(matches) == limit or exhausted:
+            return list(matches.items())
+        candidates = len(distances)
+
+
+def _nearest_centroids(matrix: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    """Index of the closest centroid for each row of ``matrix``"""
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    nearest = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), chunk_size):
+        chunk = matrix[start : start + chunk_size]
+        # |x - c|^2 without the |x|^2 term, which does not change the argmin
+        scores = centroid_norms[None, :] - 2 * chunk @ centroids.T
+        nearest[start : start + chunk_size] = np.argmin(scores, axis=1)
+    return nearest
+
+
+def train_kmeans(matrix: np.ndarray, clusters: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means, returns a (clusters, dims) float32 centroid matrix"""
+    rng = np.random.default_rng(seed)
+    clusters = max(1, min(clusters, len(matrix)))
+    centroids = matrix[rng.choice(len(matrix), clusters, replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        assignments = _nearest_centroids(matrix, centroids)
+        counts = np.bincount(assignments, minlength=clusters)
+        sums = np.zeros_like(centroids, dtype=np.float64)
+        np.add.at(sums, assignments, matrix)
+
+        empty = counts == 0
+        centroids[~empty] = (sums[~empty] / counts[~empty, None]).astype(np.float32)
+        if empty.any():
+            # re-seed empty buckets from random rows
+            centroids[empty] = matrix[rng.choice(len(matrix), int(empty.sum()))]
+
+    return centroids
+
+
+class IVFFaceIndex(FaceEmbeddingIndex):
+    """
+    Inverted-file index over the same matrix.
+
+    Each row is assigned to its nearest k-means centroid and a search only
+    scores rows in the ``nprobe`` buckets closest to the query. Every bucket
+    keeps the list of its rows, updated as rows are added, moved and removed,
+    so a search never scans the other buckets' rows. Centroids are
+    trained offline by the rebuild_face_index command and read from
+    ``centroids_path``; without them every row is scored, as in the exact
+    index.
+    """
+
+    def __init__(self, refresh_seconds: int, centroids_path: str, nprobe: int):
+        super().__init__(refresh_seconds)
+        self.centroids_path = centroids_path
+        self.nprobe = nprobe
+        self._centroids = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._buckets = []  # centroid -> rows assigned to it
+        self._bucket_positions = np.empty(0, dtype=np.int64)  # row -> index in its bucket
+
+    @property
+    def centroids(self) -> Optional[np.ndarray]:
+        return self._centroids
+
+    def load_centroids(self) -> Optional[np.ndarray]:
+        if not os.path.exists(self.centroids_path):
+            return None
+        with np.load(self.centroids_path) as data:
+            return data["centroids"].astype(np.float32)
+
+    def save_centroids(self, centroids: np.ndarray):
+        os.makedirs(os.path.dirname(self.centroids_path), exist_ok=True)
+        tmp_path = f"{self.centroids_path}.tmp.npz"
+        np.savez(tmp_path, centroids=centroids)
+        os.replace(tmp_path, self.centroids_path)  # atomic for readers in other workers
+
+    def train(self, clusters: Optional[int] = None, iterations: int = 20) -> np.ndarray:
+        """Train centroids on the current rows and re-bucket them"""
+        with self._lock:
+            matrix = self._matrix[: self._size].copy()
+        if not len(matrix):
+            raise ValueError("Cannot train the face index without registered encodings")
+
+        clusters = clusters or max(1, int(np.sqrt(len(matrix))))
+        centroids = train_kmeans(matrix, clusters, iterations=iterations)
+        self.set_centroids(centroids)
+        return centroids
+
+    def set_centroids(self, centroids: Optional[np.ndarray]):
+        with self._lock:
+            self._centroids = centroids
+            self._assign_all()
+
+    def _assign_all(self):
+        dims = self._matrix.shape[1] if self._size else None
+        if self._centroids is not None and dims and self._centroids.shape[1] != dims:
+            logger.warning("Face index centroids do not match the encoding size, ignoring them")
+            self._centroids = None
+
+        self._assignments = np.zeros(len(self._matrix), dtype=np.int32)
+        self._bucket_positions = np.zeros(len(self._matrix), dtype=np.int64)
+        self._buckets = []
+        if self._centroids is None:
+            return
+
+        self._buckets = [[] for _ in range(len(self._centroids))]
+        if self._size:
+            self._assignments[: self._size] = _nearest_centroids(
+                self._matrix[: self._size], self._centroids
+            )
+        for row in range(self._size):
+            bucket = self._buckets[self._assignments[row]]
+            self._bucket_positions[row] = len(bucket)
+            bucket.append(row)
+
+    def build(self):
+        centroids = self.load_centroids()
+        with self._lock:
+            self._centroids = centroids
+        super().build()
+
+    def _after_load(self):
+        self._assign_all()
+
+    def _after_reserve(self, capacity: int):
+        assignments = np.zeros(capacity, dtype=np.int32)
+        assignments[: self._size] = self._assignments[: self._size]
+        self._assignments = assignments
+        positions = np.zeros(capacity, dtype=np.int64)
+        positions[: self._size] = self._bucket_positions[: self._size]
+        self._bucket_positions = positions
+
+    def _after_row_set(self, row: int):
+        if self._centroids is not None:
+            centroid = _nearest_centroids(self._matrix[row : row + 1], self._centroids)[0]
+            self._assignments[row] = centroid
+            bucket = self._buckets[centroid]
+            self._bucket_positions[row] = len(bucket)
+            bucket.append(row)
+
+    def _before_row_removed(self, row: int):
+        if self._centroids is None:
+            return
+        # Fill the row's slot in its bucket with the bucket's last row
+        bucket = self._buckets[self._assignments[row]]
+        position = self._bucket_positions[row]
+        last = bucket.pop()
+        if last != row:
+            bucket[position] = last
+            self._bucket_positions[last] = position
+
+    def _after_row_moved(self, source: int, target: int):
+        self._assignments[target] = self._assignments[source]
+        if self._centroids is not None:
+            position = self._bucket_positions[source]
+            self._buckets[self._assignments[target]][position] = target
+            self._bucket_positions[target] = position
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if self._centroids is None or self.nprobe >= len(self._centroids):
+            return None
+
+        centroid_distances = np.linalg.norm(self._centroids - query, axis=1)
+        probe = np.argpartition(centroid_distances, self.nprobe - 1)[: self.nprobe]
+        buckets = [self._buckets[centroid] for centroid in probe]
+        return np.fromiter(
+            chain.from_iterable(buckets), dtype=np.intp, count=sum(map(len, buckets))
+        )
+
+
+def create_face_index(backend: Optional[str] = None) -> FaceEmbeddingIndex:
+    """Build the index configured by FACE_INDEX_BACKEND ('exact' or 'ivf')"""
+    backend = backend or getattr(settings, "FACE_INDEX_BACKEND", "exact")
+    refresh_seconds = getattr(settings, "FACE_INDEX_REFRESH_SECONDS", 300)
+
+    if backend == "ivf":
+        return IVFFaceIndex(
+            refresh_seconds,
+            centroids_path=settings.FACE_INDEX_PATH,
+            nprobe=getattr(settings, "FACE_INDEX_NPROBE", 8),
+        )
+    if backend != "exact":
+        raise ValueError(f"Unknown FACE_INDEX_BACKEND: {backend}")
+    return FaceEmbeddingIndex(refresh_seconds)
+
+
+face_index = create_face_index()
+
+
+def schedule_face_index_refresh(employee_id: int):
+    """Refresh the employee's row once the surrounding transaction commits"""
+    transaction.on_commit(lambda: face_index.refresh_employee(employee_id))
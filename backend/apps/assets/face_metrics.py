@@ -0,0 +1,96 @@
+"""
+Per-stage latency metrics for the face pipeline.
+
+Every encode records its stage timings (see
+FaceRecognitionService.encode_face_from_base64) into in-process histograms
+keyed by operation (verify, validate, register, identify) and stage, and
+logs them as one structured line. The histograms are served by the admin
+face metrics endpoint; they are per worker process and reset on restart.
+"""
+import bisect
+import logging
+import threading
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets in milliseconds, roughly x1.5 apart
+# from 0.1ms to ~60s; slower samples fall into an overflow bucket
+BUCKET_BOUNDS_MS = tuple(round(0.1 * 1.5 ** i, 3) for i in range(34))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with interpolated percentiles"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = BUCKET_BOUNDS_MS[bucket - 1] if bucket else 0.0
+                upper = BUCKET_BOUNDS_MS[bucket] if bucket < len(BUCKET_BOUNDS_MS) else self.max
+                # Linear interpolation inside the bucket, capped at the largest sample
+                return round(min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max), 2)
+            seen += bucket_count
+        return round(self.max, 2)
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 2) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max, 2),
+        }
+
+
+class FacePipelineMetrics:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, timings: Dict[str, float]):
+        """Add one call's stage timings (``<stage>_ms`` -> milliseconds)"""
+        with self._lock:
+            for key, value in timings.items():
+                stage = key[:-3] if key.endswith("_ms") else key
+                histogram = self._histograms.get((operation, stage))
+                if histogram is None:
+                    histogram = self._histograms[(operation, stage)] = LatencyHistogram()
+                histogram.observe(value)
+
+        fields = " ".join(f"{key}={value}" for key, value in timings.items())
+        logger.info(
+            f"face_pipeline operation={operation} {fields}",
+            extra={"face_operation": operation, "face_timings": timings},
+        )
+
+    def snapshot(self) -> Dict:
+        """{operation: {stage: {count, mean_ms, p50_ms, p95_ms, max_ms}}}"""
+        with self._lock:
+            result = {}
+            for (operation, stage), histogram in sorted(self._histograms.items()):
+                result.setdefault(operation, {})[stage] = histogram.summary()
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+face_pipeline_metrics = FacePipelineMetrics()
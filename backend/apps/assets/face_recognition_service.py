@@ -4,15 +4,33 @@ import face_recognition
 import base64
 import io
 from PIL import Image
-import json
 import logging
-from typing import Dict, List, Tuple, Optional
+import secrets
+import threading
+import time
+from typing import Dict, List, Tuple, Optional, Union
 from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 import os
-from django.utils import timezone
+
+from .face_embeddings import (
+    append_employee_face_encoding,
+    delete_employee_face_encoding,
+    face_encoder_name,
+    get_cached_employee_face_encodings,
+    store_employee_face_encoding,
+)
+from .face_index import face_index
+from .face_metrics import face_pipeline_metrics
+from .face_worker import FaceWorkerUnavailable, encode_face_in_worker, face_worker_pool
 
 logger = logging.getLogger(__name__)
 
+# Base64 string (optionally a data URL) or the raw JPEG/PNG bytes of an upload
+ImageData = Union[str, bytes]
+
 
 class FaceRecognitionService:
     """
@@ -25,6 +43,15 @@ class FaceRecognitionService:
         self.model = getattr(
             settings, "FACE_RECOGNITION_MODEL", "hog"
         )  # 'hog' or 'cnn'
+        # Landmark model aligning faces for the encoder - part of the encoder's
+        # identity, see face_embeddings.face_encoder_name
+        self.encoder_landmarks = getattr(settings, "FACE_ENCODER_LANDMARKS", "large")
+        # Channel order of the array handed to the encoder, see _decode_image
+        self.encoder_color_order = getattr(settings, "FACE_ENCODER_COLOR_ORDER", "bgr")
+        # Longest side of the copy used for face detection (0 = full resolution)
+        self.detection_max_dimension = getattr(
+            settings, "FACE_DETECTION_MAX_DIMENSION", 0
+        )
         
         # Load quality thresholds from settings
         self.quality_thresholds = getattr(settings, "FACE_QUALITY_THRESHOLDS", {
@@ -36,39 +63,41 @@ class FaceRecognitionService:
             'min_face_ratio': 0.03,
         })
 
-    def encode_face_from_base64(self, base64_image: str) -> Optional[Dict]:
+        # Filled in by warm_up(), reported through the face stats endpoint
+        self.startup_metrics = {"warmed_up": False}
+
+    def encode_face_from_base64(
+        self, base64_image: ImageData, timings: Optional[Dict] = None
+    ) -> Optional[Dict]:
         """
         Extract face encoding from base64 image string
 
         Args:
-            base64_image: Base64 encoded image string
+            base64_image: Base64 encoded image string, or raw image bytes
+                from a multipart/binary upload (used without decoding)
+            timings: Optional dict that receives the per-stage timings in ms,
+                also when no face is found
 
         Returns:
             Dict with face encoding and metadata or None if no face found
         """
+        timings = {} if timings is None else timings
+        started = time.perf_counter()
         try:
-            # Remove data URL prefix if present
-            if base64_image.startswith("data:image"):
-                base64_image = base64_image.split(",")[1]
-
-            # Decode base64 image
-            image_data = base64.b64decode(base64_image)
-            image = Image.open(io.BytesIO(image_data))
-
-            # Convert PIL image to numpy array (RGB format for face_recognition)
-            image_array = np.array(image)
-
-            # Convert RGBA to RGB if necessary
-            if image_array.shape[2] == 4:
-                image_array = cv2.cvtColor(image_array, cv2.COLOR_RGBA2RGB)
-            elif len(image_array.shape) == 3 and image_array.shape[2] == 3:
-                # Ensure RGB format (face_recognition expects RGB)
-                image_array = cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB)
-
-            # Find face locations
-            face_locations = face_recognition.face_locations(
-                image_array, model=self.model
-            )
+            image_data = _image_bytes(base64_image)
+            timings["base64_decode_ms"] = _elapsed_ms(started)
+
+            stage_started = time.perf_counter()
+            image_array = _decode_image(image_data, self.encoder_color_order)
+            timings["image_decode_ms"] = _elapsed_ms(stage_started)
+            if image_array is None:
+                logger.warning("Could not decode the provided image")
+                return None
+
+            # Find face locations (on a downscaled copy, mapped back to full resolution)
+            stage_started = time.perf_counter()
+            face_locations = self._detect_faces(image_array)
+            timings["detect_ms"] = _elapsed_ms(stage_started)
 
             if not face_locations:
                 logger.warning("No face found in the provided image")
@@ -82,11 +111,13 @@ class FaceRecognitionService:
                 return None  # Reject if multiple faces detected
 
             # Get face encoding
+            stage_started = time.perf_counter()
             face_encodings = face_recognition.face_encodings(
                 image_array,
                 face_locations,
-                model="large",  # Use large model for better accuracy
+                model=self.encoder_landmarks,
             )
+            timings["encode_ms"] = _elapsed_ms(stage_started)
 
             if not face_encodings:
                 logger.warning("Could not encode the face in the image")
@@ -103,7 +134,9 @@ class FaceRecognitionService:
             face_ratio = face_area / image_area
 
             # Quality assessment
+            stage_started = time.perf_counter()
             quality = self._assess_face_quality(image_array, face_location, face_ratio)
+            timings["quality_ms"] = _elapsed_ms(stage_started)
 
             return {
                 "encoding": face_encoding.tolist(),  # Convert numpy array to list for JSON serialization
@@ -114,11 +147,160 @@ class FaceRecognitionService:
                     "width": image_array.shape[1],
                     "height": image_array.shape[0],
                 },
+                # Stored with the encoding (FaceEmbedding.model_name / encoder)
+                "model_name": self.model,
+                "encoder": face_encoder_name(self.encoder_landmarks, self.encoder_color_order),
+                "timings": timings,
             }
 
         except Exception as e:
             logger.error(f"Error encoding face: {str(e)}")
             return None
+        finally:
+            timings["total_ms"] = _elapsed_ms(started)
+
+    def load_models(self):
+        """Run the detector, shape predictor and encoder once on a blank image"""
+        blank_image = np.zeros((64, 64, 3), dtype=np.uint8)
+        face_recognition.face_locations(blank_image, model=self.model)
+        face_recognition.face_encodings(blank_image, [(0, 64, 64, 0)], model=self.encoder_landmarks)
+
+    def warm_up(self, build_index: bool = False) -> Dict:
+        """
+        Run the dlib detector, shape predictor and encoder once and start the
+        face worker pool, so the first real verification does not pay for it
+
+        Args:
+            build_index: Also load the 1:N identification index (needs the database)
+
+        Returns:
+            Dict with per-step timings in milliseconds
+        """
+        started = time.perf_counter()
+        metrics = {}
+
+        self.load_models()
+        metrics["models_ms"] = _elapsed_ms(started)
+
+        if face_worker_pool.enabled:
+            stage_started = time.perf_counter()
+            face_worker_pool.start()
+            metrics["worker_pool_ms"] = _elapsed_ms(stage_started)
+
+        if build_index:
+            stage_started = time.perf_counter()
+            face_index.ensure_built()
+            metrics["index_ms"] = _elapsed_ms(stage_started)
+
+        metrics["total_ms"] = _elapsed_ms(started)
+        self.startup_metrics = {
+            "warmed_up": True,
+            "warmed_up_at": time.time(),
+            **metrics,
+        }
+        logger.info(f"Face recognition service warmed up in {metrics['total_ms']}ms: {metrics}")
+        return metrics
+
+    def encode_face(
+        self,
+        base64_image: ImageData,
+        operation: str = "encode",
+        timings: Optional[Dict] = None,
+    ) -> Optional[Dict]:
+        """
+        encode_face_from_base64, run in the face worker pool when one is
+        configured. Raises FaceWorkerUnavailable when the pool is saturated
+        or the job times out.
+
+        The stage timings (added to ``timings`` from earlier stages, if given)
+        are recorded in face_pipeline_metrics under ``operation``, plus
+        wall_ms which includes pool queueing and transfer.
+        """
+        started = time.perf_counter()
+        if face_worker_pool.enabled:
+            face_data, stage_timings = face_worker_pool.run(encode_face_in_worker, base64_image)
+        else:
+            stage_timings = {}
+            face_data = self.encode_face_from_base64(base64_image, timings=stage_timings)
+
+        face_pipeline_metrics.record(
+            operation, {**(timings or {}), **stage_timings, "wall_ms": _elapsed_ms(started)}
+        )
+        return face_data
+
+    def precheck_image(self, image_data: bytes) -> Optional[Dict]:
+        """
+        Whole-frame sharpness and brightness check on a small grayscale copy,
+        cheap enough to run before face detection
+
+        Returns:
+            A failed validation result (same shape as validate_face_data) for
+            an obviously unusable frame, otherwise None. Frames that cannot be
+            decoded also return None and are reported by the full pipeline.
+        """
+        gray = _decode_precheck_image(image_data)
+        if gray is None:
+            return None
+
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        brightness = float(gray.mean())
+        thresholds = self.quality_thresholds
+        issues = []
+        recommendations = []
+
+        min_sharpness = thresholds.get('precheck_min_sharpness', 0.0)
+        if sharpness < min_sharpness:
+            issues.append(f"Image is too blurry (frame sharpness: {sharpness:.2f}, minimum: {min_sharpness})")
+            recommendations.append("Keep camera steady and ensure good focus")
+
+        min_brightness = thresholds.get('precheck_min_brightness', 0.0)
+        max_brightness = thresholds.get('precheck_max_brightness', 255.0)
+        if brightness < min_brightness or brightness > max_brightness:
+            issues.append(f"Poor lighting conditions (frame brightness: {brightness:.2f}, range: {min_brightness}-{max_brightness})")
+            recommendations.append("Use good, even lighting on face")
+
+        if not issues:
+            return None
+
+        logger.info(f"Image rejected before face detection - Sharpness: {sharpness:.2f}, Brightness: {brightness:.2f}")
+        return {
+            "is_valid": False,
+            "issues": issues,
+            "recommendations": recommendations,
+            "precheck": {
+                "sharpness": round(sharpness, 2),
+                "brightness": round(brightness, 2),
+            },
+        }
+
+    def _detect_faces(self, image_array: np.ndarray) -> List[Tuple]:
+        """
+        Run face detection, on a downscaled copy when the image is larger than
+        detection_max_dimension. Boxes are returned in full-resolution
+        coordinates so encoding and quality checks still use every pixel.
+        """
+        height, width = image_array.shape[:2]
+        longest_side = max(height, width)
+        if not self.detection_max_dimension or longest_side <= self.detection_max_dimension:
+            return face_recognition.face_locations(image_array, model=self.model)
+
+        scale = self.detection_max_dimension / longest_side
+        small_image = cv2.resize(
+            image_array,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+        small_locations = face_recognition.face_locations(small_image, model=self.model)
+
+        return [
+            (
+                max(0, int(round(top / scale))),
+                min(width, int(round(right / scale))),
+                min(height, int(round(bottom / scale))),
+                max(0, int(round(left / scale))),
+            )
+            for top, right, bottom, left in small_locations
+        ]
 
     def _assess_face_quality(
         self, image_array: np.ndarray, face_location: Tuple, face_ratio: float
@@ -158,24 +340,27 @@ class FaceRecognitionService:
             "is_good_quality": bool(quality_score > self.quality_thresholds['min_quality_score']),
         }
 
-    def compare_faces(self, stored_encoding_data: str, captured_base64: str) -> Dict:
+    def compare_faces(
+        self,
+        stored_encodings: np.ndarray,
+        captured_base64: ImageData,
+        stored_quality: Optional[Dict] = None,
+    ) -> Dict:
         """
-        Compare stored face encoding with a newly captured face
+        Compare an employee's enrolled templates with a newly captured face
 
         Args:
-            stored_encoding_data: JSON string containing stored face encoding data
-            captured_base64: Base64 encoded image of the captured face
+            stored_encodings: (templates, dims) matrix of enrolled encodings
+                (see face_embeddings.load_employee_face_encodings)
+            captured_base64: Base64 encoded image (or raw image bytes) of the captured face
+            stored_quality: Quality metrics recorded at registration
 
         Returns:
             Dict with comparison results
         """
         try:
-            # Parse stored encoding data
-            stored_data = json.loads(stored_encoding_data)
-            stored_encoding = np.array(stored_data["encoding"])
-
             # Encode the captured face
-            captured_data = self.encode_face_from_base64(captured_base64)
+            captured_data = self.encode_face(captured_base64, operation="verify")
 
             if not captured_data:
                 return {
@@ -187,10 +372,8 @@ class FaceRecognitionService:
 
             captured_encoding = np.array(captured_data["encoding"])
 
-            # Calculate face distance
-            face_distance = face_recognition.face_distance(
-                [stored_encoding], captured_encoding
-            )[0]
+            # Distance to the closest enrolled template
+            face_distance = self.template_distance(stored_encodings, captured_encoding)
 
             # Convert distance to confidence (lower distance = higher confidence)
             confidence = 1 - face_distance
@@ -204,7 +387,9 @@ class FaceRecognitionService:
                 "face_distance": round(face_distance, 3),
                 "threshold": self.tolerance,
                 "captured_quality": captured_data["quality"],
-                "stored_quality": stored_data.get("quality", {}),
+                "stored_quality": stored_quality or {},
+                "templates_compared": len(stored_encodings),
+                "timings": captured_data["timings"],
                 "match_details": {
                     "face_found": True,
                     "encoding_successful": True,
@@ -212,14 +397,8 @@ class FaceRecognitionService:
                 },
             }
 
-        except json.JSONDecodeError as e:
-            logger.error(f"Error parsing stored encoding data: {str(e)}")
-            return {
-                "success": False,
-                "confidence": 0.0,
-                "threshold": self.tolerance,
-                "error": "Invalid stored face encoding data",
-            }
+        except FaceWorkerUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error comparing faces: {str(e)}")
             return {
@@ -229,19 +408,52 @@ class FaceRecognitionService:
                 "error": f"Face comparison failed: {str(e)}",
             }
 
-    def validate_image_quality(self, base64_image: str) -> Dict:
+    @staticmethod
+    def template_distance(stored_encodings: np.ndarray, encoding: np.ndarray) -> float:
+        """Smallest face distance between ``encoding`` and any of the templates, in one vectorized call"""
+        return float(np.min(face_recognition.face_distance(stored_encodings, encoding)))
+
+    def validate_image_quality(self, base64_image: ImageData, operation: str = "validate") -> Dict:
         """
         Validate if an image is suitable for face recognition
 
         Args:
-            base64_image: Base64 encoded image string
+            base64_image: Base64 encoded image string or raw image bytes
+            operation: Name the stage timings are recorded under
 
         Returns:
             Dict with validation results
         """
+        started = time.perf_counter()
         try:
-            face_data = self.encode_face_from_base64(base64_image)
+            image_data = _image_bytes(base64_image)
+        except ValueError:
+            logger.error("Invalid base64 image data")
+            return self.validate_face_data(None)
+
+        # Reject obviously unusable frames before spending detector time on them
+        precheck = self.precheck_image(image_data)
+        timings = {"precheck_ms": _elapsed_ms(started)}
+        if precheck is not None:
+            face_pipeline_metrics.record(operation, timings)
+            return precheck
+
+        return self.validate_face_data(
+            self.encode_face(image_data, operation=operation, timings=timings)
+        )
+
+    def validate_face_data(self, face_data: Optional[Dict]) -> Dict:
+        """
+        Validate already-encoded face data against the quality thresholds
 
+        Args:
+            face_data: Result of encode_face_from_base64 (None if no face was found)
+
+        Returns:
+            Dict with validation results. ``face_data`` is passed through so
+            callers can reuse the encoding instead of detecting the face again
+        """
+        try:
             if not face_data:
                 return {
                     "is_valid": False,
@@ -358,18 +570,137 @@ class FaceRecognitionService:
             }
 
 
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def _image_bytes(image: ImageData) -> bytes:
+    """Raw image bytes from an upload, or decoded from a base64 string / data URL"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return image
+
+    # Remove data URL prefix if present
+    if image.startswith("data:image"):
+        image = image.partition(",")[2]
+    return base64.b64decode(image)
+
+
+def _decode_image(image_data: bytes, color_order: str = "bgr") -> Optional[np.ndarray]:
+    """
+    Decode straight from the byte buffer into the 3-channel uint8 array the
+    encoder gets: one full-frame allocation, converted in place if needed.
+
+    ``color_order`` "bgr" reproduces exactly what the encoder has always been
+    given, so existing templates stay comparable: the old PIL path swapped
+    PIL's RGB to BGR for 3-channel images but handed RGBA images over as RGB,
+    and never applied EXIF orientation. "rgb" is the order dlib's model
+    expects and is a different encoder (face_embeddings.face_encoder_name).
+    Grayscale and palette images, which the old path rejected, come out as
+    3 channels.
+    """
+    flags = cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+    image_array = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), flags)
+    if image_array is None:
+        # Formats OpenCV cannot read (e.g. GIF) go through PIL, which decodes to RGB
+        try:
+            with Image.open(io.BytesIO(image_data)) as image:
+                image_array = np.array(image.convert("RGB"))
+        except Exception:
+            return None
+        if color_order == "bgr":
+            cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR, dst=image_array)
+        return image_array
+
+    if color_order == "rgb" or _has_alpha(image_data):
+        cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB, dst=image_array)
+    return image_array
+
+
+def _has_alpha(image_data: bytes) -> bool:
+    """Whether the image is RGBA (PIL only reads the header here)"""
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            return image.mode == "RGBA"
+    except Exception:
+        return False
+
+
+# Longest side of the grayscale copy used by FaceRecognitionService.precheck_image
+PRECHECK_DIMENSION = 320
+_REDUCED_GRAYSCALE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+)
+
+
+def _decode_precheck_image(image_data: bytes) -> Optional[np.ndarray]:
+    """
+    Decode a grayscale copy with its longest side at PRECHECK_DIMENSION.
+
+    JPEGs are decoded directly at 1/2, 1/4 or 1/8 scale (chosen from the
+    header), which costs a fraction of a full decode; the fixed working size
+    keeps sharpness comparable across capture resolutions.
+    """
+    try:
+        with Image.open(io.BytesIO(image_data)) as header:
+            longest_side = max(header.size)
+    except Exception:
+        return None
+
+    flag = cv2.IMREAD_GRAYSCALE
+    for factor, reduced_flag in _REDUCED_GRAYSCALE_FLAGS:
+        if longest_side // factor >= PRECHECK_DIMENSION:
+            flag = reduced_flag
+            break
+
+    gray = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), flag)
+    if gray is None:
+        return None
+
+    scale = PRECHECK_DIMENSION / max(gray.shape)
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
 # Utility functions for views
 def get_face_recognition_service():
-    """Get face recognition service instance"""
-    return FaceRecognitionService()
+    """Get the process-wide face recognition service instance"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = FaceRecognitionService()
+    return _service
+
+
+def warm_up_face_recognition_service(build_index=False):
+    """Warm up the shared service, logging instead of raising on failure"""
+    try:
+        return get_face_recognition_service().warm_up(build_index=build_index)
+    except Exception as e:
+        logger.error(f"Face recognition warm-up failed: {str(e)}")
+        return None
 
 
-def process_employee_face_registration(employee, base64_image):
-    """Process and store employee face data"""
+def process_employee_face_registration(employee, base64_image, add_template=False):
+    """
+    Process and store employee face data
+
+    The image replaces all of the employee's enrolled templates, or with
+    ``add_template`` is enrolled next to them (e.g. a different session or
+    lighting) provided it matches the face already registered.
+    """
     service = get_face_recognition_service()
 
-    # Validate image quality first
-    validation = service.validate_image_quality(base64_image)
+    # Validate image quality - this detects and encodes the face once, and the
+    # resulting encoding is stored as-is
+    validation = service.validate_image_quality(base64_image, operation="register")
 
     if not validation["is_valid"]:
         return {
@@ -379,38 +710,168 @@ def process_employee_face_registration(employee, base64_image):
             "recommendations": validation["recommendations"],
         }
 
-    # Encode face
-    face_data = service.encode_face_from_base64(base64_image)
+    face_data = validation.get("face_data")
 
     if not face_data:
         return {"success": False, "error": "Could not process face from image"}
 
-    # Store face encoding data
-    face_encoding_json = json.dumps(
-        {
-            "encoding": face_data["encoding"],
-            "quality": face_data["quality"],
-            "registered_date": str(timezone.now()),
-            "image_dimensions": face_data["image_dimensions"],
+    # Kept with the template so it can be re-encoded after an encoder change
+    image_data = _image_bytes(base64_image)
+
+    if not add_template:
+        template = store_employee_face_encoding(employee, face_data, image_data)
+        return {
+            "success": True,
+            "quality_score": face_data["quality"]["score"],
+            "template_id": template.pk,
+            "message": "Face registration successful",
         }
-    )
 
-    employee.face_recognition_data = face_encoding_json
-    employee.save()
+    # SECURITY: an extra template must be the same person, otherwise it would
+    # let someone else verify as this employee
+    stored_encodings, _ = get_cached_employee_face_encodings(employee)
+    if stored_encodings is not None:
+        face_distance = service.template_distance(
+            stored_encodings, np.asarray(face_data["encoding"])
+        )
+        if face_distance > service.tolerance:
+            return {
+                "success": False,
+                "error": "Face does not match the employee's registered face",
+                "issues": [
+                    f"Face distance {face_distance:.3f} is above the threshold {service.tolerance}"
+                ],
+                "recommendations": ["Make sure the employee being enrolled is in front of the camera"],
+            }
+
+    try:
+        template = append_employee_face_encoding(employee, face_data, image_data)
+    except ValidationError as e:
+        return {"success": False, "error": e.messages[0]}
 
     return {
         "success": True,
         "quality_score": face_data["quality"]["score"],
-        "message": "Face registration successful",
+        "template_id": template.pk,
+        "message": "Face template added",
     }
 
 
+def add_employee_face_template(employee, base64_image):
+    """Enroll an additional face template for an employee"""
+    return process_employee_face_registration(employee, base64_image, add_template=True)
+
+
+def remove_employee_face_template(employee, template_id):
+    """Remove one of an employee's enrolled face templates"""
+    if not delete_employee_face_encoding(employee, template_id):
+        return {"success": False, "error": "Face template not found"}
+    return {"success": True, "message": "Face template removed"}
+
+
 def verify_employee_face(employee, captured_base64):
     """Verify employee face against stored data"""
     if not employee.face_recognition_data:
         return {"success": False, "error": "No face data registered for this employee"}
 
+    stored_encodings, stored_quality = get_cached_employee_face_encodings(employee)
+    if stored_encodings is None:
+        return {"success": False, "error": "Invalid stored face encoding data"}
+
     service = get_face_recognition_service()
-    result = service.compare_faces(employee.face_recognition_data, captured_base64)
+    result = service.compare_faces(
+        stored_encodings, captured_base64, stored_quality=stored_quality
+    )
 
     return result
+
+
+FACE_VERIFICATION_TOKEN_SALT = "apps.assets.face-verification"
+
+
+def _face_verification_token_key(nonce):
+    return f"face-token:{nonce}"
+
+
+def issue_face_verification_token(employee, user, result):
+    """
+    Short-lived signed proof that ``employee`` was verified (e.g. over the
+    live-capture stream), so issue/return does not have to verify again.
+    Single use: its nonce is recorded in the cache and consumed by
+    check_face_verification_token.
+    """
+    max_age = getattr(settings, "FACE_VERIFICATION_TOKEN_MAX_AGE", 120)
+    nonce = secrets.token_urlsafe(16)
+    cache.add(_face_verification_token_key(nonce), employee.pk, timeout=max_age)
+    return signing.dumps(
+        {
+            "employee": employee.pk,
+            "user": user.pk,
+            "confidence": float(result["confidence"]),
+            "threshold": float(result.get("threshold", 0.0)),
+            "nonce": nonce,
+        },
+        salt=FACE_VERIFICATION_TOKEN_SALT,
+    )
+
+
+def check_face_verification_token(token, employee, user):
+    """Verification result for a token from issue_face_verification_token (consumes it)"""
+    max_age = getattr(settings, "FACE_VERIFICATION_TOKEN_MAX_AGE", 120)
+    try:
+        payload = signing.loads(token, salt=FACE_VERIFICATION_TOKEN_SALT, max_age=max_age)
+    except signing.SignatureExpired:
+        return {"success": False, "error": "Face verification has expired, please verify again"}
+    except signing.BadSignature:
+        return {"success": False, "error": "Invalid face verification token"}
+
+    if payload.get("employee") != employee.pk or payload.get("user") != user.pk:
+        return {"success": False, "error": "Face verification token does not match this employee"}
+
+    # delete() is atomic and reports whether the key existed: only one
+    # transaction can consume the token, unknown nonces are rejected
+    nonce = payload.get("nonce")
+    if not nonce or not cache.delete(_face_verification_token_key(nonce)):
+        return {"success": False, "error": "Face verification token was already used, please verify again"}
+
+    return {
+        "success": True,
+        "confidence": payload["confidence"],
+        "threshold": payload["threshold"],
+    }
+
+
+def identify_employee_face(captured_base64, limit=5):
+    """Find the active employees whose registered face best matches the captured image"""
+    service = get_face_recognition_service()
+    captured_data = service.encode_face(captured_base64, operation="identify")
+
+    if not captured_data:
+        return {
+            "success": False,
+            "matches": [],
+            "threshold": service.tolerance,
+            "error": "No face detected in captured image",
+        }
+
+    matches = face_index.search(
+        np.asarray(captured_data["encoding"]),
+        limit=limit,
+        max_distance=service.tolerance,
+    )
+
+    return {
+        "success": bool(matches),
+        "matches": [
+            {
+                "employee": employee_id,
+                "face_distance": round(distance, 3),
+                "confidence": round(1 - distance, 3),
+            }
+            for employee_id, distance in matches
+        ],
+        "threshold": service.tolerance,
+        "candidates_searched": face_index.employee_count,
+        "captured_quality": captured_data["quality"],
+        "timings": captured_data["timings"],
+    }
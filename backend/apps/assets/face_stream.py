@@ -0,0 +1,257 @@
+"""
+WebSocket endpoint for live-capture face verification.
+
+Instead of posting one frame per HTTP attempt and retrying, the client opens
+a socket for an employee and streams camera frames; each frame goes through
+the pre-detection quality gate and verification, and the server answers as
+soon as one matches. Only the newest frame is processed - frames that arrive
+while one is being verified replace each other rather than queueing.
+
+Protocol (routed from config/asgi.py):
+
+    connect  /ws/face-verify/?employee_id=<id>
+             authenticated by the JWT auth cookie, or ?token=<access token>
+    client   binary message: a JPEG/PNG frame
+             (or text {"frame": "<base64 or data URL>"})
+    server   {"type": "ready", "employee_id", "max_frames", "timeout"}
+             {"type": "frame", "frame": n, "status": "rejected", "issues", "recommendations"}
+             {"type": "frame", "frame": n, "status": "no_match", "confidence", "face_distance", "error"}
+             {"type": "frame", "frame": n, "status": "busy", "error"}
+             {"type": "match", "frame": n, "confidence", "face_distance",
+              "verification_token"}, then the socket is closed
+             {"type": "failed", "reason"}, then the socket is closed
+
+The verification_token can be sent with the asset issue/return request in
+place of a face image (see check_face_verification_token).
+"""
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http.cookie import parse_cookie
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .face_recognition_service import (
+    ImageData,
+    _image_bytes,
+    get_face_recognition_service,
+    issue_face_verification_token,
+    verify_employee_face,
+)
+from .face_worker import FaceWorkerUnavailable
+from .models import Employee
+
+logger = logging.getLogger(__name__)
+
+FACE_STREAM_PATH = "/ws/face-verify/"
+
+# Close codes (4000-4999 are application defined)
+CLOSE_NORMAL = 1000
+CLOSE_BAD_REQUEST = 4400
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+CLOSE_TOO_LARGE = 4413
+
+
+class FaceVerificationStream:
+    """State of one verification socket"""
+
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.max_frames = getattr(settings, "FACE_STREAM_MAX_FRAMES", 30)
+        self.timeout = getattr(settings, "FACE_STREAM_TIMEOUT", 30)
+        self.max_frame_bytes = getattr(settings, "FACE_STREAM_MAX_FRAME_BYTES", 5 * 2**20)
+        self.user = None
+        self.employee = None
+        self.closed = False
+        self._latest_frame = None
+        self._frame_ready = asyncio.Event()
+        self._disconnected = False
+
+    async def run(self):
+        message = await self.receive()
+        if message["type"] != "websocket.connect":
+            return
+        await self.send({"type": "websocket.accept"})
+
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        self.user = await sync_to_async(self._authenticate)(query)
+        if self.user is None:
+            await self.fail("Authentication credentials were not provided or are invalid", CLOSE_UNAUTHORIZED)
+            return
+
+        try:
+            employee_id = int(query.get("employee_id", [""])[0])
+        except ValueError:
+            await self.fail("employee_id is required", CLOSE_BAD_REQUEST)
+            return
+
+        self.employee = await sync_to_async(self._get_employee)(employee_id)
+        if self.employee is None:
+            await self.fail("Employee not found or inactive", CLOSE_NOT_FOUND)
+            return
+        if not self.employee.face_recognition_data:
+            await self.fail("No face data registered for this employee", CLOSE_BAD_REQUEST)
+            return
+
+        await self.send_json({
+            "type": "ready",
+            "employee_id": self.employee.employee_id,
+            "max_frames": self.max_frames,
+            "timeout": self.timeout,
+        })
+
+        reader = asyncio.ensure_future(self._read_frames())
+        try:
+            await asyncio.wait_for(self._verify_frames(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            await self.fail(f"No matching frame within {self.timeout}s")
+        finally:
+            reader.cancel()
+
+    async def _read_frames(self):
+        """Keep only the newest frame; a frame not yet picked up is replaced"""
+        while True:
+            message = await self.receive()
+            if message["type"] == "websocket.disconnect":
+                self._disconnected = True
+                self._frame_ready.set()
+                return
+            if message["type"] != "websocket.receive":
+                continue
+
+            frame = message.get("bytes")
+            if frame is None and message.get("text"):
+                try:
+                    frame = json.loads(message["text"]).get("frame")
+                except (ValueError, AttributeError):
+                    frame = None
+            if not frame:
+                await self.send_json({"type": "error", "error": "Expected an image frame"})
+                continue
+            if len(frame) > self.max_frame_bytes:
+                await self.fail(f"Frame exceeds {self.max_frame_bytes} bytes", CLOSE_TOO_LARGE)
+                self._frame_ready.set()
+                return
+
+            self._latest_frame = frame
+            self._frame_ready.set()
+
+    async def _verify_frames(self):
+        frames_processed = 0
+        while frames_processed < self.max_frames:
+            await self._frame_ready.wait()
+            self._frame_ready.clear()
+            if self._disconnected or self.closed:
+                return
+
+            frame, self._latest_frame = self._latest_frame, None
+            if frame is None:
+                continue
+            frames_processed += 1
+
+            # Off the event loop, and not serialised with other connections
+            result = await sync_to_async(self._process_frame, thread_sensitive=False)(frame)
+            result["frame"] = frames_processed
+            await self.send_json(result)
+
+            if result["type"] == "match":
+                await self.close(CLOSE_NORMAL)
+                return
+
+        await self.fail(f"No matching frame in {self.max_frames} attempts")
+
+    def _process_frame(self, frame: ImageData) -> dict:
+        try:
+            try:
+                image_data = _image_bytes(frame)
+            except ValueError:
+                return {"type": "frame", "status": "rejected", "issues": ["Invalid image data"], "recommendations": []}
+
+            precheck = get_face_recognition_service().precheck_image(image_data)
+            if precheck is not None:
+                return {
+                    "type": "frame",
+                    "status": "rejected",
+                    "issues": precheck["issues"],
+                    "recommendations": precheck["recommendations"],
+                }
+
+            result = verify_employee_face(self.employee, image_data)
+        except FaceWorkerUnavailable as e:
+            return {"type": "frame", "status": "busy", "error": str(e.detail)}
+        finally:
+            close_old_connections()
+
+        if result["success"]:
+            return {
+                "type": "match",
+                "confidence": result["confidence"],
+                "face_distance": result["face_distance"],
+                "threshold": result["threshold"],
+                "verification_token": issue_face_verification_token(
+                    self.employee, self.user, result
+                ),
+            }
+        return {
+            "type": "frame",
+            "status": "no_match",
+            "confidence": result.get("confidence", 0.0),
+            "face_distance": result.get("face_distance"),
+            "error": result.get("error"),
+        }
+
+    def _authenticate(self, query):
+        """User for the JWT in ?token= or the auth cookie (as for the REST API)"""
+        from dj_rest_auth.app_settings import api_settings
+        from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+
+        raw_token = query.get("token", [None])[0]
+        if not raw_token:
+            headers = dict(self.scope.get("headers", []))
+            cookies = parse_cookie(headers.get(b"cookie", b"").decode("latin-1"))
+            raw_token = cookies.get(api_settings.JWT_AUTH_COOKIE)
+        if not raw_token:
+            return None
+
+        authentication = JWTCookieAuthentication()
+        try:
+            user = authentication.get_user(authentication.get_validated_token(raw_token))
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            return None
+        finally:
+            close_old_connections()
+        return user if user.is_active else None
+
+    def _get_employee(self, employee_id):
+        try:
+            return Employee.objects.select_related("user").get(id=employee_id, is_active=True)
+        except Employee.DoesNotExist:
+            return None
+        finally:
+            close_old_connections()
+
+    async def send_json(self, data):
+        if not self.closed:
+            await self.send({"type": "websocket.send", "text": json.dumps(data, default=float)})
+
+    async def fail(self, reason, code=CLOSE_NORMAL):
+        await self.send_json({"type": "failed", "reason": reason})
+        await self.close(code)
+
+    async def close(self, code):
+        if not self.closed:
+            self.closed = True
+            await self.send({"type": "websocket.close", "code": code})
+
+
+async def face_verification_stream(scope, receive, send):
+    """ASGI application for FACE_STREAM_PATH"""
+    await FaceVerificationStream(scope, receive, send).run()
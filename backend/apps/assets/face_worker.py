@@ -0,0 +1,182 @@
+"""
+Process pool for CPU-bound face detection and encoding.
+
+A HOG pass plus landmark encoding holds a request thread (and mostly the
+GIL) for hundreds of milliseconds, so it can be run in a small pool of worker
+processes that load the dlib models once at start-up (FACE_WORKER_PROCESSES,
+off by default since each process holds its own copy). The number of jobs
+queued or running is bounded: when the pool is saturated callers get
+FaceWorkerBusy straight away instead of piling up behind slow requests.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+
+class FaceWorkerUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Face recognition is temporarily unavailable, please try again"
+    default_code = "face_worker_unavailable"
+
+
+class FaceWorkerBusy(FaceWorkerUnavailable):
+    default_detail = "Face recognition is busy, please try again shortly"
+    default_code = "face_worker_busy"
+
+
+class FaceWorkerTimeout(FaceWorkerUnavailable):
+    default_detail = "Face recognition took too long, please try again"
+    default_code = "face_worker_timeout"
+
+
+# FaceRecognitionService of the current worker process
+_worker_service = None
+
+
+def _initialize_worker():
+    """Set up Django and load the dlib models once per worker process"""
+    global _worker_service
+
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+    from .face_recognition_service import FaceRecognitionService
+
+    _worker_service = FaceRecognitionService()
+    # The first detection and encoding calls build dlib's lazily initialised
+    # state; do them here so the first job does not pay for it
+    _worker_service.load_models()
+
+
+def encode_face_in_worker(image_data):
+    """Returns (face data or None, stage timings)"""
+    timings = {}
+    face_data = _worker_service.encode_face_from_base64(image_data, timings=timings)
+    return face_data, timings
+
+
+class FaceWorkerPool:
+    """
+    Bounded front for a ProcessPoolExecutor.
+
+    ``max_pending`` counts jobs that are queued or running. A job that times
+    out keeps its slot until its process actually finishes, so a stuck
+    worker applies backpressure instead of letting more work queue behind it.
+    """
+
+    def __init__(self, processes: int, max_pending: int, timeout: float):
+        self.processes = processes
+        self.max_pending = max(max_pending, processes)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending) if processes > 0 else None
+        self._executor = None
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.processes > 0
+
+    def start(self):
+        """Start the worker processes now rather than on the first job"""
+        if not self.enabled:
+            return
+        executor = self._get_executor()
+        # Submitting a no-op per process forces every process to spawn and
+        # run the initializer, which loads the models
+        for future in [executor.submit(int) for _ in range(self.processes)]:
+            future.result()
+
+    def run(self, fn, *args):
+        """Run ``fn(*args)`` in a worker process and return its result"""
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            logger.warning(f"Face worker pool saturated ({self.max_pending} jobs pending)")
+            raise FaceWorkerBusy()
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._slots.release()
+            self._reset(e)
+            raise FaceWorkerUnavailable()
+        future.add_done_callback(lambda _future: self._slots.release())
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._count("timed_out")
+            logger.error(f"Face worker job exceeded {self.timeout}s")
+            raise FaceWorkerTimeout()
+        except BrokenProcessPool as e:
+            self._reset(e)
+            raise FaceWorkerUnavailable()
+
+        self._count("completed")
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "processes": self.processes,
+                "max_pending": self.max_pending,
+                "timeout": self.timeout,
+                "started": self._executor is not None,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "failed": self.failed,
+            }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a threaded WSGI worker can copy held locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_initialize_worker,
+                )
+            return self._executor
+
+    def _reset(self, error):
+        """Drop a broken executor so the next job starts a fresh pool"""
+        logger.error(f"Face worker pool failed, restarting: {error}")
+        self._count("failed")
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+face_worker_pool = FaceWorkerPool(
+    processes=getattr(settings, "FACE_WORKER_PROCESSES", 0),
+    max_pending=getattr(settings, "FACE_WORKER_MAX_PENDING", 8),
+    timeout=getattr(settings, "FACE_WORKER_TIMEOUT", 10.0),
+)
@@ -0,0 +1,52 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min, Sum
+
+from apps.assets.models import AssetTransaction, DailyTransactionRollup
+from apps.assets.rollups import rebuild_daily_transaction_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily transaction rollup the dashboards read from AssetTransaction. "
+        "Run once after deploying the rollup table, and for any dates whose transactions "
+        "were written without signals (bulk imports, raw SQL). Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First date to rebuild (YYYY-MM-DD, default: all)')
+        parser.add_argument('--to', dest='end', help='Last date to rebuild (YYYY-MM-DD, default: all)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rollup rows inserted per query')
+
+    def handle(self, *args, **options):
+        start = self.parse_date(options['start'])
+        end = self.parse_date(options['end'])
+        if start and end and start > end:
+            raise CommandError('--from is after --to')
+
+        written = rebuild_daily_transaction_rollup(start, end, batch_size=options['batch_size'])
+
+        rollups = DailyTransactionRollup.objects.all()
+        transactions = AssetTransaction.objects.all()
+        if start:
+            rollups = rollups.filter(date__gte=start)
+            transactions = transactions.filter(transaction_date__date__gte=start)
+        if end:
+            rollups = rollups.filter(date__lte=end)
+            transactions = transactions.filter(transaction_date__date__lte=end)
+        summary = rollups.aggregate(counted=Sum('count'), first=Min('date'), last=Max('date'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} rollup rows counting {summary['counted'] or 0} of "
+            f"{transactions.count()} transactions ({summary['first'] or '-'} to {summary['last'] or '-'})"
+        ))
+
+    @staticmethod
+    def parse_date(value):
+        if value is None:
+            return None
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'Invalid date: {value} (expected YYYY-MM-DD)')
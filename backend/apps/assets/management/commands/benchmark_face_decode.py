@@ -0,0 +1,159 @@
+import io
+import os
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from apps.assets.face_recognition_service import _decode_image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def decode_legacy(image_data):
+    """The decode path encode_face_from_base64 used before _decode_image"""
+    image = Image.open(io.BytesIO(image_data))
+    image_array = np.array(image)
+    if image_array.shape[2] == 4:
+        image_array = cv2.cvtColor(image_array, cv2.COLOR_RGBA2RGB)
+    elif len(image_array.shape) == 3 and image_array.shape[2] == 3:
+        image_array = cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB)
+    return image_array
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark image decoding for the face pipeline: the old PIL + NumPy copy + "
+        "cvtColor path against a single cv2.imdecode (BGR, and RGB converted in place). "
+        "Reports latency, traced peak memory, full-frame buffers and whether the "
+        "decoded pixels (and optionally encodings) match the old path."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('images', nargs='+', help='Face images or directories of them (JPEG/PNG)')
+        parser.add_argument(
+            '--resolutions', default='640x480,1280x720,1920x1080',
+            help="Comma-separated WIDTHxHEIGHT frames to fit each image into ('original' keeps it)"
+        )
+        parser.add_argument('--iterations', type=int, default=50, help='Decodes per image, resolution and path')
+        parser.add_argument(
+            '--encodings', action='store_true',
+            help='Also compare face encodings of the old and new BGR paths (slow)'
+        )
+
+    def handle(self, *args, **options):
+        sources = self.load_sources(options['images'])
+        paths = {
+            'legacy pil': (decode_legacy, 3),
+            'imdecode bgr': (lambda data: _decode_image(data, 'bgr'), 1),
+            'imdecode rgb': (lambda data: _decode_image(data, 'rgb'), 1),
+        }
+
+        for value in options['resolutions'].split(','):
+            resolution = self.parse_resolution(value)
+            frames = [self.encode_frame(image, resolution) for image in sources]
+            label = value.strip()
+            self.stdout.write(f"\n{label}: {len(frames)} JPEG frames, {options['iterations']} decodes each")
+            self.stdout.write(f"  {'path':<16}{'mean ms':>10}{'p50 ms':>10}{'peak MB':>10}{'buffers':>9}")
+
+            for name, (decode, buffers) in paths.items():
+                samples = []
+                for frame in frames:
+                    for _ in range(options['iterations']):
+                        started = time.perf_counter()
+                        decode(frame)
+                        samples.append((time.perf_counter() - started) * 1000)
+
+                # NumPy/OpenCV arrays are traced; PIL's own decode buffer is not,
+                # so it is added for the legacy path
+                tracemalloc.start()
+                image_array = decode(frames[0])
+                _current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                if decode is decode_legacy:
+                    peak += image_array.nbytes
+
+                self.stdout.write(
+                    f"  {name:<16}{np.mean(samples):>10.2f}{np.percentile(samples, 50):>10.2f}"
+                    f"{peak / 2**20:>10.2f}{buffers:>9}"
+                )
+
+            self.compare(frames, options['encodings'])
+
+    def compare(self, frames, encodings):
+        pixel_diffs = []
+        distances = []
+        for frame in frames:
+            legacy = decode_legacy(frame)
+            decoded = _decode_image(frame, 'bgr')
+            if legacy.shape != decoded.shape:
+                raise CommandError(f'Decoded shapes differ: {legacy.shape} vs {decoded.shape}')
+            pixel_diffs.append(np.abs(legacy.astype(np.int16) - decoded).mean())
+
+            if encodings:
+                import face_recognition
+
+                legacy_faces = face_recognition.face_encodings(legacy, model='large')
+                faces = face_recognition.face_encodings(decoded, model='large')
+                if len(legacy_faces) == 1 and len(faces) == 1:
+                    distances.append(float(face_recognition.face_distance(legacy_faces, faces[0])[0]))
+
+        self.stdout.write(
+            f"  imdecode bgr vs legacy: mean abs pixel difference {np.mean(pixel_diffs):.3f}"
+        )
+        if encodings:
+            if distances:
+                self.stdout.write(
+                    f"  encoding distance vs legacy: max {max(distances):.4f} over {len(distances)} faces"
+                )
+            else:
+                self.stdout.write('  encoding distance vs legacy: no single-face images to compare')
+
+    def load_sources(self, paths):
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(sorted(
+                    os.path.join(path, name) for name in os.listdir(path)
+                    if name.lower().endswith(IMAGE_EXTENSIONS)
+                ))
+            else:
+                files.append(path)
+
+        sources = []
+        for file_path in files:
+            try:
+                with Image.open(file_path) as image:
+                    sources.append(image.convert('RGB'))
+            except OSError as e:
+                raise CommandError(f'Cannot read {file_path}: {e}')
+        return sources
+
+    @staticmethod
+    def parse_resolution(value):
+        value = value.strip().lower()
+        if value == 'original':
+            return None
+        try:
+            width, height = (int(part) for part in value.split('x'))
+        except ValueError:
+            raise CommandError(f'Invalid resolution: {value} (expected WIDTHxHEIGHT)')
+        return width, height
+
+    @staticmethod
+    def encode_frame(image, resolution):
+        """Fit the image into a resolution-sized frame (like a webcam capture) and JPEG-encode it"""
+        if resolution is not None:
+            width, height = resolution
+            scale = min(width / image.width, height / image.height)
+            fitted = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+            frame = Image.new('RGB', resolution, (128, 128, 128))
+            frame.paste(fitted, ((width - fitted.width) // 2, (height - fitted.height) // 2))
+            image = frame
+
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        return buffer.getvalue()
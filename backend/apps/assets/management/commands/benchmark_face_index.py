@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.assets.face_index import FaceEmbeddingIndex, IVFFaceIndex, train_kmeans
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare recall and latency of the IVF face index against exact search, "
+        "on synthetic encodings or the registered ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=50000, help='Synthetic population size')
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--clusters', type=int, help='IVF buckets (default: sqrt of population)')
+        parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+        parser.add_argument('--limit', type=int, default=5, help='k for recall@k')
+        parser.add_argument('--noise', type=float, default=0.03,
+                            help='Per-dimension std of the capture noise added to query faces')
+        parser.add_argument('--from-db', action='store_true',
+                            help='Use registered encodings instead of synthetic ones')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+
+        if options['from_db']:
+            source = FaceEmbeddingIndex(refresh_seconds=0)
+            source.build()
+            if not source.size:
+                raise CommandError('No registered face encodings')
+            matrix = source._matrix[: source.size].copy()
+        else:
+            matrix = self._synthetic_encodings(rng, options['employees'])
+
+        employee_ids = np.arange(len(matrix))
+        picks = rng.integers(0, len(matrix), options['queries'])
+        queries = matrix[picks] + rng.normal(0, options['noise'], (len(picks), matrix.shape[1])).astype(np.float32)
+        limit = min(options['limit'], len(matrix))
+
+        exact = FaceEmbeddingIndex(refresh_seconds=0)
+        exact.load(employee_ids, matrix)
+        exact_results, exact_times = self._run(exact, queries, limit)
+
+        start = time.perf_counter()
+        clusters = options['clusters'] or max(1, int(np.sqrt(len(matrix))))
+        centroids = train_kmeans(matrix, clusters)
+        self.stdout.write(
+            f'{len(matrix)} encodings, {len(queries)} queries, {len(centroids)} buckets '
+            f'(trained in {time.perf_counter() - start:.2f}s)\n'
+        )
+
+        self.stdout.write(f"{'Index':<14}{'recall@1':>10}{f'recall@{limit}':>11}{'p50 ms':>10}{'p95 ms':>10}{'scored':>10}")
+        self._report('exact', exact_results, exact_results, exact_times, 1.0)
+
+        for nprobe in options['nprobe']:
+            ivf = IVFFaceIndex(refresh_seconds=0, centroids_path='', nprobe=nprobe)
+            ivf.load(employee_ids, matrix)
+            ivf.set_centroids(centroids)
+            results, times = self._run(ivf, queries, limit)
+            candidates = [ivf._candidate_rows(query) for query in queries[:50]]
+            scored = np.mean([len(matrix) if c is None else len(c) for c in candidates]) / len(matrix)
+            self._report(f'ivf nprobe={nprobe}', exact_results, results, times, scored)
+
+    def _synthetic_encodings(self, rng, count):
+        """Clustered vectors with the scale of dlib encodings (inter-person distance ~0.9)"""
+        groups = rng.normal(0, 0.09, (64, 128))
+        members = groups[rng.integers(0, len(groups), count)]
+        return (members + rng.normal(0, 0.055, (count, 128))).astype(np.float32)
+
+    def _run(self, index, queries, limit):
+        results, times = [], []
+        for query in queries:
+            start = time.perf_counter()
+            results.append([employee_id for employee_id, _ in index.search(query, limit=limit)])
+            times.append((time.perf_counter() - start) * 1000)
+        return results, np.array(times)
+
+    def _report(self, label, expected, actual, times, scored):
+        recall_1 = np.mean([a[:1] == e[:1] for e, a in zip(expected, actual)])
+        recall_k = np.mean([len(set(e) & set(a)) / len(e) for e, a in zip(expected, actual)])
+        self.stdout.write(
+            f'{label:<14}{recall_1:>10.3f}{recall_k:>11.3f}'
+            f'{np.percentile(times, 50):>10.3f}{np.percentile(times, 95):>10.3f}{scored:>10.1%}'
+        )
@@ -0,0 +1,220 @@
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from PIL import Image
+
+from apps.assets.face_recognition_service import FaceRecognitionService
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class Command(BaseCommand):
+    help = (
+        "Offline benchmark of the face pipeline (decode, detection, encoding, "
+        "quality assessment and comparison) on fixture or synthetic images at "
+        "several resolutions and detection models. Reports images/sec, per-stage "
+        "latency and peak memory, optionally saved as JSON to compare runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'images', nargs='*',
+            help='Fixture face images or directories of them (JPEG/PNG)'
+        )
+        parser.add_argument(
+            '--synthetic', type=int, default=0,
+            help='Add this many generated frames (no faces: measures decode and detection cost)'
+        )
+        parser.add_argument(
+            '--resolutions', default='640x480,1280x720,1920x1080',
+            help="Comma-separated WIDTHxHEIGHT frames to fit each image into ('original' keeps it)"
+        )
+        parser.add_argument('--models', default='hog', help="Comma-separated detection models: hog,cnn")
+        parser.add_argument('--iterations', type=int, default=3, help='Passes over the image set per run')
+        parser.add_argument(
+            '--detection-max-dimension', type=int, default=None,
+            help='Override FACE_DETECTION_MAX_DIMENSION (0 detects on the full frame)'
+        )
+        parser.add_argument('--output', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        sources = self.load_sources(options['images'], options['synthetic'])
+        if not sources:
+            raise CommandError('Give fixture images and/or --synthetic N')
+
+        resolutions = [self.parse_resolution(value) for value in options['resolutions'].split(',')]
+        models = [model.strip() for model in options['models'].split(',') if model.strip()]
+        for model in models:
+            if model not in ('hog', 'cnn'):
+                raise CommandError(f'Unknown detection model: {model}')
+
+        runs = []
+        for model in models:
+            service = FaceRecognitionService()
+            service.model = model
+            if options['detection_max_dimension'] is not None:
+                service.detection_max_dimension = options['detection_max_dimension']
+
+            # Load the dlib models outside the timed runs
+            service.encode_face_from_base64(self.encode_frame(sources[0][1], None))
+
+            for resolution in resolutions:
+                frames = [(name, self.encode_frame(image, resolution)) for name, image in sources]
+                runs.append(self.run(service, model, resolution, frames, options['iterations']))
+                self.print_run(runs[-1])
+
+        results = {
+            'created_at': timezone.now().isoformat(),
+            'environment': self.environment(),
+            'detection_max_dimension': runs[0]['detection_max_dimension'],
+            'images': [name for name, _image in sources],
+            'iterations': options['iterations'],
+            'runs': runs,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run(self, service, model, resolution, frames, iterations):
+        stage_samples = {}
+        reference = {}  # first encoding of each image, compared against on later passes
+        faces_found = 0
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for name, frame in frames:
+                timings = {}
+                face_data = service.encode_face_from_base64(frame, timings=timings)
+                if face_data:
+                    faces_found += 1
+                    encoding = np.asarray(face_data['encoding'])
+                    stage_started = time.perf_counter()
+                    service.template_distance(
+                        np.atleast_2d(reference.setdefault(name, encoding)), encoding
+                    )
+                    timings['compare_ms'] = (time.perf_counter() - stage_started) * 1000
+                for stage, value in timings.items():
+                    stage_samples.setdefault(stage[:-3], []).append(value)
+        elapsed = time.perf_counter() - start
+        _current, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        processed = iterations * len(frames)
+        return {
+            'model': model,
+            'resolution': 'original' if resolution is None else f'{resolution[0]}x{resolution[1]}',
+            'detection_max_dimension': service.detection_max_dimension,
+            'images_processed': processed,
+            'faces_found': faces_found,
+            'images_per_sec': round(processed / elapsed, 3),
+            'stages': {
+                stage: {
+                    'mean_ms': round(float(np.mean(samples)), 3),
+                    'p50_ms': round(float(np.percentile(samples, 50)), 3),
+                    'p95_ms': round(float(np.percentile(samples, 95)), 3),
+                }
+                for stage, samples in stage_samples.items()
+            },
+            # Python/NumPy allocations during the run, and the process-wide peak
+            # (which includes dlib's native allocations)
+            'traced_peak_mb': round(traced_peak / 2**20, 2),
+            'max_rss_mb': self.max_rss_mb(),
+        }
+
+    def print_run(self, run):
+        self.stdout.write(
+            f"\n{run['model']} @ {run['resolution']}: {run['images_per_sec']:.2f} images/sec, "
+            f"{run['faces_found']}/{run['images_processed']} faces, "
+            f"traced peak {run['traced_peak_mb']}MB, max RSS {run['max_rss_mb']}MB"
+        )
+        self.stdout.write(f"  {'stage':<16}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for stage, stats in run['stages'].items():
+            self.stdout.write(
+                f"  {stage:<16}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+            )
+
+    def load_sources(self, paths, synthetic):
+        sources = []
+        for path in paths:
+            if os.path.isdir(path):
+                files = sorted(
+                    os.path.join(path, name) for name in os.listdir(path)
+                    if name.lower().endswith(IMAGE_EXTENSIONS)
+                )
+            else:
+                files = [path]
+            for file_path in files:
+                try:
+                    with Image.open(file_path) as image:
+                        sources.append((os.path.basename(file_path), image.convert('RGB')))
+                except OSError as e:
+                    raise CommandError(f'Cannot read {file_path}: {e}')
+
+        rng = np.random.default_rng(0)
+        for i in range(synthetic):
+            # Smooth gradient plus sensor-like noise, so JPEG sizes are realistic
+            gradient = np.linspace(40, 200, 640, dtype=np.float32)[None, :, None]
+            frame = gradient + rng.normal(0, 12, (480, 640, 3))
+            sources.append((f'synthetic-{i}', Image.fromarray(np.clip(frame, 0, 255).astype(np.uint8))))
+        return sources
+
+    @staticmethod
+    def parse_resolution(value):
+        value = value.strip().lower()
+        if value == 'original':
+            return None
+        try:
+            width, height = (int(part) for part in value.split('x'))
+        except ValueError:
+            raise CommandError(f'Invalid resolution: {value} (expected WIDTHxHEIGHT)')
+        return width, height
+
+    @staticmethod
+    def encode_frame(image, resolution):
+        """Fit the image into a resolution-sized frame (like a webcam capture) and JPEG-encode it"""
+        if resolution is not None:
+            width, height = resolution
+            scale = min(width / image.width, height / image.height)
+            fitted = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+            frame = Image.new('RGB', resolution, (128, 128, 128))
+            frame.paste(fitted, ((width - fitted.width) // 2, (height - fitted.height) // 2))
+            image = frame
+
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        return buffer.getvalue()
+
+    @staticmethod
+    def max_rss_mb():
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return round(max_rss / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+    @staticmethod
+    def environment():
+        try:
+            import dlib
+            dlib_version = dlib.__version__
+        except ImportError:
+            dlib_version = None
+
+        return {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'dlib': dlib_version,
+        }
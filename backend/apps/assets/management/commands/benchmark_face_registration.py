@@ -0,0 +1,91 @@
+import base64
+import time
+
+import face_recognition
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.assets.face_recognition_service import get_face_recognition_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark face registration: the single-pass flow (validate and reuse "
+        "the encoding) against the previous validate-then-encode-again flow"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('images', nargs='+', help='Face image files (JPEG/PNG)')
+        parser.add_argument('--iterations', type=int, default=5, help='Runs per image and flow')
+
+    def handle(self, *args, **options):
+        images = []
+        for path in options['images']:
+            try:
+                with open(path, 'rb') as f:
+                    images.append((path, base64.b64encode(f.read()).decode()))
+            except OSError as e:
+                raise CommandError(f'Cannot read {path}: {e}')
+
+        service = get_face_recognition_service()
+        calls = {'detect': 0, 'encode': 0}
+        original_locations = face_recognition.face_locations
+        original_encodings = face_recognition.face_encodings
+
+        def counted_locations(*a, **kw):
+            calls['detect'] += 1
+            return original_locations(*a, **kw)
+
+        def counted_encodings(*a, **kw):
+            calls['encode'] += 1
+            return original_encodings(*a, **kw)
+
+        # Encode in this process (not the face worker pool) so the calls can be counted
+        def legacy_flow(image):
+            validation = service.validate_face_data(service.encode_face_from_base64(image))
+            if validation['is_valid']:
+                service.encode_face_from_base64(image)
+            return validation['is_valid']
+
+        def single_pass_flow(image):
+            validation = service.validate_face_data(service.encode_face_from_base64(image))
+            return validation['is_valid']
+
+        face_recognition.face_locations = counted_locations
+        face_recognition.face_encodings = counted_encodings
+        try:
+            # Warm up the dlib models so the first timed run is not penalised
+            single_pass_flow(images[0][1])
+
+            results = {}
+            for label, flow in (('legacy', legacy_flow), ('single-pass', single_pass_flow)):
+                calls['detect'] = calls['encode'] = 0
+                valid = 0
+                start = time.perf_counter()
+                for _path, image in images:
+                    for _ in range(options['iterations']):
+                        valid += flow(image)
+                elapsed = time.perf_counter() - start
+                runs = len(images) * options['iterations']
+                results[label] = {
+                    'ms': elapsed / runs * 1000,
+                    'detect': calls['detect'] / runs,
+                    'encode': calls['encode'] / runs,
+                    'valid': valid / runs,
+                }
+        finally:
+            face_recognition.face_locations = original_locations
+            face_recognition.face_encodings = original_encodings
+
+        self.stdout.write(f"{'Flow':<14}{'ms/registration':>18}{'detect calls':>15}{'encode calls':>15}{'valid':>8}")
+        for label, r in results.items():
+            self.stdout.write(
+                f"{label:<14}{r['ms']:>18.1f}{r['detect']:>15.2f}{r['encode']:>15.2f}{r['valid']:>8.0%}"
+            )
+
+        speedup = results['legacy']['ms'] / results['single-pass']['ms']
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {speedup:.2f}x'))
+        if results['single-pass']['valid'] < 1:
+            self.stdout.write(self.style.WARNING(
+                'Some images failed validation; the legacy flow only encoded those once, '
+                'so the speedup is below the 2x seen with registrable images.'
+            ))
@@ -0,0 +1,84 @@
+import base64
+import mimetypes
+import os
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.assets.uploads import FACE_IMAGE_PARSERS, get_face_image
+
+PATH = '/api/employees/verify-face/'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark face image uploads: request size and time to get the image "
+        "bytes out of a base64 JSON body, a multipart file and a raw image body"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('images', nargs='+', help='Face image files (JPEG/PNG)')
+        parser.add_argument('--iterations', type=int, default=200, help='Parses per image and format')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        iterations = options['iterations']
+
+        formats = {
+            'base64 json': lambda raw, content_type: factory.post(
+                PATH,
+                {
+                    'employee_id': 1,
+                    'face_data': f"data:{content_type};base64,{base64.b64encode(raw).decode()}",
+                },
+                format='json',
+            ),
+            'multipart': lambda raw, content_type: factory.post(
+                PATH,
+                {
+                    'employee_id': 1,
+                    'face_data': SimpleUploadedFile('face', raw, content_type=content_type),
+                },
+                format='multipart',
+            ),
+            'raw body': lambda raw, content_type: factory.post(
+                f'{PATH}?employee_id=1', raw, content_type=content_type
+            ),
+        }
+
+        self.stdout.write(f"{'Image':<24}{'Format':<14}{'bytes':>10}{'overhead':>10}{'parse ms':>10}")
+        for path in options['images']:
+            try:
+                with open(path, 'rb') as f:
+                    raw = f.read()
+            except OSError as e:
+                raise CommandError(f'Cannot read {path}: {e}')
+            content_type = mimetypes.guess_type(path)[0] or 'image/jpeg'
+
+            for label, build in formats.items():
+                size = len(build(raw, content_type).body)
+                requests = [build(raw, content_type) for _ in range(iterations)]
+
+                start = time.perf_counter()
+                for django_request in requests:
+                    image = self.read_image(django_request)
+                elapsed = time.perf_counter() - start
+
+                if image != raw:
+                    raise CommandError(f'{label} did not round-trip {path}')
+                self.stdout.write(
+                    f'{os.path.basename(path)[:23]:<24}{label:<14}{size:>10}'
+                    f'{(size - len(raw)) / len(raw):>10.1%}{elapsed / iterations * 1000:>10.3f}'
+                )
+
+    @staticmethod
+    def read_image(django_request):
+        """What the face views do: parse the request and get the image bytes"""
+        request = Request(django_request, parsers=[parser() for parser in FACE_IMAGE_PARSERS])
+        image = get_face_image(request, 'face_data')
+        if isinstance(image, str):
+            image = base64.b64decode(image.partition(',')[2])
+        return image
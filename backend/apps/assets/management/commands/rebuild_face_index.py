@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.assets.face_index import IVFFaceIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the IVF face identification index on all registered encodings "
+        "and save its centroids to FACE_INDEX_PATH"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clusters', type=int, help='Number of k-means buckets (default: sqrt of employees)')
+        parser.add_argument('--iterations', type=int, default=20, help='k-means iterations')
+
+    def handle(self, *args, **options):
+        index = IVFFaceIndex(
+            refresh_seconds=0,
+            centroids_path=settings.FACE_INDEX_PATH,
+            nprobe=settings.FACE_INDEX_NPROBE,
+        )
+        index.build()
+
+        if not index.size:
+            raise CommandError('No registered face encodings to train on')
+
+        start = time.perf_counter()
+        try:
+            centroids = index.train(clusters=options['clusters'], iterations=options['iterations'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        index.save_centroids(centroids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Trained {len(centroids)} buckets over {index.size} face templates '
+            f'in {time.perf_counter() - start:.2f}s -> {settings.FACE_INDEX_PATH}'
+        ))
+        if settings.FACE_INDEX_BACKEND != 'ivf':
+            self.stdout.write(self.style.WARNING(
+                "FACE_INDEX_BACKEND is not 'ivf'; identification keeps using exact search"
+            ))
+        else:
+            self.stdout.write(
+                f'Running workers load the new buckets within FACE_INDEX_REFRESH_SECONDS '
+                f'({settings.FACE_INDEX_REFRESH_SECONDS}s)'
+            )
+
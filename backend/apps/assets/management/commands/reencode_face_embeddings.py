@@ -0,0 +1,83 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from apps.assets.face_batch import (
+    prune_stale_face_templates,
+    reencode_face_templates,
+    stale_face_templates,
+)
+from apps.assets.face_embeddings import current_face_encoder
+from apps.assets.models import FaceEmbedding
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-encode stored face templates from their enrollment photos with the "
+        "current encoder (FACE_ENCODER_LANDMARKS, FACE_ENCODER_COLOR_ORDER and the "
+        "code's FACE_PREPROCESSING_REVISION). Re-encoded "
+        "copies are added next to the old templates and the job can be interrupted and re-run. It can "
+        "run ahead of the deploy, with the new settings in its environment; run "
+        "--prune once every process uses the new encoder."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes to encode with (default: number of CPUs)'
+        )
+        parser.add_argument('--batch-size', type=int, default=64, help='Templates committed per batch')
+        parser.add_argument('--limit', type=int, help='Stop after this many templates')
+        parser.add_argument(
+            '--status', action='store_true',
+            help='Only show stored templates per encoder and what is left to re-encode'
+        )
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Delete old-encoder templates of employees who have a current one, instead of re-encoding'
+        )
+
+    def handle(self, *args, **options):
+        encoder = current_face_encoder()
+        self.stdout.write(f'Current encoder: {encoder}')
+        for row in FaceEmbedding.objects.values('encoder', 'dims').annotate(templates=Count('id')).order_by('encoder'):
+            marker = '*' if row['encoder'] == encoder else ' '
+            self.stdout.write(f"  {marker} {row['encoder']:<32}{row['dims']:>6} dims{row['templates']:>8} templates")
+
+        if options['prune']:
+            deleted = prune_stale_face_templates()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} templates from other encoders'))
+            return
+
+        remaining = stale_face_templates().count()
+        self.stdout.write(f'{remaining} templates to re-encode')
+        if options['status'] or not remaining:
+            return
+
+        start = time.perf_counter()
+
+        def progress(totals):
+            done = totals['reencoded'] + len(totals['failed'])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"  {done}/{remaining} processed, {totals['reencoded']} re-encoded, "
+                f"{len(totals['failed'])} failed ({done / elapsed:.1f} templates/sec)"
+            )
+
+        totals = reencode_face_templates(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            limit=options['limit'],
+            progress=progress,
+        )
+
+        for failure in totals['failed']:
+            self.stdout.write(self.style.WARNING(
+                f"Template {failure['template_id']} of {failure['employee_id']}: {failure['error']}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-encoded {totals['reencoded']} templates in {time.perf_counter() - start:.1f}s, "
+            f"{len(totals['failed'])} failed (employees with no re-encoded template need to re-enroll)"
+        ))
@@ -0,0 +1,90 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.assets.face_batch import collect_face_photos, register_faces_in_bulk
+
+REPORT_FIELDS = (
+    'employee_id', 'name', 'photos', 'accepted', 'templates', 'status',
+    'quality_score', 'sharpness', 'brightness', 'issues',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Register employee faces in bulk from a directory or zip of photos named "
+        "after employee IDs (E1001.jpg, E1001_2.jpg or E1001/front.jpg). Photos are "
+        "validated and encoded in parallel and written in one bulk update, with a "
+        "per-employee quality report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Directory or .zip of employee photos')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes to encode photos with (default: number of CPUs)'
+        )
+        parser.add_argument(
+            '--skip-registered', action='store_true',
+            help='Leave employees who already have face data alone'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without saving')
+        parser.add_argument('--report', help='Write the per-employee report to this CSV file')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if not os.path.exists(source):
+            raise CommandError(f'{source} does not exist')
+
+        try:
+            photos = collect_face_photos(source)
+        except (OSError, ValueError) as e:  # zipfile.BadZipFile is a ValueError
+            raise CommandError(f'Cannot read {source}: {e}')
+        if not photos:
+            raise CommandError(f'No JPEG/PNG photos found in {source}')
+
+        self.stdout.write(f"Processing {len(photos)} photos with {options['workers']} workers...")
+        start = time.perf_counter()
+        result = register_faces_in_bulk(
+            photos,
+            workers=options['workers'],
+            skip_registered=options['skip_registered'],
+            dry_run=options['dry_run'],
+        )
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"\n{'Employee':<12}{'Photos':>8}{'Accepted':>10}{'Templates':>11}{'Quality':>9}  Status"
+        )
+        for row in result['employees']:
+            quality = f"{row['quality_score']:.2f}" if row['quality_score'] is not None else '-'
+            line = (
+                f"{row['employee_id']:<12}{row['photos']:>8}{row['accepted']:>10}"
+                f"{row['templates']:>11}{quality:>9}  {row['status']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if row['status'] == 'failed' else line)
+            for issue in row['issues']:
+                self.stdout.write(f"{'':<14}{issue}")
+
+        for path in result['unmatched']:
+            self.stdout.write(self.style.WARNING(f'No active employee matches {path}'))
+
+        if options['report']:
+            with open(options['report'], 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+                writer.writeheader()
+                for row in result['employees']:
+                    writer.writerow({**row, 'issues': '; '.join(row['issues'])})
+            self.stdout.write(f"Report written to {options['report']}")
+
+        failed = sum(row['status'] == 'failed' for row in result['employees'])
+        summary = (
+            f"\n{result['registered']} employees registered ({result['templates']} templates), "
+            f"{failed} failed, {len(result['unmatched'])} photos unmatched "
+            f"in {elapsed:.1f}s ({len(photos) / elapsed:.1f} photos/sec)"
+        )
+        if options['dry_run']:
+            summary += ' - dry run, nothing saved'
+        self.stdout.write(self.style.SUCCESS(summary))
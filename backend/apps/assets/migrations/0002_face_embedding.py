@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:22
+
+import json
+import struct
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of face_embeddings.pack_face_encoding (format version 1)
+_HEADER = struct.Struct("<BBH")
+
+
+def _pack(encoding):
+    return _HEADER.pack(1, 0, len(encoding)) + struct.pack(f"<{len(encoding)}f", *encoding)
+
+
+def _unpack(data):
+    _version, _flags, dims = _HEADER.unpack_from(data)
+    return list(struct.unpack_from(f"<{dims}f", data, _HEADER.size))
+
+
+def move_encodings_to_binary(apps, schema_editor):
+    """Move the JSON encoding list out of face_recognition_data into FaceEmbedding rows"""
+    Employee = apps.get_model("assets", "Employee")
+    FaceEmbedding = apps.get_model("assets", "FaceEmbedding")
+
+    employees = Employee.objects.exclude(face_recognition_data__isnull=True).exclude(
+        face_recognition_data=""
+    )
+    for employee in employees.iterator(chunk_size=500):
+        try:
+            data = json.loads(employee.face_recognition_data)
+        except ValueError:
+            continue
+
+        encoding = data.pop("encoding", None)
+        if not encoding:
+            continue
+
+        FaceEmbedding.objects.create(
+            employee=employee,
+            vector=_pack(encoding),
+            quality_score=data.get("quality", {}).get("score", 0.0),
+        )
+        data["embedding_dimensions"] = len(encoding)
+        # update() keeps Employee.updated_at untouched
+        Employee.objects.filter(pk=employee.pk).update(face_recognition_data=json.dumps(data))
+
+
+def move_encodings_to_json(apps, schema_editor):
+    Employee = apps.get_model("assets", "Employee")
+    FaceEmbedding = apps.get_model("assets", "FaceEmbedding")
+
+    for embedding in FaceEmbedding.objects.order_by("employee_id", "-created_at").iterator(
+        chunk_size=500
+    ):
+        employee = Employee.objects.get(pk=embedding.employee_id)
+        try:
+            data = json.loads(employee.face_recognition_data or "{}")
+        except ValueError:
+            data = {}
+        if "encoding" in data:
+            continue
+
+        data.pop("embedding_dimensions", None)
+        data["encoding"] = _unpack(bytes(embedding.vector))
+        Employee.objects.filter(pk=employee.pk).update(face_recognition_data=json.dumps(data))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaceEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector', models.BinaryField()),
+                ('quality_score', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='face_embeddings', to='assets.employee')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.RunPython(move_encodings_to_binary, move_encodings_to_json),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0002_face_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faceembedding',
+            name='dims',
+            field=models.PositiveSmallIntegerField(default=128),
+        ),
+        migrations.AddField(
+            model_name='faceembedding',
+            name='encoder',
+            field=models.CharField(db_index=True, default='dlib_resnet_v1-large', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='faceembedding',
+            name='model_name',
+            field=models.CharField(default='hog', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='faceembedding',
+            name='source_image',
+            field=models.FileField(blank=True, upload_to='face_enrollments/%Y/%m/'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+
+
+def backfill_transaction_rollup(apps, schema_editor):
+    """Count the transactions that existed before the rollup table (rollups.rebuild_daily_transaction_rollup)"""
+    AssetTransaction = apps.get_model('assets', 'AssetTransaction')
+    DailyTransactionRollup = apps.get_model('assets', 'DailyTransactionRollup')
+
+    counts = (
+        AssetTransaction.objects.values(
+            'transaction_type',
+            'face_verification_success',
+            day=TruncDate('transaction_date'),
+            department=F('employee__department'),
+        )
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    DailyTransactionRollup.objects.all().delete()
+    DailyTransactionRollup.objects.bulk_create(
+        (
+            DailyTransactionRollup(
+                date=row['day'],
+                department_id=row['department'],
+                transaction_type=row['transaction_type'],
+                face_verified=row['face_verification_success'],
+                count=row['count'],
+            )
+            for row in counts.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_daily_transaction_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_transaction_rollup, migrations.RunPython.noop),
+    ]
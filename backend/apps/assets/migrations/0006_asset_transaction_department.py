@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def record_transaction_departments(apps, schema_editor):
+    """Existing transactions get their employee's current department, as the rollup counted them"""
+    AssetTransaction = apps.get_model('assets', 'AssetTransaction')
+    Employee = apps.get_model('assets', 'Employee')
+    AssetTransaction.objects.filter(department__isnull=True).update(
+        department=Subquery(Employee.objects.filter(pk=OuterRef('employee')).values('department')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0005_backfill_transaction_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assettransaction',
+            name='department',
+            field=models.ForeignKey(blank=True, editable=False, help_text="Employee's department when the transaction was recorded", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='asset_transactions', to='assets.department'),
+        ),
+        migrations.RunPython(record_transaction_departments, migrations.RunPython.noop),
+    ]
@@ -53,6 +53,29 @@ class Employee(models.Model):
     class Meta:
         ordering = ['user__first_name', 'user__last_name']
 
+class FaceEmbedding(models.Model):
+    """
+    Face encoding registered for an employee, stored as packed float32 bytes
+    (see face_embeddings.pack_face_encoding)
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='face_embeddings')
+    vector = models.BinaryField()
+    quality_score = models.FloatField(default=0.0)
+    # What produced the vector: vectors from different encoders are not
+    # comparable (see face_embeddings.current_face_encoder)
+    model_name = models.CharField(max_length=20, default='hog')
+    encoder = models.CharField(max_length=50, default='dlib_resnet_v1-large', db_index=True)
+    dims = models.PositiveSmallIntegerField(default=128)
+    # Enrollment photo, kept so the template can be re-encoded after an encoder change
+    source_image = models.FileField(upload_to='face_enrollments/%Y/%m/', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Face embedding for {self.employee.employee_id} ({self.created_at:%Y-%m-%d})"
+
+    class Meta:
+        ordering = ['-created_at']
+
 class Asset(models.Model):
     STATUS_CHOICES = [
         ('available', _("Available")),
@@ -118,8 +141,17 @@ class AssetTransaction(models.Model):
 
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='transactions')
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='asset_transactions')
+    department = models.ForeignKey(
+        Department,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='asset_transactions',
+        help_text="Employee's department when the transaction was recorded",
+    )
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
-    transaction_date = models.DateTimeField(auto_now_add=True)
+    transaction_date = models.DateTimeField(auto_now_add=True, db_index=True)
     processed_by = models.ForeignKey(
         User, 
         on_delete=models.SET_NULL, 
@@ -142,6 +174,13 @@ class AssetTransaction(models.Model):
     def __str__(self):
         return f"{self.transaction_type.title()} - {self.asset.name} - {self.employee.name}"
 
+    def save(self, *args, **kwargs):
+        # Counted in DailyTransactionRollup under this department even if the
+        # employee moves later
+        if self.department_id is None and self.employee_id is not None:
+            self.department_id = self.employee.department_id
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-transaction_date']
         
@@ -150,4 +189,30 @@ class AssetTransaction(models.Model):
         """Return human-readable verification status"""
         if self.face_verification_success:
             return f"Verified ({self.face_verification_confidence:.1%})"
-        return "Not Verified"
\ No newline at end of file
+        return "Not Verified"
+
+
+class DailyTransactionRollup(models.Model):
+    """
+    Transactions per day (in TIME_ZONE), department recorded on the
+    transaction, type and face verification outcome. Kept up to date as
+    transactions are created, updated and deleted (see rollups.py);
+    backfill_transaction_rollup rebuilds it.
+    """
+    date = models.DateField()
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='transaction_rollups')
+    transaction_type = models.CharField(max_length=10, choices=AssetTransaction.TRANSACTION_TYPES)
+    face_verified = models.BooleanField()
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date} {self.department} {self.transaction_type}: {self.count}"
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'department', 'transaction_type', 'face_verified'],
+                name='unique_daily_transaction_rollup',
+            ),
+        ]
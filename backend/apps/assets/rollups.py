@@ -0,0 +1,146 @@
+"""
+Maintenance of DailyTransactionRollup, the per-day transaction counts the
+dashboards read instead of scanning AssetTransaction.
+
+Rows are keyed on the local date (TIME_ZONE) of the transaction, the department
+recorded on it (its employee's when it was created), its type and whether the
+face was verified.
+Transactions bump their row as they are created and deleted, and move between
+rows when an update changes their key (see signals.py);
+anything that bypasses signals (bulk_create, queryset.update/delete, raw SQL)
+is reconciled by rebuilding the affected dates with
+rebuild_daily_transaction_rollup / backfill_transaction_rollup. Transactions
+that predate the table are counted by migration 0005.
+"""
+from datetime import date
+from typing import Dict, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard_cache
+from .models import AssetTransaction, DailyTransactionRollup
+
+
+# Fields of AssetTransaction that decide its rollup row
+ROLLUP_FIELDS = frozenset(
+    {"department", "department_id", "transaction_date", "transaction_type", "face_verification_success"}
+)
+
+
+def rollup_key(asset_transaction: AssetTransaction) -> Dict:
+    return {
+        "date": timezone.localdate(asset_transaction.transaction_date),
+        "department_id": asset_transaction.department_id
+        or asset_transaction.employee.department_id,
+        "transaction_type": asset_transaction.transaction_type,
+        "face_verified": asset_transaction.face_verification_success,
+    }
+
+
+def stored_rollup_key(asset_transaction: AssetTransaction) -> Optional[Dict]:
+    """Rollup key of the transaction as currently saved (None when it is new)"""
+    if asset_transaction._state.adding:
+        return None
+    row = (
+        AssetTransaction.objects.filter(pk=asset_transaction.pk)
+        .values("transaction_date", "transaction_type", "face_verification_success")
+        .annotate(counted_department=Coalesce("department", "employee__department"))
+        .first()
+    )
+    if row is None:
+        return None
+    return {
+        "date": timezone.localdate(row["transaction_date"]),
+        "department_id": row["counted_department"],
+        "transaction_type": row["transaction_type"],
+        "face_verified": row["face_verification_success"],
+    }
+
+
+def record_transaction(asset_transaction: AssetTransaction, delta: int = 1):
+    """
+    Add ``delta`` to the rollup row of a transaction, creating the row on the
+    first transaction of its key. Runs in the caller's database transaction, so
+    a rolled back transaction leaves the rollup untouched.
+    """
+    _add_to_rollup(rollup_key(asset_transaction), delta)
+
+
+def move_transaction(asset_transaction: AssetTransaction, stored_key: Optional[Dict]):
+    """
+    Move an updated transaction from the rollup row of ``stored_key`` (its key
+    before the update) to the row of its new key, when they differ
+    """
+    key = rollup_key(asset_transaction)
+    if stored_key is None or stored_key == key:
+        return
+    _add_to_rollup(stored_key, -1)
+    _add_to_rollup(key, 1)
+
+
+def _add_to_rollup(key: Dict, delta: int):
+    rows = DailyTransactionRollup.objects.filter(**key)
+    if delta < 0:
+        # A row that was never counted (e.g. not backfilled yet) stays at zero
+        rows.filter(count__gte=-delta).update(count=F("count") + delta)
+        return
+
+    if rows.update(count=F("count") + delta):
+        return
+    try:
+        with transaction.atomic():
+            DailyTransactionRollup.objects.create(count=delta, **key)
+    except IntegrityError:
+        # Another request created the row since the update above
+        rows.update(count=F("count") + delta)
+
+
+def rebuild_daily_transaction_rollup(
+    start: Optional[date] = None, end: Optional[date] = None, batch_size: int = 1000
+) -> int:
+    """
+    Recount the rollup rows of local dates ``start`` to ``end`` (inclusive, open
+    when None) from AssetTransaction, with one group-by. Idempotent; returns the
+    number of rows written.
+    """
+    transactions = AssetTransaction.objects.all()
+    rollups = DailyTransactionRollup.objects.all()
+    if start is not None:
+        transactions = transactions.filter(transaction_date__date__gte=start)
+        rollups = rollups.filter(date__gte=start)
+    if end is not None:
+        transactions = transactions.filter(transaction_date__date__lte=end)
+        rollups = rollups.filter(date__lte=end)
+
+    counts = (
+        transactions.values(
+            "transaction_type",
+            "face_verification_success",
+            day=TruncDate("transaction_date"),
+            # Rows bulk created without a department count under the employee's
+            counted_department=Coalesce("department", "employee__department"),
+        )
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+        created = DailyTransactionRollup.objects.bulk_create(
+            (
+                DailyTransactionRollup(
+                    date=row["day"],
+                    department_id=row["counted_department"],
+                    transaction_type=row["transaction_type"],
+                    face_verified=row["face_verification_success"],
+                    count=row["count"],
+                )
+                for row in counts.iterator()
+            ),
+            batch_size=batch_size,
+        )
+        transaction.on_commit(invalidate_dashboard_cache)
+    return len(created)
@@ -2,7 +2,8 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from .models import Department, Employee, Asset, AssetTransaction
-from .face_recognition_service import verify_employee_face
+from .face_recognition_service import check_face_verification_token, verify_employee_face
+from .face_worker import FaceWorkerUnavailable
 
 User = get_user_model()
 
@@ -238,6 +239,7 @@ class AssetSerializer(serializers.ModelSerializer):
 
 class AssetTransactionCreateSerializer(serializers.ModelSerializer):
     face_verification_data = serializers.CharField(write_only=True, required=False)
+    face_verification_token = serializers.CharField(write_only=True, required=False)
 
     class Meta:
         model = AssetTransaction
@@ -249,6 +251,7 @@ class AssetTransactionCreateSerializer(serializers.ModelSerializer):
             "return_condition",
             "damage_notes",
             "face_verification_data",
+            "face_verification_token",
         ]
 
     def validate(self, attrs):
@@ -259,6 +262,7 @@ class AssetTransactionCreateSerializer(serializers.ModelSerializer):
         asset = attrs.get("asset")
         transaction_type = attrs.get("transaction_type")
         face_verification_data = attrs.get("face_verification_data")
+        face_verification_token = attrs.get("face_verification_token")
 
         print(
             f"Validating transaction - Employee: {employee.name if employee else None}, Asset: {asset.name if asset else None}"
@@ -288,16 +292,21 @@ class AssetTransactionCreateSerializer(serializers.ModelSerializer):
         if employee and employee.face_recognition_data:
             print(f"Employee {employee.name} has face data, checking verification...")
 
-            if not face_verification_data:
+            if not (face_verification_data or face_verification_token):
                 raise serializers.ValidationError(
                     f"Face verification is required for employee '{employee.name}' who has registered face data"
                 )
 
-            # Perform face verification
+            # Perform face verification, or accept one already done over the stream
             try:
-                verification_result = verify_employee_face(
-                    employee, face_verification_data
-                )
+                if face_verification_token:
+                    verification_result = check_face_verification_token(
+                        face_verification_token, employee, self.context["request"].user
+                    )
+                else:
+                    verification_result = verify_employee_face(
+                        employee, face_verification_data
+                    )
                 print(f"Verification result: {verification_result}")
 
                 if not verification_result["success"]:
@@ -317,6 +326,8 @@ class AssetTransactionCreateSerializer(serializers.ModelSerializer):
                     f"Face verification successful with confidence: {verification_result.get('confidence', 0.0):.1%}"
                 )
 
+            except FaceWorkerUnavailable:
+                raise
             except Exception as e:
                 print(f"Face verification error: {str(e)}")
                 raise serializers.ValidationError(
@@ -336,6 +347,7 @@ class AssetTransactionCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Remove face_verification_data from validated_data before creating
         validated_data.pop("face_verification_data", None)
+        validated_data.pop("face_verification_token", None)
 
         # Get the current user as processed_by
         request = self.context.get("request")
@@ -417,7 +429,8 @@ class FaceVerificationSerializer(serializers.Serializer):
     """Serializer for face verification endpoint"""
 
     employee_id = serializers.IntegerField()
-    face_data = serializers.CharField()
+    # face_data (base64 string or uploaded file) is read by the view with
+    # uploads.get_face_image
 
     def validate(self, data):
         try:
@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .dashboard import invalidate_dashboard_cache
+from .face_embeddings import face_encoding_cache
+from .face_index import schedule_face_index_refresh
+from .models import Asset, AssetTransaction, Department, Employee, FaceEmbedding
+from .rollups import ROLLUP_FIELDS, move_transaction, record_transaction, stored_rollup_key
+
+
+@receiver([post_save, post_delete], sender=Employee)
+def invalidate_employee_face_cache(sender, instance, **kwargs):
+    """Drop the cached face encoding whenever the employee changes"""
+    face_encoding_cache.invalidate(instance.pk)
+    # Registration, re-registration and (de)activation all change who can be identified
+    schedule_face_index_refresh(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=FaceEmbedding)
+def invalidate_face_embedding_cache(sender, instance, **kwargs):
+    face_encoding_cache.invalidate(instance.employee_id)
+    schedule_face_index_refresh(instance.employee_id)
+
+
+@receiver(post_delete, sender=FaceEmbedding)
+def delete_face_enrollment_image(sender, instance, **kwargs):
+    """Remove the enrollment photo once no template (e.g. a re-encoded copy) uses it"""
+    name = instance.source_image.name
+    if name and not FaceEmbedding.objects.filter(source_image=name).exists():
+        transaction.on_commit(lambda: instance.source_image.storage.delete(name))
+
+
+@receiver(pre_save, sender=AssetTransaction)
+def remember_transaction_rollup_key(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the rollup key of an updated transaction, to move it if the key changes"""
+    instance._stored_rollup_key = None
+    if raw or (update_fields is not None and ROLLUP_FIELDS.isdisjoint(update_fields)):
+        return
+    instance._stored_rollup_key = stored_rollup_key(instance)
+
+
+@receiver(post_save, sender=AssetTransaction)
+def count_transaction_in_rollup(sender, instance, created, raw=False, **kwargs):
+    # Fixtures are loaded raw; backfill_transaction_rollup counts them
+    if raw:
+        return
+    if created:
+        record_transaction(instance)
+    else:
+        move_transaction(instance, instance._stored_rollup_key)
+
+
+@receiver(post_delete, sender=AssetTransaction)
+def uncount_transaction_in_rollup(sender, instance, **kwargs):
+    record_transaction(instance, delta=-1)
+
+
+@receiver([post_save, post_delete], sender=Asset)
+@receiver([post_save, post_delete], sender=AssetTransaction)
+@receiver([post_save, post_delete], sender=Employee)
+@receiver([post_save, post_delete], sender=Department)
+def invalidate_dashboard(sender, **kwargs):
+    # After commit, so a payload rebuilt right away sees the write
+    transaction.on_commit(invalidate_dashboard_cache)
@@ -1,3 +1,611 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+
+from .face_embeddings import (
+    FaceEncodingCache,
+    append_employee_face_encoding,
+    current_face_embeddings,
+    current_face_encoder,
+    delete_employee_face_encoding,
+    pack_face_encoding,
+    unpack_face_encoding,
+)
+from .face_index import FaceEmbeddingIndex, IVFFaceIndex, train_kmeans
+from .face_recognition_service import (
+    _decode_image,
+    check_face_verification_token,
+    issue_face_verification_token,
+)
+from .face_stream import CLOSE_NORMAL, CLOSE_TOO_LARGE, FaceVerificationStream
+from .management.commands.benchmark_face_decode import decode_legacy
+from .models import Asset, AssetTransaction, DailyTransactionRollup, Department, Employee
+from .rollups import rebuild_daily_transaction_rollup
+
+
+def seed_employees(department, count, start=0):
+    """``count`` employees of ``department``, each holding one assigned asset"""
+    users = User.objects.bulk_create(
+        [
+            User(email=f"employee{index}@example.com", first_name="Employee", last_name=str(index))
+            for index in range(start, start + count)
+        ]
+    )
+    employees = Employee.objects.bulk_create(
+        [
+            Employee(
+                user=user,
+                employee_id=f"E{start + index}",
+                phone_number="0123456789",
+                department=department,
+            )
+            for index, user in enumerate(users)
+        ]
+    )
+    Asset.objects.bulk_create(
+        [
+            Asset(
+                name="Laptop",
+                serial_number=f"SN{employee.employee_id}",
+                department=department,
+                status="assigned",
+                current_holder=employee,
+            )
+            for employee in employees
+        ]
+    )
+    return employees
+
+
+def seed_transactions(employees, per_employee):
+    """
+    ``per_employee`` transactions of each employee spread over the last weeks,
+    bulk created (no signals) and then counted by rebuilding the rollup
+    """
+    now = timezone.now()
+    transactions = AssetTransaction.objects.bulk_create(
+        [
+            AssetTransaction(
+                asset=employee.current_assets.first(),
+                employee=employee,
+                transaction_type="issue" if index % 2 else "return",
+                face_verification_success=index % 3 == 0,
+            )
+            for employee in employees
+            for index in range(per_employee)
+        ]
+    )
+    # transaction_date is auto_now_add, so it can only be backdated afterwards
+    for index, txn in enumerate(transactions):
+        AssetTransaction.objects.filter(pk=txn.pk).update(
+            transaction_date=now - timedelta(days=index % 20, hours=1)
+        )
+    rebuild_daily_transaction_rollup()
+
+
+class DashboardQueryCountTests(TestCase):
+    """The dashboard endpoints read a fixed number of queries however big the tables are"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="admin@example.com", password="secret")
+        cls.departments = [Department.objects.create(name=f"Department {i}") for i in range(3)]
+        cls.employees = seed_employees(cls.departments[0], 5)
+        seed_transactions(cls.employees, 4)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        cache.clear()
+
+    def assertDashboardQueries(self, name, num):
+        cache.clear()
+        with self.assertNumQueries(num):
+            response = self.client.get(f"/api/dashboard/{name}/")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def grow(self):
+        """Ten times the employees, assets and transactions, in every department"""
+        start = len(self.employees)
+        for department in self.departments:
+            employees = seed_employees(department, 15, start=start)
+            seed_transactions(employees, 10)
+            start += len(employees)
+
+    def test_stats(self):
+        response = self.assertDashboardQueries("stats", 7)
+        self.assertEqual(response.json()["total_transactions"], 20)
+        self.grow()
+        response = self.assertDashboardQueries("stats", 7)
+        self.assertEqual(response.json()["total_transactions"], 20 + 3 * 15 * 10)
+        self.assertEqual(response.json()["total_employees"], 5 + 3 * 15)
+
+    def test_summary(self):
+        self.assertDashboardQueries("summary", 4)
+        self.grow()
+        self.assertDashboardQueries("summary", 4)
+
+    def test_charts(self):
+        self.assertDashboardQueries("charts", 3)
+        self.grow()
+        response = self.assertDashboardQueries("charts", 3)
+        self.assertEqual(
+            sum(day["issues"] + day["returns"] for day in response.json()["weekly_transactions"]),
+            AssetTransaction.objects.filter(
+                transaction_date__date__gte=timezone.localdate() - timedelta(days=6)
+            ).count(),
+        )
+
+    def test_cached_payload_revalidates_without_queries(self):
+        response = self.assertDashboardQueries("stats", 7)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/api/dashboard/stats/", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, 304)
+
+
+class DailyTransactionRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="IT")
+        cls.employee = seed_employees(cls.department, 1)[0]
+        cls.asset = cls.employee.current_assets.first()
+
+    def rollup_counts(self):
+        return {
+            (row.transaction_type, row.face_verified): row.count
+            for row in DailyTransactionRollup.objects.filter(department=self.department)
+        }
+
+    def create_transaction(self, **kwargs):
+        return AssetTransaction.objects.create(asset=self.asset, employee=self.employee, **kwargs)
+
+    def test_created_and_deleted_transactions_are_counted(self):
+        first = self.create_transaction(transaction_type="issue", face_verification_success=True)
+        self.create_transaction(transaction_type="issue", face_verification_success=True)
+        self.create_transaction(transaction_type="return")
+        self.assertEqual(self.rollup_counts(), {("issue", True): 2, ("return", False): 1})
+
+        first.delete()
+        self.assertEqual(self.rollup_counts(), {("issue", True): 1, ("return", False): 1})
+
+    def test_updated_transactions_move_between_rows(self):
+        txn = self.create_transaction(transaction_type="issue")
+        txn.face_verification_success = True
+        txn.save()
+        self.assertEqual(self.rollup_counts(), {("issue", False): 0, ("issue", True): 1})
+
+        txn.transaction_type = "return"
+        txn.save(update_fields=["transaction_type"])
+        self.assertEqual(
+            self.rollup_counts(), {("issue", False): 0, ("issue", True): 0, ("return", True): 1}
+        )
+
+        # Saves that cannot change the key do not look the transaction up
+        txn.notes = "Checked"
+        with self.assertNumQueries(1):
+            txn.save(update_fields=["notes"])
+        self.assertEqual(
+            self.rollup_counts(), {("issue", False): 0, ("issue", True): 0, ("return", True): 1}
+        )
+
+    def test_updates_after_the_employee_moved_stay_in_the_recorded_department(self):
+        txn = self.create_transaction(transaction_type="issue")
+        self.employee.department = Department.objects.create(name="Finance")
+        self.employee.save()
+
+        txn.transaction_type = "return"
+        txn.save()
+        self.assertEqual(self.rollup_counts(), {("issue", False): 0, ("return", False): 1})
+        self.assertFalse(DailyTransactionRollup.objects.exclude(department=self.department).exists())
+
+        txn.delete()
+        self.assertEqual(self.rollup_counts(), {("issue", False): 0, ("return", False): 0})
+
+    def test_rebuild_matches_signals(self):
+        self.create_transaction(transaction_type="issue", face_verification_success=True)
+        self.create_transaction(transaction_type="return")
+        counted = self.rollup_counts()
+
+        DailyTransactionRollup.objects.all().delete()
+        rebuild_daily_transaction_rollup()
+        self.assertEqual(self.rollup_counts(), counted)
+
+
+class FaceImageDecodeTests(TestCase):
+    """cv2.imdecode must hand the encoder the pixels the original PIL path did"""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.pixels = (rng.random((120, 160, 3)) * 255).astype(np.uint8)
+
+    def encode(self, array, image_format, **kwargs):
+        buffer = io.BytesIO()
+        Image.fromarray(array).save(buffer, image_format, **kwargs)
+        return buffer.getvalue()
+
+    def assertLegacyPixels(self, image_data):
+        np.testing.assert_array_equal(_decode_image(image_data, "bgr"), decode_legacy(image_data))
+
+    def test_jpeg(self):
+        self.assertLegacyPixels(self.encode(self.pixels, "JPEG", quality=90))
+
+    def test_exif_orientation_is_ignored(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated 90 degrees
+        self.assertLegacyPixels(self.encode(self.pixels, "JPEG", quality=90, exif=exif))
+
+    def test_png(self):
+        self.assertLegacyPixels(self.encode(self.pixels, "PNG"))
+
+    def test_png_with_alpha(self):
+        alpha = np.full(self.pixels.shape[:2], 200, dtype=np.uint8)
+        self.assertLegacyPixels(self.encode(np.dstack([self.pixels, alpha]), "PNG"))
+
+    def test_existing_templates_stay_current(self):
+        self.assertEqual(current_face_encoder(), "dlib_resnet_v1-large")
+
+
+class FaceVerificationTokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="IT")
+        cls.employee, cls.other_employee = seed_employees(department, 2)
+        cls.user = User.objects.create_user(email="clerk@example.com", password="secret")
+        cls.other_user = User.objects.create_user(email="other@example.com", password="secret")
+
+    def setUp(self):
+        cache.clear()
+        self.token = issue_face_verification_token(
+            self.employee, self.user, {"confidence": 0.9, "threshold": 0.6}
+        )
+
+    def test_single_use(self):
+        result = check_face_verification_token(self.token, self.employee, self.user)
+        self.assertEqual(result, {"success": True, "confidence": 0.9, "threshold": 0.6})
+
+        result = check_face_verification_token(self.token, self.employee, self.user)
+        self.assertFalse(result["success"])
+        self.assertIn("already used", result["error"])
+
+    def test_other_employee_or_user(self):
+        for employee, user in ((self.other_employee, self.user), (self.employee, self.other_user)):
+            result = check_face_verification_token(self.token, employee, user)
+            self.assertFalse(result["success"])
+            self.assertIn("does not match", result["error"])
+
+        # Rejected attempts do not consume it
+        self.assertTrue(check_face_verification_token(self.token, self.employee, self.user)["success"])
+
+    @override_settings(FACE_VERIFICATION_TOKEN_MAX_AGE=120)
+    def test_expired(self):
+        with mock.patch("django.core.signing.time.time", return_value=time.time() + 121):
+            result = check_face_verification_token(self.token, self.employee, self.user)
+        self.assertFalse(result["success"])
+        self.assertIn("expired", result["error"])
+
+    def test_tampered(self):
+        result = check_face_verification_token(self.token[:-2] + "xx", self.employee, self.user)
+        self.assertFalse(result["success"])
+
+
+class FaceVerificationStreamTests(SimpleTestCase):
+    """The stream's frame limits, against a fake socket and a verifier that never matches"""
+
+    def setUp(self):
+        employee = SimpleNamespace(pk=1, employee_id="E1", face_recognition_data="{}")
+        service = mock.Mock(precheck_image=mock.Mock(return_value=None))
+        self.verify = mock.Mock(return_value={"success": False, "confidence": 0.1, "error": "No match"})
+        for target, value in (
+            ("apps.assets.face_stream.FaceVerificationStream._authenticate", SimpleNamespace(pk=1)),
+            ("apps.assets.face_stream.FaceVerificationStream._get_employee", employee),
+            ("apps.assets.face_stream.get_face_recognition_service", service),
+        ):
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch("apps.assets.face_stream.verify_employee_face", self.verify)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stream(self, frames):
+        """
+        Run a connection sending ``frames`` one at a time (the next once the
+        previous one was answered); returns the JSON messages and close code
+        """
+        async def run():
+            incoming = asyncio.Queue()
+            pending = iter(frames)
+            messages = []
+            closed = []
+
+            def next_frame():
+                frame = next(pending, None)
+                incoming.put_nowait(
+                    {"type": "websocket.receive", "bytes": frame}
+                    if frame is not None
+                    else {"type": "websocket.disconnect"}
+                )
+
+            async def receive():
+                return await incoming.get()
+
+            async def send(message):
+                if message["type"] == "websocket.close":
+                    closed.append(message["code"])
+                elif message["type"] == "websocket.send":
+                    data = json.loads(message["text"])
+                    messages.append(data)
+                    if data["type"] in ("ready", "frame"):
+                        next_frame()
+
+            incoming.put_nowait({"type": "websocket.connect"})
+            scope = {"type": "websocket", "query_string": b"employee_id=1"}
+            await asyncio.wait_for(FaceVerificationStream(scope, receive, send).run(), timeout=10)
+            return messages, closed
+
+        return asyncio.run(run())
+
+    @override_settings(FACE_STREAM_MAX_FRAMES=3)
+    def test_stops_after_max_frames(self):
+        messages, closed = self.stream([b"frame"] * 10)
+
+        self.assertEqual([m["status"] for m in messages if m["type"] == "frame"], ["no_match"] * 3)
+        self.assertEqual(messages[-1], {"type": "failed", "reason": "No matching frame in 3 attempts"})
+        self.assertEqual(closed, [CLOSE_NORMAL])
+        self.assertEqual(self.verify.call_count, 3)
+
+    @override_settings(FACE_STREAM_MAX_FRAME_BYTES=100)
+    def test_rejects_oversized_frames(self):
+        messages, closed = self.stream([b"x" * 101, b"frame"])
+
+        self.assertEqual(messages[-1], {"type": "failed", "reason": "Frame exceeds 100 bytes"})
+        self.assertEqual(closed, [CLOSE_TOO_LARGE])
+        self.verify.assert_not_called()
+
+
+class FaceEncodingPackingTests(SimpleTestCase):
+    def test_round_trip(self):
+        encoding = np.random.default_rng(0).normal(size=128).astype(np.float32)
+        packed = pack_face_encoding(encoding.tolist())
+
+        self.assertEqual(len(packed), 4 + 128 * 4)
+        unpacked = unpack_face_encoding(memoryview(packed))
+        self.assertEqual(unpacked.dtype, np.float32)
+        np.testing.assert_array_equal(unpacked, encoding)
+
+    def test_unsupported_version(self):
+        packed = bytearray(pack_face_encoding([0.5] * 128))
+        packed[0] = 2
+        with self.assertRaisesMessage(ValueError, "Unsupported face embedding format version: 2"):
+            unpack_face_encoding(bytes(packed))
+
+
+class FaceEmbeddingMigrationTests(TransactionTestCase):
+    """0002 moves the JSON encoding out of face_recognition_data into a FaceEmbedding row"""
+
+    migrate_from = [("assets", "0001_initial")]
+    migrate_to = [("assets", "0002_face_embedding")]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        self.old_apps = executor.loader.project_state(self.migrate_from).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_encoding_moved_and_metadata_kept(self):
+        User = self.old_apps.get_model("users", "User")
+        Department = self.old_apps.get_model("assets", "Department")
+        Employee = self.old_apps.get_model("assets", "Employee")
+        encoding = [i / 128 for i in range(128)]
+        metadata = {"quality": {"score": 0.8}, "registered_at": "2025-01-01T00:00:00"}
+        employee = Employee.objects.create(
+            user=User.objects.create(email="legacy@example.com"),
+            employee_id="E1",
+            phone_number="0123456789",
+            department=Department.objects.create(name="IT"),
+            face_recognition_data=json.dumps({**metadata, "encoding": encoding}),
+        )
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        new_apps = executor.loader.project_state(self.migrate_to).apps
+        FaceEmbedding = new_apps.get_model("assets", "FaceEmbedding")
+
+        embedding = FaceEmbedding.objects.get(employee_id=employee.pk)
+        np.testing.assert_allclose(unpack_face_encoding(bytes(embedding.vector)), encoding, rtol=1e-6)
+        self.assertEqual(embedding.quality_score, 0.8)
+        data = json.loads(new_apps.get_model("assets", "Employee").objects.get(pk=employee.pk).face_recognition_data)
+        self.assertEqual(data, {**metadata, "embedding_dimensions": 128})
+
+
+def face_data(seed=0):
+    encoding = np.random.default_rng(seed).normal(size=128).astype(np.float32)
+    return {
+        "encoding": encoding.tolist(),
+        "quality": {"score": 0.9},
+        "image_dimensions": [480, 640],
+    }
+
+
+@override_settings(FACE_MAX_TEMPLATES=3)
+class FaceTemplateTests(TestCase):
+    def setUp(self):
+        self.employee = seed_employees(Department.objects.create(name="IT"), 1)[0]
+
+    def test_template_limit(self):
+        for seed in range(3):
+            append_employee_face_encoding(self.employee, face_data(seed))
+
+        with self.assertRaises(ValidationError):
+            append_employee_face_encoding(self.employee, face_data(3))
+        self.assertEqual(current_face_embeddings().filter(employee=self.employee).count(), 3)
+        self.assertEqual(json.loads(self.employee.face_recognition_data)["template_count"], 3)
+
+    def test_delete_templates(self):
+        templates = [append_employee_face_encoding(self.employee, face_data(seed)) for seed in range(2)]
+
+        self.assertTrue(delete_employee_face_encoding(self.employee, templates[0].pk))
+        self.assertEqual(json.loads(self.employee.face_recognition_data)["template_count"], 1)
+        self.assertFalse(delete_employee_face_encoding(self.employee, templates[0].pk))
+
+        self.assertTrue(delete_employee_face_encoding(self.employee, templates[1].pk))
+        self.employee.refresh_from_db()
+        self.assertIsNone(self.employee.face_recognition_data)
+
+
+class FaceEncodingCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = FaceEncodingCache(max_size=2)
+        self.now = timezone.now()
+        self.employees = [SimpleNamespace(pk=pk, updated_at=self.now) for pk in range(3)]
+
+    def put(self, employee):
+        self.cache.put(employee, np.full((1, 128), employee.pk, np.float32), {"score": 0.9})
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(self.cache.get(self.employees[0]))
+        self.put(self.employees[0])
+        encoding, quality = self.cache.get(self.employees[0])
+
+        self.assertEqual(encoding[0, 0], 0)
+        self.assertEqual(quality, {"score": 0.9})
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_stale_updated_at(self):
+        self.put(self.employees[0])
+        reregistered = SimpleNamespace(pk=0, updated_at=self.now + timedelta(seconds=1))
+
+        self.assertIsNone(self.cache.get(reregistered))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_lru_eviction(self):
+        self.put(self.employees[0])
+        self.put(self.employees[1])
+        self.cache.get(self.employees[0])
+        self.put(self.employees[2])
+
+        self.assertIsNone(self.cache.get(self.employees[1]))
+        self.assertIsNotNone(self.cache.get(self.employees[0]))
+        self.assertIsNotNone(self.cache.get(self.employees[2]))
+        self.assertEqual(
+            {key: self.cache.stats()[key] for key in ("size", "hits", "misses", "evictions")},
+            {"size": 2, "hits": 3, "misses": 1, "evictions": 1},
+        )
+
+    def test_invalidate(self):
+        self.put(self.employees[0])
+        self.cache.invalidate(0)
+        self.cache.invalidate(1)
+
+        self.assertIsNone(self.cache.get(self.employees[0]))
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+
+class IVFFaceIndexTests(SimpleTestCase):
+    """
+    With every bucket probed the IVF index must agree with the exact one, and
+    its buckets must together hold every row exactly once
+    """
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        employee_ids = np.repeat(np.arange(1, 201), 2)[:300]
+        matrix = self.rng.normal(size=(len(employee_ids), 128)).astype(np.float32)
+        centroids = train_kmeans(matrix, 8, iterations=5)
+
+        # refresh_seconds=0: loaded indexes are never rebuilt from the database
+        self.exact = FaceEmbeddingIndex(refresh_seconds=0)
+        self.ivf = IVFFaceIndex(refresh_seconds=0, centroids_path="", nprobe=len(centroids))
+        # load() adopts the arrays it is given, so each index gets its own
+        self.exact.load(employee_ids.copy(), matrix.copy())
+        self.ivf.load(employee_ids.copy(), matrix.copy())
+        self.ivf.set_centroids(centroids)
+
+    def assertSameMatches(self):
+        for _ in range(20):
+            row = self.rng.integers(self.exact.size)
+            query = self.exact._matrix[row] + self.rng.normal(scale=0.3, size=128)
+            exact = self.exact.search(query, limit=5)
+            ivf = self.ivf.search(query, limit=5)
+
+            self.assertEqual([employee_id for employee_id, _ in ivf], [employee_id for employee_id, _ in exact])
+            np.testing.assert_allclose([d for _, d in ivf], [d for _, d in exact], rtol=1e-6)
+
+    def assertBucketsConsistent(self):
+        ivf = self.ivf
+        rows = sorted(row for bucket in ivf._buckets for row in bucket)
+        self.assertEqual(rows, list(range(ivf.size)))
+        for centroid, bucket in enumerate(ivf._buckets):
+            for position, row in enumerate(bucket):
+                self.assertEqual(ivf._assignments[row], centroid)
+                self.assertEqual(ivf._bucket_positions[row], position)
+
+    def test_matches_exact_index(self):
+        self.assertSameMatches()
+        self.assertBucketsConsistent()
+
+    def test_matches_after_upsert_and_remove(self):
+        for employee_id in (3, 150, 200):
+            self.exact.remove(employee_id)
+            self.ivf.remove(employee_id)
+        for employee_id in (1, 151, 500, 501):
+            encodings = self.rng.normal(size=(3, 128)).astype(np.float32)
+            self.exact.upsert(employee_id, encodings)
+            self.ivf.upsert(employee_id, encodings)
+
+        self.assertEqual(self.ivf.size, self.exact.size)
+        self.assertSameMatches()
+        self.assertBucketsConsistent()
+
+
+class ValidateFaceImageViewTests(TestCase):
+    def test_response_has_no_encoding(self):
+        user = User.objects.create_user(email="admin@example.com", password="x")
+        client = APIClient()
+        client.force_authenticate(user)
+        service = mock.Mock()
+        service.validate_image_quality.return_value = {
+            "is_valid": True,
+            "quality_score": 0.9,
+            "issues": [],
+            "recommendations": [],
+            "face_data": {"encoding": [0.1] * 128, "quality": {"score": 0.9}},
+        }
+
+        with mock.patch("apps.assets.views.get_face_recognition_service", return_value=service):
+            response = client.post(
+                "/api/employees/validate-face-image/",
+                {"face_image_data": "data:image/jpeg;base64,AAAA"},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {"is_valid": True, "quality_score": 0.9, "issues": [], "recommendations": []},
+        )
+        self.assertNotIn(b"encoding", response.content)
@@ -0,0 +1,65 @@
+"""
+Face image uploads.
+
+The face endpoints historically take the image as a base64 string inside a
+JSON body. They also accept the image as a multipart/form-data file, or as
+the whole request body (image/jpeg, image/png or application/octet-stream,
+with the other fields in the query string), which avoids the ~33% base64
+overhead and the string decode on the server.
+"""
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils.datastructures import MultiValueDict
+from rest_framework.parsers import (
+    BaseParser,
+    DataAndFiles,
+    FormParser,
+    JSONParser,
+    MultiPartParser,
+)
+
+# Name of the uploaded file that holds a raw image request body
+RAW_IMAGE_FIELD = "image"
+
+
+class RawImageParser(BaseParser):
+    """
+    Parses a request whose body is the image itself. The body becomes the
+    uploaded file RAW_IMAGE_FIELD and the query parameters become the data.
+    """
+
+    media_type = "image/*"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context["request"]
+        upload = SimpleUploadedFile(RAW_IMAGE_FIELD, stream.read(), content_type=media_type)
+        return DataAndFiles(
+            request.query_params.copy(),
+            MultiValueDict({RAW_IMAGE_FIELD: [upload]}),
+        )
+
+
+class OctetStreamImageParser(RawImageParser):
+    media_type = "application/octet-stream"
+
+
+# Parser classes for the views that take a face image
+FACE_IMAGE_PARSERS = [
+    JSONParser,
+    FormParser,
+    MultiPartParser,
+    RawImageParser,
+    OctetStreamImageParser,
+]
+
+
+def get_face_image(request, field):
+    """
+    Get the face image sent for ``field``
+
+    Returns the raw bytes of a multipart file named ``field`` or of a raw
+    image body, otherwise the base64 string sent as ``field`` (None if absent)
+    """
+    upload = request.FILES.get(field) or request.FILES.get(RAW_IMAGE_FIELD)
+    if upload is not None:
+        return upload.read()
+    return request.data.get(field)
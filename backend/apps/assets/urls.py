@@ -32,8 +32,13 @@ urlpatterns = [
     
     # Face Recognition URLs
     path('employees/<int:employee_id>/face/', views.update_employee_face_data, name='employee-face-update'),
+    path('employees/<int:employee_id>/face/templates/', views.employee_face_templates_view, name='employee-face-templates'),
+    path('employees/<int:employee_id>/face/templates/<int:template_id>/', views.employee_face_template_detail_view, name='employee-face-template-detail'),
     path('employees/verify-face/', views.verify_face_view, name='employee-face-verify'),
     path('employees/validate-face-image/', views.validate_face_image_view, name='validate-face-image'),
+    path('employees/identify-face/', views.identify_face_view, name='employee-face-identify'),
+    path('face/cache-stats/', views.face_encoding_cache_stats_view, name='face-cache-stats'),
+    path('face/metrics/', views.face_pipeline_metrics_view, name='face-metrics'),
     
     # Dashboard URLs
     path('dashboard/stats/', views.dashboard_stats_view, name='dashboard-stats'),
@@ -1,13 +1,12 @@
 from rest_framework import generics, status, filters
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Q, Sum
-from django.utils import timezone
+from django.db.models import Count, Q
 from django.core.exceptions import ValidationError
-from datetime import timedelta, date
-from .models import Department, Employee, Asset, AssetTransaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from .models import Department, Employee, Asset, AssetTransaction, FaceEmbedding
 from .serializers import (
     DepartmentSerializer,
     EmployeeSerializer,
@@ -19,11 +18,21 @@ from .serializers import (
     FaceVerificationSerializer,
 )
 from .face_recognition_service import (
+    add_employee_face_template,
+    check_face_verification_token,
     get_face_recognition_service,
+    identify_employee_face,
     process_employee_face_registration,
+    remove_employee_face_template,
     verify_employee_face,
 )
+from .dashboard import cached_dashboard_payload, employee_transaction_counts
+from .face_embeddings import face_encoding_cache
+from .face_metrics import face_pipeline_metrics
+from .face_worker import FaceWorkerUnavailable, face_worker_pool
+from .uploads import FACE_IMAGE_PARSERS, get_face_image
 from apps.utils.pagination import CustomPageNumberPagination
+from apps.disclaimer.permissions import IsAdmin
 
 
 class DepartmentListCreateView(generics.ListCreateAPIView):
@@ -363,155 +372,26 @@ def departments_public_list_view(request):
         )
 
 
+def _dashboard_response(request, name):
+    """
+    Cached dashboard payload, or 304 Not Modified when the client's
+    If-None-Match still matches its ETag (the frontend polls these)
+    """
+    payload, etag = cached_dashboard_payload(name)
+    response = get_conditional_response(request, etag=etag) or Response(payload)
+    response["ETag"] = etag
+    # Browsers may keep it but must revalidate before reuse
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def dashboard_stats_view(request):
     """Get comprehensive dashboard statistics"""
 
     try:
-        # Basic counts
-        total_employees = Employee.objects.filter(is_active=True).count()
-        total_assets = Asset.objects.count()
-        total_departments = Department.objects.count()
-
-        # Asset status counts
-        assets_assigned = Asset.objects.filter(status="assigned").count()
-        assets_available = Asset.objects.filter(status="available").count()
-        assets_maintenance = Asset.objects.filter(status="maintenance").count()
-        assets_retired = Asset.objects.filter(status="retired").count()
-
-        # Recent transactions (last 7 days)
-        week_ago = timezone.now() - timedelta(days=7)
-        recent_transactions = AssetTransaction.objects.filter(
-            transaction_date__gte=week_ago
-        ).count()
-
-        # Weekly trends (last 7 days)
-        weekly_data = []
-        for i in range(7):
-            target_date = timezone.now().date() - timedelta(
-                days=6 - i
-            )  # Start from 6 days ago
-            daily_issues = AssetTransaction.objects.filter(
-                transaction_date__date=target_date, transaction_type="issue"
-            ).count()
-            daily_returns = AssetTransaction.objects.filter(
-                transaction_date__date=target_date, transaction_type="return"
-            ).count()
-
-            weekly_data.append(
-                {
-                    "date": target_date.strftime("%Y-%m-%d"),
-                    "issues": daily_issues,
-                    "returns": daily_returns,
-                }
-            )
-
-        # Department distribution with correct asset counts
-        dept_stats = (
-            Department.objects.annotate(
-                employee_count=Count(
-                    "employees", filter=Q(employees__is_active=True), distinct=True
-                ),
-                asset_count=Count("assets", distinct=True),
-            )
-            .values("name", "employee_count", "asset_count")
-            .order_by("name")
-        )
-
-        # Monthly trends for the current year
-        current_year = timezone.now().year
-        monthly_data = []
-        for month in range(1, 13):
-            month_issues = AssetTransaction.objects.filter(
-                transaction_date__year=current_year,
-                transaction_date__month=month,
-                transaction_type="issue",
-            ).count()
-            month_returns = AssetTransaction.objects.filter(
-                transaction_date__year=current_year,
-                transaction_date__month=month,
-                transaction_type="return",
-            ).count()
-
-            monthly_data.append(
-                {
-                    "month": month,
-                    "month_name": date(current_year, month, 1).strftime("%b"),
-                    "issues": month_issues,
-                    "returns": month_returns,
-                }
-            )
-
-        # Asset value statistics
-        total_asset_value = (
-            Asset.objects.aggregate(total_value=Sum("purchase_cost"))["total_value"]
-            or 0
-        )
-
-        # Face verification statistics
-        total_transactions_with_verification = AssetTransaction.objects.count()
-        successful_verifications = AssetTransaction.objects.filter(
-            face_verification_success=True
-        ).count()
-
-        verification_rate = 0
-        if total_transactions_with_verification > 0:
-            verification_rate = round(
-                (successful_verifications / total_transactions_with_verification) * 100,
-                2,
-            )
-
-        # Recent activity (last 24 hours)
-        yesterday = timezone.now() - timedelta(days=1)
-        recent_activity = {
-            "new_employees": Employee.objects.filter(created_at__gte=yesterday).count(),
-            "new_assets": Asset.objects.filter(created_at__gte=yesterday).count(),
-            "recent_issues": AssetTransaction.objects.filter(
-                transaction_date__gte=yesterday, transaction_type="issue"
-            ).count(),
-            "recent_returns": AssetTransaction.objects.filter(
-                transaction_date__gte=yesterday, transaction_type="return"
-            ).count(),
-        }
-
-        data = {
-            # Basic counts
-            "total_employees": total_employees,
-            "total_assets": total_assets,
-            "total_departments": total_departments,
-            # Asset status
-            "assets_assigned": assets_assigned,
-            "assets_available": assets_available,
-            "assets_maintenance": assets_maintenance,
-            "assets_retired": assets_retired,
-            # Transactions
-            "recent_transactions": recent_transactions,
-            "total_transactions": AssetTransaction.objects.count(),
-            # Time-based data
-            "weekly_data": weekly_data,
-            "monthly_data": monthly_data,
-            # Department data
-            "department_distribution": list(dept_stats),
-            # Value and verification stats
-            "total_asset_value": float(total_asset_value),
-            "verification_rate": verification_rate,
-            "successful_verifications": successful_verifications,
-            # Recent activity
-            "recent_activity": recent_activity,
-            # Computed metrics
-            "asset_utilization_rate": round(
-                (assets_assigned / total_assets * 100) if total_assets > 0 else 0, 2
-            ),
-            "average_assets_per_department": round(
-                total_assets / total_departments if total_departments > 0 else 0, 2
-            ),
-            "average_assets_per_employee": round(
-                assets_assigned / total_employees if total_employees > 0 else 0, 2
-            ),
-        }
-
-        return Response(data)
+        return _dashboard_response(request, "stats")
 
     except Exception as e:
         return Response(
@@ -537,18 +417,7 @@ def dashboard_summary_view(request):
     """Get quick dashboard summary for mobile or quick checks"""
 
     try:
-        summary = {
-            "employees": Employee.objects.filter(is_active=True).count(),
-            "assets": Asset.objects.count(),
-            "departments": Department.objects.count(),
-            "recent_transactions": AssetTransaction.objects.filter(
-                transaction_date__gte=timezone.now() - timedelta(days=7)
-            ).count(),
-            "assets_assigned": Asset.objects.filter(status="assigned").count(),
-            "timestamp": timezone.now().isoformat(),
-        }
-
-        return Response(summary)
+        return _dashboard_response(request, "summary")
 
     except Exception as e:
         return Response(
@@ -563,53 +432,7 @@ def dashboard_charts_data_view(request):
     """Get data specifically formatted for charts"""
 
     try:
-        # Asset status pie chart data
-        asset_status_data = {
-            "labels": ["Assigned", "Available", "Maintenance", "Retired"],
-            "values": [
-                Asset.objects.filter(status="assigned").count(),
-                Asset.objects.filter(status="available").count(),
-                Asset.objects.filter(status="maintenance").count(),
-                Asset.objects.filter(status="retired").count(),
-            ],
-        }
-
-        # Weekly transactions bar chart
-        weekly_data = []
-        for i in range(7):
-            target_date = timezone.now().date() - timedelta(days=6 - i)
-            daily_data = {
-                "date": target_date.strftime("%Y-%m-%d"),
-                "label": target_date.strftime("%a"),
-                "issues": AssetTransaction.objects.filter(
-                    transaction_date__date=target_date, transaction_type="issue"
-                ).count(),
-                "returns": AssetTransaction.objects.filter(
-                    transaction_date__date=target_date, transaction_type="return"
-                ).count(),
-            }
-            weekly_data.append(daily_data)
-
-        # Department assets chart with proper asset counts
-        dept_data = (
-            Department.objects.annotate(asset_count=Count("assets", distinct=True))
-            .values("name", "asset_count")
-            .filter(asset_count__gt=0)
-            .order_by("name")
-        )
-
-        department_chart_data = {
-            "labels": [dept["name"] for dept in dept_data],
-            "values": [dept["asset_count"] for dept in dept_data],
-        }
-
-        return Response(
-            {
-                "asset_status": asset_status_data,
-                "weekly_transactions": weekly_data,
-                "department_assets": department_chart_data,
-            }
-        )
+        return _dashboard_response(request, "charts")
 
     except Exception as e:
         return Response(
@@ -618,17 +441,35 @@ def dashboard_charts_data_view(request):
         )
 
 
+def _face_worker_unavailable_response(exc):
+    """503 telling the client to retry when the face worker pool is saturated"""
+    return Response(
+        {"error": str(exc.detail)},
+        status=exc.status_code,
+        headers={"Retry-After": "1"},
+    )
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@parser_classes(FACE_IMAGE_PARSERS)
 def verify_face_view(request):
     """Verify face data against stored employee face data"""
     serializer = FaceVerificationSerializer(data=request.data)
 
     if serializer.is_valid():
         employee = serializer.validated_data["employee"]
-        face_data = serializer.validated_data["face_data"]
+        face_data = get_face_image(request, "face_data")
+        if not face_data:
+            return Response(
+                {"face_data": ["This field is required."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        verification_result = verify_employee_face(employee, face_data)
+        try:
+            verification_result = verify_employee_face(employee, face_data)
+        except FaceWorkerUnavailable as e:
+            return _face_worker_unavailable_response(e)
 
         return Response(
             {
@@ -652,10 +493,11 @@ def verify_face_view(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@parser_classes(FACE_IMAGE_PARSERS)
 def update_employee_face_data(request, employee_id):
     try:
         employee = Employee.objects.get(id=employee_id, is_active=True)
-        face_image_data = request.data.get("face_recognition_data")
+        face_image_data = get_face_image(request, "face_recognition_data")
 
         if not face_image_data:
             return Response(
@@ -671,6 +513,7 @@ def update_employee_face_data(request, employee_id):
                     "success": True,
                     "message": result["message"],
                     "quality_score": result["quality_score"],
+                    "template_id": result["template_id"],
                 }
             )
         else:
@@ -689,6 +532,8 @@ def update_employee_face_data(request, employee_id):
             {"error": "Employee not found or inactive"},
             status=status.HTTP_404_NOT_FOUND,
         )
+    except FaceWorkerUnavailable as e:
+        return _face_worker_unavailable_response(e)
     except Exception as e:
         return Response(
             {"error": f"Internal server error: {str(e)}"},
@@ -696,12 +541,97 @@ def update_employee_face_data(request, employee_id):
         )
 
 
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+@parser_classes(FACE_IMAGE_PARSERS)
+def employee_face_templates_view(request, employee_id):
+    """
+    GET /api/employees/{id}/face/templates/
+    POST /api/employees/{id}/face/templates/
+    List the employee's enrolled face templates, or enroll an additional one
+    """
+    try:
+        employee = Employee.objects.get(id=employee_id, is_active=True)
+
+        if request.method == "GET":
+            templates = FaceEmbedding.objects.filter(employee=employee).values(
+                "id", "quality_score", "model_name", "encoder", "dims", "created_at"
+            )
+            return Response({"templates": list(templates)})
+
+        face_image_data = get_face_image(request, "face_recognition_data")
+        if not face_image_data:
+            return Response(
+                {"error": "Face image data is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        result = add_employee_face_template(employee, face_image_data)
+
+        if not result["success"]:
+            return Response(
+                {
+                    "success": False,
+                    "error": result["error"],
+                    "issues": result.get("issues", []),
+                    "recommendations": result.get("recommendations", []),
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {
+                "success": True,
+                "message": result["message"],
+                "quality_score": result["quality_score"],
+                "template_id": result["template_id"],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    except Employee.DoesNotExist:
+        return Response(
+            {"error": "Employee not found or inactive"},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+    except FaceWorkerUnavailable as e:
+        return _face_worker_unavailable_response(e)
+    except Exception as e:
+        return Response(
+            {"error": f"Internal server error: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@api_view(["DELETE"])
+@permission_classes([IsAuthenticated])
+def employee_face_template_detail_view(request, employee_id, template_id):
+    """
+    DELETE /api/employees/{id}/face/templates/{template_id}/
+    Remove one enrolled face template (removing the last one clears the face registration)
+    """
+    try:
+        employee = Employee.objects.get(id=employee_id, is_active=True)
+    except Employee.DoesNotExist:
+        return Response(
+            {"error": "Employee not found or inactive"},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    result = remove_employee_face_template(employee, template_id)
+    if not result["success"]:
+        return Response({"error": result["error"]}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@parser_classes(FACE_IMAGE_PARSERS)
 def validate_face_image_view(request):
     """Validate if an image is suitable for face recognition"""
     try:
-        face_image_data = request.data.get("face_image_data")
+        face_image_data = get_face_image(request, "face_image_data")
 
         if not face_image_data:
             return Response(
@@ -711,9 +641,13 @@ def validate_face_image_view(request):
 
         service = get_face_recognition_service()
         validation_result = service.validate_image_quality(face_image_data)
+        # The face encoding is only passed through for registration
+        validation_result.pop("face_data", None)
 
         return Response(validation_result)
 
+    except FaceWorkerUnavailable as e:
+        return _face_worker_unavailable_response(e)
     except Exception as e:
         return Response(
             {"error": f"Image validation failed: {str(e)}"},
@@ -721,6 +655,102 @@ def validate_face_image_view(request):
         )
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@parser_classes(FACE_IMAGE_PARSERS)
+def identify_face_view(request):
+    """Identify the best-matching active employees for a captured face image"""
+    try:
+        face_image_data = get_face_image(request, "face_image_data")
+
+        if not face_image_data:
+            return Response(
+                {"error": "Face image data is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            limit = min(max(int(request.data.get("limit", 5)), 1), 20)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Invalid limit parameter"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        result = identify_employee_face(face_image_data, limit=limit)
+
+        employees = Employee.objects.select_related("user", "department").in_bulk(
+            [match["employee"] for match in result["matches"]]
+        )
+        matches = []
+        for match in result["matches"]:
+            employee = employees.get(match["employee"])
+            if employee is None or not employee.is_active:
+                continue
+            matches.append(
+                {
+                    "id": employee.id,
+                    "employee_id": employee.employee_id,
+                    "employee_name": employee.name,
+                    "department_name": employee.department.name,
+                    "confidence": match["confidence"],
+                    "face_distance": match["face_distance"],
+                }
+            )
+
+        return Response(
+            {
+                "success": bool(matches),
+                "matches": matches,
+                "threshold": result["threshold"],
+                "candidates_searched": result.get("candidates_searched", 0),
+                "error": result.get("error"),
+                "quality_info": {
+                    "captured_quality": result.get("captured_quality", {}),
+                },
+            }
+        )
+
+    except FaceWorkerUnavailable as e:
+        return _face_worker_unavailable_response(e)
+    except Exception as e:
+        return Response(
+            {"error": f"Face identification failed: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdmin])
+def face_encoding_cache_stats_view(request):
+    """Hit/miss counters for the in-process face encoding cache and worker pool"""
+    return Response(
+        {
+            **face_encoding_cache.stats(),
+            "worker_pool": face_worker_pool.stats(),
+            "service_startup": get_face_recognition_service().startup_metrics,
+        }
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdmin])
+def face_pipeline_metrics_view(request):
+    """
+    GET /api/face/metrics/
+    Per-stage latency (count, mean, p50, p95, max) of the face pipeline by
+    operation, for this worker process since it started
+    """
+    return Response(
+        {
+            "stages": face_pipeline_metrics.snapshot(),
+            "encoding_cache": face_encoding_cache.stats(),
+            "worker_pool": face_worker_pool.stats(),
+            "service_startup": get_face_recognition_service().startup_metrics,
+        }
+    )
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def employee_profile_view(request, employee_id):
@@ -945,60 +975,16 @@ def employee_stats_view(request, employee_id):
         # Current assets count
         current_assets_count = Asset.objects.filter(current_holder=employee).count()
 
-        # Transaction counts by type
-        transactions_by_type = all_transactions.values("transaction_type").annotate(
-            total=Count("id")
-        )
-
-        by_type = {"issue": 0, "return": 0}
-        for row in transactions_by_type:
-            transaction_type = row["transaction_type"]
-            if transaction_type in by_type:
-                by_type[transaction_type] = row["total"]
-
-        # Face verification statistics
-        face_verified_count = all_transactions.filter(
-            face_verification_success=True
-        ).count()
-
-        total_transactions = all_transactions.count()
+        # Counts by type, face verification, last 30 days and monthly trends
+        counts = employee_transaction_counts(employee)
+        by_type = {"issue": counts["issues"], "return": counts["returns"]}
+        face_verified_count = counts["verified"]
+        total_transactions = counts["total"]
         face_verification_rate = 0
         if total_transactions > 0:
             face_verification_rate = (face_verified_count / total_transactions) * 100
-
-        # Recent activity (last 30 days)
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_transactions = all_transactions.filter(
-            transaction_date__gte=thirty_days_ago
-        ).count()
-
-        # Monthly transaction trends (last 6 months)
-        monthly_trends = []
-        for i in range(6):
-            month_start = timezone.now().replace(day=1) - timedelta(days=30 * i)
-            if i < 5:
-                month_end = timezone.now().replace(day=1) - timedelta(days=30 * (i - 1))
-            else:
-                month_end = timezone.now()
-
-            month_transactions = all_transactions.filter(
-                transaction_date__gte=month_start, transaction_date__lt=month_end
-            )
-
-            monthly_trends.insert(
-                0,
-                {
-                    "month": month_start.strftime("%Y-%m"),
-                    "month_name": month_start.strftime("%b %Y"),
-                    "total_transactions": month_transactions.count(),
-                    "issues": month_transactions.filter(
-                        transaction_type="issue"
-                    ).count(),
-                    "returns": month_transactions.filter(
-                        transaction_type="return"
-                    ).count(),
-                },
-            )
+        recent_transactions = counts["recent"]
+        monthly_trends = counts["monthly_trends"]
 
         # Asset condition statistics (for returns)
         return_conditions = (
@@ -1061,6 +1047,7 @@ def employee_stats_view(request, employee_id):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@parser_classes(FACE_IMAGE_PARSERS)
 def asset_return_view(request):
     """
     POST /api/assets/return/
@@ -1073,7 +1060,8 @@ def asset_return_view(request):
         return_condition = request.data.get("return_condition")
         damage_notes = request.data.get("damage_notes", "")
         notes = request.data.get("notes", "")
-        face_verification_data = request.data.get("face_verification_data")
+        face_verification_data = get_face_image(request, "face_verification_data")
+        face_verification_token = request.data.get("face_verification_token")
 
         # Validate required fields
         if not all([asset_id, employee_id, return_condition]):
@@ -1122,7 +1110,7 @@ def asset_return_view(request):
         face_verification_confidence = 0.0
 
         if employee.face_recognition_data:
-            if not face_verification_data:
+            if not (face_verification_data or face_verification_token):
                 return Response(
                     {
                         "error": f"Face verification is required for employee '{employee.name}' who has registered face data"
@@ -1130,8 +1118,13 @@ def asset_return_view(request):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Perform face verification
-            verification_result = verify_employee_face(employee, face_verification_data)
+            # Perform face verification, or accept one already done over the stream
+            if face_verification_token:
+                verification_result = check_face_verification_token(
+                    face_verification_token, employee, request.user
+                )
+            else:
+                verification_result = verify_employee_face(employee, face_verification_data)
 
             if not verification_result["success"]:
                 error_msg = f"Face verification failed: {verification_result.get('error', 'Unknown error')}"
@@ -1183,6 +1176,8 @@ def asset_return_view(request):
             status=status.HTTP_201_CREATED,
         )
 
+    except FaceWorkerUnavailable as e:
+        return _face_worker_unavailable_response(e)
     except Exception as e:
         return Response(
             {"error": f"Internal server error: {str(e)}"},
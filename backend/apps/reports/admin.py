@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.text import Truncator
-from .models import ReportPermission
+from .models import ReportJob, ReportPermission
 
 
 @admin.register(ReportPermission)
@@ -37,3 +37,17 @@ class ReportPermissionAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.select_related("employee__user", "employee__department", "granted_by")
+
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "report", "format", "status", "requested_by", "created_at", "finished_at")
+    list_filter = ("status", "report", "format")
+    readonly_fields = [field.name for field in ReportJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,299 @@
+"""
+Row data of the reports, each read with a fixed number of queries however many
+employees there are; views.py renders the rows as PDF or Excel.
+
+REPORT_TABLES flattens the same data into one table per report, with typed
+columns, for the CSV and Parquet exports (exports.py).
+"""
+from typing import Dict, Iterator, List, Tuple
+
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, Subquery
+
+from apps.assets.models import Asset, AssetTransaction, Department, Employee
+from apps.disclaimer.models import DisclaimerProcess
+
+
+def disclaimer_completion_data() -> Tuple[List[Dict], List[Dict]]:
+    """
+    Employees who completed a disclaimer process and those who did not (with
+    the step their process in progress is at), from one query: the latest
+    completed and in progress process of each employee are correlated subqueries.
+    """
+    processes = DisclaimerProcess.objects.filter(employee=OuterRef("pk")).order_by("-started_at")
+    completed = processes.filter(status="completed")
+    active = processes.filter(status="in_progress")
+
+    employees = Employee.objects.select_related("user", "department").annotate(
+        has_completed=Exists(completed),
+        completed_on=Subquery(completed.values("completed_at")[:1]),
+        completed_steps=Subquery(completed.values("total_steps")[:1]),
+        active_step=Subquery(active.values("current_step")[:1]),
+        active_steps=Subquery(active.values("total_steps")[:1]),
+    )
+
+    completed_employees = []
+    not_completed_employees = []
+    for emp in employees:
+        emp_data = {
+            "employee_id": emp.employee_id,
+            "name": emp.name,
+            "email": emp.email,
+            "department": emp.department.name,
+            "phone": emp.phone_number,
+        }
+
+        if emp.has_completed:
+            emp_data["completed_date"] = (
+                emp.completed_on.strftime("%Y-%m-%d %H:%M") if emp.completed_on else ""
+            )
+            emp_data["total_steps"] = emp.completed_steps
+            completed_employees.append(emp_data)
+        else:
+            if emp.active_step is not None:
+                emp_data["status"] = f"In Progress ({emp.active_step}/{emp.active_steps})"
+            else:
+                emp_data["status"] = "Not Started"
+            not_completed_employees.append(emp_data)
+
+    return completed_employees, not_completed_employees
+
+
+def employee_assets_data() -> Tuple[List[Dict], List[Dict]]:
+    """Employees holding assigned assets (with the assets) and those holding none"""
+    employees = Employee.objects.select_related("user", "department").prefetch_related(
+        Prefetch(
+            "current_assets",
+            queryset=Asset.objects.filter(status="assigned"),
+            to_attr="assigned_assets",
+        )
+    )
+
+    with_assets = []
+    without_assets = []
+    for emp in employees:
+        emp_data = {
+            "employee_id": emp.employee_id,
+            "name": emp.name,
+            "email": emp.email,
+            "department": emp.department.name,
+            "phone": emp.phone_number,
+        }
+
+        if emp.assigned_assets:
+            emp_data["asset_count"] = len(emp.assigned_assets)
+            emp_data["assets"] = ", ".join(
+                [f"{a.name} ({a.serial_number})" for a in emp.assigned_assets]
+            )
+            with_assets.append(emp_data)
+        else:
+            without_assets.append(emp_data)
+
+    return with_assets, without_assets
+
+
+def assets_by_status_data() -> Dict[str, List[Dict]]:
+    """Every asset, grouped by status"""
+    assets = Asset.objects.select_related("department", "current_holder__user")
+
+    assets_by_status = {
+        "available": [],
+        "assigned": [],
+        "maintenance": [],
+        "retired": [],
+    }
+    for asset in assets:
+        asset_data = {
+            "name": asset.name,
+            "serial_number": asset.serial_number,
+            "department": asset.department.name,
+            "purchase_date": asset.purchase_date.strftime("%Y-%m-%d")
+            if asset.purchase_date
+            else "N/A",
+            "purchase_cost": f"${asset.purchase_cost}"
+            if asset.purchase_cost
+            else "N/A",
+            "current_holder": asset.current_holder.name
+            if asset.current_holder
+            else "N/A",
+            "description": asset.description[:50] + "..."
+            if len(asset.description) > 50
+            else asset.description,
+        }
+        assets_by_status[asset.status].append(asset_data)
+
+    return assets_by_status
+
+
+def transaction_history_rows(
+    start_date=None, end_date=None, chunk_size: int = 2000
+) -> Iterator[Dict]:
+    """
+    Transactions between ``start_date`` and ``end_date`` (both optional), newest
+    first, read ``chunk_size`` at a time so exports never hold the whole table
+    """
+    transactions = AssetTransaction.objects.select_related(
+        "asset", "employee__user", "employee__department", "processed_by"
+    )
+    if start_date:
+        transactions = transactions.filter(transaction_date__gte=start_date)
+    if end_date:
+        transactions = transactions.filter(transaction_date__lte=end_date)
+
+    for txn in transactions.order_by("-transaction_date").iterator(chunk_size=chunk_size):
+        yield {
+            "date": txn.transaction_date.strftime("%Y-%m-%d %H:%M"),
+            "type": txn.transaction_type.title(),
+            "asset": f"{txn.asset.name} ({txn.asset.serial_number})",
+            "employee": txn.employee.name,
+            "employee_id": txn.employee.employee_id,
+            "department": txn.employee.department.name,
+            "processed_by": txn.processed_by.get_full_name()
+            if txn.processed_by
+            else "System",
+            "face_verified": "Yes" if txn.face_verification_success else "No",
+            "confidence": f"{txn.face_verification_confidence * 100:.1f}%"
+            if txn.face_verification_success
+            else "N/A",
+            "notes": txn.notes[:50] + "..." if len(txn.notes) > 50 else txn.notes,
+        }
+
+
+def department_summary_data() -> List[Dict]:
+    """
+    Employee, disclaimer and asset counts of every department, by name, from
+    two grouped queries: departments joined to their employees (with whether
+    each completed a disclaimer) and assets grouped by department and status.
+    Joining both to the department would multiply employees by assets.
+    """
+    completed = DisclaimerProcess.objects.filter(employee=OuterRef("employees"), status="completed")
+    departments = (
+        Department.objects.select_related("manager")
+        .annotate(
+            total_employees=Count("employees"),
+            completed_disclaimers=Count("employees", filter=Q(Exists(completed))),
+        )
+        .order_by("name")
+    )
+
+    asset_counts = {
+        row["department"]: row
+        for row in Asset.objects.values("department")
+        .annotate(
+            total=Count("id"),
+            assigned=Count("id", filter=Q(status="assigned")),
+            available=Count("id", filter=Q(status="available")),
+            maintenance=Count("id", filter=Q(status="maintenance")),
+        )
+        .order_by()
+    }
+
+    dept_data = []
+    for dept in departments:
+        assets = asset_counts.get(dept.pk, {})
+        dept_data.append(
+            {
+                "name": dept.name,
+                "manager": dept.manager.get_full_name() if dept.manager else "No Manager",
+                "total_employees": dept.total_employees,
+                "completed_disclaimers": dept.completed_disclaimers,
+                "disclaimer_rate": f"{dept.completed_disclaimers / dept.total_employees * 100:.1f}%"
+                if dept.total_employees > 0
+                else "0%",
+                "total_assets": assets.get("total", 0),
+                "assigned_assets": assets.get("assigned", 0),
+                "available_assets": assets.get("available", 0),
+                "maintenance_assets": assets.get("maintenance", 0),
+            }
+        )
+    return dept_data
+
+
+# ============ FLAT TABLES (CSV / Parquet) ============
+
+EMPLOYEE_COLUMNS = [
+    ("employee_id", str),
+    ("name", str),
+    ("email", str),
+    ("department", str),
+    ("phone", str),
+]
+
+
+def disclaimer_completion_rows(completed, not_completed) -> Iterator[Dict]:
+    for emp in completed:
+        yield {**emp, "completion": "Completed", "status": "Completed"}
+    for emp in not_completed:
+        yield {**emp, "completion": "Not Completed"}
+
+
+def employee_assets_rows(with_assets, without_assets) -> Iterator[Dict]:
+    yield from with_assets
+    for emp in without_assets:
+        yield {**emp, "asset_count": 0}
+
+
+def assets_by_status_rows(assets_by_status) -> Iterator[Dict]:
+    for status, assets in assets_by_status.items():
+        for asset in assets:
+            yield {"status": status, **asset}
+
+
+# Report id -> (columns as (key, type), rows from the report's data)
+REPORT_TABLES = {
+    "disclaimer-completion": (
+        EMPLOYEE_COLUMNS
+        + [
+            ("completion", str),
+            ("status", str),
+            ("completed_date", str),
+            ("total_steps", int),
+        ],
+        disclaimer_completion_rows,
+    ),
+    "employee-assets": (
+        EMPLOYEE_COLUMNS + [("asset_count", int), ("assets", str)],
+        employee_assets_rows,
+    ),
+    "assets-by-status": (
+        [
+            ("status", str),
+            ("name", str),
+            ("serial_number", str),
+            ("department", str),
+            ("purchase_date", str),
+            ("purchase_cost", str),
+            ("current_holder", str),
+            ("description", str),
+        ],
+        assets_by_status_rows,
+    ),
+    "transaction-history": (
+        [
+            ("date", str),
+            ("type", str),
+            ("asset", str),
+            ("employee", str),
+            ("employee_id", str),
+            ("department", str),
+            ("processed_by", str),
+            ("face_verified", str),
+            ("confidence", str),
+            ("notes", str),
+        ],
+        lambda transactions: transactions,
+    ),
+    "department-summary": (
+        [
+            ("name", str),
+            ("manager", str),
+            ("total_employees", int),
+            ("completed_disclaimers", int),
+            ("disclaimer_rate", str),
+            ("total_assets", int),
+            ("assigned_assets", int),
+            ("available_assets", int),
+            ("maintenance_assets", int),
+        ],
+        lambda dept_data: dept_data,
+    ),
+}
@@ -0,0 +1,197 @@
+"""
+Background report generation.
+
+A ReportJob row is the queue entry: request_report_job() creates it, or hands
+back the queued or running job of an identical request by the same user. Jobs are run by the
+REPORT_JOB_WORKERS threads of web processes (woken when a job is queued) and/or
+by `manage.py process_report_jobs`, whichever claims them first. Claiming is a
+conditional UPDATE (queued -> running), so any number of workers can share the
+table without a broker.
+"""
+import hashlib
+import json
+import logging
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = ("queued", "running")
+REPORT_FILE_EXTENSIONS = {"pdf": "pdf", "excel": "xlsx", "csv": "csv", "parquet": "parquet"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def report_params_hash(report: str, format_type: str, params: dict, user_id=None) -> str:
+    payload = json.dumps(
+        {"report": report, "format": format_type, "params": params, "user": user_id},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def request_report_job(
+    report: str, format_type: str = "pdf", params: Optional[dict] = None, user=None
+) -> Tuple[ReportJob, bool]:
+    """
+    Queue report ``report`` (a views.REPORTS id), or join the pending job of an
+    identical request by the same user (jobs are only visible to whoever
+    requested them). Returns (job, created).
+    """
+    params = {key: value for key, value in (params or {}).items() if value not in (None, "")}
+    params_hash = report_params_hash(
+        report, format_type, params, user.pk if user is not None else None
+    )
+    pending = ReportJob.objects.filter(params_hash=params_hash, status__in=PENDING_STATUSES)
+
+    fail_stale_report_jobs()
+    job = pending.first()
+    if job is not None:
+        # Wake a worker anyway, in case the job was queued while none was running
+        transaction.on_commit(dispatch_report_jobs)
+        return job, False
+
+    try:
+        with transaction.atomic():
+            job = ReportJob.objects.create(
+                report=report,
+                format=format_type,
+                params=params,
+                params_hash=params_hash,
+                requested_by=user,
+            )
+    except IntegrityError:
+        # An identical request queued it since the lookup above
+        job = pending.first()
+        if job is None:
+            return request_report_job(report, format_type, params, user)
+        transaction.on_commit(dispatch_report_jobs)
+        return job, False
+
+    transaction.on_commit(dispatch_report_jobs)
+    return job, True
+
+
+def claim_report_job() -> Optional[ReportJob]:
+    """Mark the oldest queued job running and return it (None when the queue is empty)"""
+    while True:
+        job_ids = list(
+            ReportJob.objects.filter(status="queued")
+            .order_by("created_at")
+            .values_list("pk", flat=True)[:10]
+        )
+        if not job_ids:
+            return None
+        for job_id in job_ids:
+            claimed = ReportJob.objects.filter(pk=job_id, status="queued").update(
+                status="running", started_at=timezone.now()
+            )
+            if claimed:
+                return ReportJob.objects.get(pk=job_id)
+        # Every one of them was claimed by another worker; look again
+
+
+def run_report_job(job: ReportJob):
+    """Generate the file of a claimed job into MEDIA_ROOT and record the outcome"""
+    from .views import render_report
+
+    try:
+        response = render_report(job.report, job.format, job.params)
+        # Random part: MEDIA_URL may be served without authentication
+        name = (
+            f"{job.report}_{timezone.now():%Y%m%d}_{uuid.uuid4().hex[:12]}"
+            f".{REPORT_FILE_EXTENSIONS[job.format]}"
+        )
+        if response.streaming:
+            with tempfile.TemporaryFile() as file:
+                for chunk in response.streaming_content:
+                    file.write(chunk)
+                response.close()
+                job.file.save(name, File(file), save=False)
+        else:
+            job.file.save(name, ContentFile(response.content), save=False)
+        job.status = "completed"
+        job.error = ""
+    except Exception as e:
+        logger.exception("Report job %s (%s) failed", job.pk, job.report)
+        job.status = "failed"
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=["file", "status", "error", "finished_at"])
+
+
+def process_report_jobs(limit: Optional[int] = None) -> int:
+    """Run queued jobs until the queue is empty (or ``limit`` ran); returns how many ran"""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_report_job()
+        if job is None:
+            break
+        run_report_job(job)
+        processed += 1
+    return processed
+
+
+def fail_stale_report_jobs() -> int:
+    """
+    Fail jobs running for longer than REPORT_JOB_TIMEOUT (their worker died)
+    and jobs queued for longer than that (no worker picked them up), so
+    identical requests queue a new job instead of joining them
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.REPORT_JOB_TIMEOUT)
+    stale = Q(status="running", started_at__lt=cutoff) | Q(status="queued", created_at__lt=cutoff)
+    return ReportJob.objects.filter(stale).update(
+        status="failed", error="Timed out", finished_at=timezone.now()
+    )
+
+
+def purge_report_jobs() -> int:
+    """Delete finished jobs older than REPORT_JOB_RETENTION_HOURS and their files"""
+    cutoff = timezone.now() - timedelta(hours=settings.REPORT_JOB_RETENTION_HOURS)
+    expired = ReportJob.objects.filter(
+        status__in=("completed", "failed"), finished_at__lt=cutoff
+    )
+    deleted = 0
+    for job in expired.iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
+
+
+def _report_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.REPORT_JOB_WORKERS, thread_name_prefix="report-job"
+            )
+        return _executor
+
+
+def _work():
+    try:
+        process_report_jobs()
+    finally:
+        # Worker threads outlive requests, so nothing else closes their connections
+        connections.close_all()
+
+
+def dispatch_report_jobs():
+    """Wake a worker thread of this process to drain the queue"""
+    if settings.REPORT_JOB_WORKERS > 0:
+        _report_executor().submit(_work)
@@ -0,0 +1,168 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.assets.models import Asset, Department, Employee
+from apps.disclaimer.models import DisclaimerProcess
+from apps.reports.data import department_summary_data
+
+ASSET_STATUSES = ('available', 'assigned', 'maintenance', 'retired')
+
+
+class BenchmarkRollback(Exception):
+    """Raised to roll back the seeded dataset"""
+
+
+def department_summary_legacy():
+    """The per-department loop department_summary_report used before department_summary_data"""
+    departments = Department.objects.prefetch_related(
+        "employees", "assets", "employees__disclaimer_processes"
+    ).all()
+
+    dept_data = []
+    for dept in departments:
+        total_employees = dept.employees.count()
+        completed_disclaimers = (
+            dept.employees.filter(disclaimer_processes__status="completed")
+            .distinct()
+            .count()
+        )
+        dept_data.append(
+            {
+                "name": dept.name,
+                "manager": dept.manager.get_full_name() if dept.manager else "No Manager",
+                "total_employees": total_employees,
+                "completed_disclaimers": completed_disclaimers,
+                "disclaimer_rate": f"{completed_disclaimers / total_employees * 100:.1f}%"
+                if total_employees > 0
+                else "0%",
+                "total_assets": dept.assets.count(),
+                "assigned_assets": dept.assets.filter(status="assigned").count(),
+                "available_assets": dept.assets.filter(status="available").count(),
+                "maintenance_assets": dept.assets.filter(status="maintenance").count(),
+            }
+        )
+    return dept_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the department summary report data: the old per-department loop "
+        "against the grouped queries of department_summary_data. Seeds a synthetic "
+        "dataset on top of the existing data inside a transaction that is rolled back "
+        "afterwards, and checks both produce the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=300, help='Departments to seed')
+        parser.add_argument('--employees', type=int, default=20, help='Employees seeded per department')
+        parser.add_argument('--assets', type=int, default=30, help='Assets seeded per department')
+        parser.add_argument('--iterations', type=int, default=5, help='Runs of each implementation')
+        parser.add_argument('--skip-legacy', action='store_true', help='Only time department_summary_data')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic data')
+
+    def handle(self, *args, **options):
+        if options['departments'] < 1 or options['iterations'] < 1:
+            raise CommandError('--departments and --iterations must be at least 1')
+
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                self.seed(options)
+                self.stdout.write(
+                    f"Seeded {options['departments']} departments, "
+                    f"{options['departments'] * options['employees']} employees and "
+                    f"{options['departments'] * options['assets']} assets "
+                    f"in {time.perf_counter() - started:.1f}s"
+                )
+                self.run(options)
+                raise BenchmarkRollback
+        except BenchmarkRollback:
+            self.stdout.write('Seeded data rolled back')
+
+    def run(self, options):
+        implementations = {'grouped': department_summary_data}
+        if not options['skip_legacy']:
+            implementations['legacy'] = department_summary_legacy
+
+        results = {}
+        self.stdout.write(f"  {'implementation':<16}{'queries':>9}{'mean ms':>11}{'min ms':>10}")
+        for name, build in implementations.items():
+            samples = []
+            for _ in range(options['iterations']):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    results[name] = build()
+                    samples.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"  {name:<16}{len(queries):>9}{statistics.mean(samples):>11.1f}{min(samples):>10.1f}"
+            )
+
+        if 'legacy' in results:
+            if results['legacy'] != results['grouped']:
+                raise CommandError('department_summary_data rows differ from the legacy loop')
+            self.stdout.write(self.style.SUCCESS(f"Rows identical ({len(results['grouped'])} departments)"))
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        User = get_user_model()
+        run = timezone.now().strftime('%H%M%S')
+
+        managers = User.objects.bulk_create(
+            User(email=f'bench-manager-{run}-{i}@example.com', first_name='Manager', last_name=str(i))
+            for i in range(options['departments'])
+        )
+        departments = Department.objects.bulk_create(
+            Department(name=f'Benchmark {run} {i:04d}', manager=manager if rng.random() < 0.8 else None)
+            for i, manager in enumerate(managers)
+        )
+
+        users = User.objects.bulk_create(
+            User(email=f'bench-{run}-{d}-{e}@example.com', first_name='Employee', last_name=f'{d}-{e}')
+            for d in range(len(departments))
+            for e in range(options['employees'])
+        )
+        employees = Employee.objects.bulk_create(
+            Employee(
+                user=user,
+                employee_id=f'B{run}{index:07d}'[:20],
+                phone_number='+966500000000',
+                department=departments[index // options['employees']],
+            )
+            for index, user in enumerate(users)
+        )
+
+        processes = []
+        for employee in employees:
+            for number in range(rng.choice((0, 1, 1, 2))):
+                state = rng.choice(('completed', 'completed', 'blocked'))
+                processes.append(DisclaimerProcess(
+                    employee=employee,
+                    status=state,
+                    current_step=3,
+                    total_steps=3,
+                    completed_at=timezone.now() if state == 'completed' else None,
+                    is_active=False,
+                    process_number=number + 1,
+                ))
+        DisclaimerProcess.objects.bulk_create(processes, batch_size=1000)
+
+        Asset.objects.bulk_create(
+            (
+                Asset(
+                    name='Benchmark asset',
+                    serial_number=f'BENCH-{run}-{d}-{a}',
+                    department=department,
+                    status=rng.choice(ASSET_STATUSES),
+                )
+                for d, department in enumerate(departments)
+                for a in range(options['assets'])
+            ),
+            batch_size=1000,
+        )
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.reports.jobs import fail_stale_report_jobs, process_report_jobs, purge_report_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background report jobs. Can run next to (or, with "
+        "REPORT_JOB_WORKERS=0, instead of) the web processes' worker threads, as "
+        "many times over as needed. Also fails abandoned jobs and purges expired ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument(
+            '--poll-interval', type=float, default=5.0,
+            help='Seconds to wait when the queue is empty (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            stale = fail_stale_report_jobs()
+            purged = purge_report_jobs()
+            processed = process_report_jobs()
+
+            if stale or purged or processed:
+                self.stdout.write(
+                    f'{processed} jobs run, {stale} abandoned jobs failed, {purged} expired jobs purged'
+                )
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['poll_interval'])
@@ -37,4 +37,61 @@ class ReportPermission(models.Model):
 
     def __str__(self):
         status = "Granted" if self.can_access_reports else "Revoked"
-        return f"{self.employee.name} - Reports Access: {status}"
\ No newline at end of file
+        return f"{self.employee.name} - Reports Access: {status}"
+
+class ReportJob(models.Model):
+    """
+    A report generated in the background into MEDIA_ROOT (see jobs.py).
+    Identical requests of one user share the queued or running job (same
+    params_hash).
+    """
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+    FORMAT_CHOICES = [
+        ("pdf", "PDF"),
+        ("excel", "Excel"),
+        ("csv", "CSV"),
+        ("parquet", "Parquet"),
+    ]
+
+    report = models.CharField(max_length=50)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default="pdf")
+    params = models.JSONField(default=dict, blank=True)
+    params_hash = models.CharField(
+        max_length=64, help_text="SHA-256 of report, format, params and requesting user"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    file = models.FileField(upload_to="reports/%Y/%m/", blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="report_jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Report Job"
+        verbose_name_plural = "Report Jobs"
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+        constraints = [
+            # One pending job per distinct request and user: duplicates join it
+            models.UniqueConstraint(
+                fields=["params_hash"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="unique_pending_report_job",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.report} ({self.format}) - {self.status}"
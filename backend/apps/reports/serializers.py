@@ -1,5 +1,6 @@
+from django.urls import reverse
 from rest_framework import serializers
-from apps.reports.models import ReportPermission
+from apps.reports.models import ReportJob, ReportPermission
 
 
 class ReportPermissionSerializer(serializers.ModelSerializer):
@@ -36,4 +37,32 @@ class ReportPermissionSerializer(serializers.ModelSerializer):
         """Ensure employee exists and is valid"""
         if not value.is_active:
             raise serializers.ValidationError("Cannot grant permission to inactive employee")
-        return value
\ No newline at end of file
+        return value
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Serializer for background report jobs (status polling)"""
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            "id",
+            "report",
+            "format",
+            "params",
+            "status",
+            "error",
+            "download_url",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != "completed":
+            return None
+        url = reverse("report-job-download", args=[obj.pk])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
@@ -1,3 +1,344 @@
-from django.test import TestCase
+import csv
+import io
+import sys
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+
+from apps.assets.models import Asset, AssetTransaction, Department, Employee
+from apps.disclaimer.models import DisclaimerProcess
+from apps.users.models import User
+
+from .data import REPORT_TABLES, department_summary_data, disclaimer_completion_data
+from .exports import parquet_available
+from .jobs import claim_report_job, request_report_job
+from .models import ReportJob
+
+
+class DisclaimerCompletionDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="IT")
+        users = User.objects.bulk_create(
+            [
+                User(email=f"employee{index}@example.com", first_name="Employee", last_name=str(index))
+                for index in range(30)
+            ]
+        )
+        employees = Employee.objects.bulk_create(
+            [
+                Employee(
+                    user=user,
+                    employee_id=f"E{index}",
+                    phone_number="0123456789",
+                    department=department,
+                )
+                for index, user in enumerate(users)
+            ]
+        )
+        # E0-E9 completed (E0-E4 after an earlier completed process), E10-E19
+        # at step 2 or 3 of 4, E20-E29 never started
+        processes = []
+        for employee in employees[:10]:
+            processes.append(
+                DisclaimerProcess(
+                    employee=employee,
+                    status="completed",
+                    current_step=4,
+                    total_steps=4,
+                    completed_at=timezone.now(),
+                )
+            )
+        for employee in employees[:5]:
+            processes.append(
+                DisclaimerProcess(
+                    employee=employee,
+                    status="completed",
+                    current_step=3,
+                    total_steps=3,
+                    completed_at=timezone.now(),
+                    process_number=2,
+                )
+            )
+        for index, employee in enumerate(employees[10:20]):
+            processes.append(
+                DisclaimerProcess(
+                    employee=employee, status="in_progress", current_step=2 + index % 2, total_steps=4
+                )
+            )
+        DisclaimerProcess.objects.bulk_create(processes)
+
+    def test_one_query(self):
+        with self.assertNumQueries(1):
+            completed, not_completed = disclaimer_completion_data()
+
+        self.assertEqual(len(completed), 10)
+        self.assertEqual(len(not_completed), 20)
+
+    def test_rows(self):
+        completed, not_completed = disclaimer_completion_data()
+        statuses = {row["employee_id"]: row["status"] for row in not_completed}
+
+        self.assertEqual(
+            {row["employee_id"] for row in completed}, {f"E{index}" for index in range(10)}
+        )
+        self.assertEqual(statuses["E10"], "In Progress (2/4)")
+        self.assertEqual(statuses["E11"], "In Progress (3/4)")
+        self.assertEqual(statuses["E25"], "Not Started")
+        self.assertEqual(
+            sum(status.startswith("In Progress") for status in statuses.values()), 10
+        )
+        self.assertTrue(all(row["completed_date"] for row in completed))
+
+
+class DepartmentSummaryDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        manager = User.objects.create_user(
+            email="manager@example.com", password="x", first_name="Dana", last_name="Manager"
+        )
+        it = Department.objects.create(name="IT", manager=manager)
+        hr = Department.objects.create(name="HR")
+        Department.objects.create(name="Legal")  # no employees or assets
+
+        users = User.objects.bulk_create(
+            [User(email=f"employee{index}@example.com") for index in range(5)]
+        )
+        employees = Employee.objects.bulk_create(
+            [
+                Employee(
+                    user=user,
+                    employee_id=f"E{index}",
+                    phone_number="0123456789",
+                    department=it if index < 4 else hr,
+                )
+                for index, user in enumerate(users)
+            ]
+        )
+        # E0 completed twice, E1 once, E2 is in progress
+        DisclaimerProcess.objects.bulk_create(
+            [
+                DisclaimerProcess(
+                    employee=employee,
+                    status=status,
+                    total_steps=3,
+                    completed_at=timezone.now() if status == "completed" else None,
+                    process_number=process_number,
+                )
+                for employee, status, process_number in [
+                    (employees[0], "completed", 1),
+                    (employees[0], "completed", 2),
+                    (employees[1], "completed", 1),
+                    (employees[2], "in_progress", 1),
+                ]
+            ]
+        )
+        Asset.objects.bulk_create(
+            [
+                Asset(
+                    name="Laptop",
+                    serial_number=f"SN{index}",
+                    department=department,
+                    status=status,
+                    current_holder=holder,
+                )
+                for index, (department, status, holder) in enumerate(
+                    [
+                        (it, "assigned", employees[0]),
+                        (it, "assigned", employees[1]),
+                        (it, "available", None),
+                        (hr, "maintenance", None),
+                    ]
+                )
+            ]
+        )
+
+    def test_two_queries(self):
+        with self.assertNumQueries(2):
+            rows = department_summary_data()
+
+        self.assertEqual([row["name"] for row in rows], ["HR", "IT", "Legal"])
+
+    def test_counts(self):
+        rows = {row["name"]: row for row in department_summary_data()}
+
+        self.assertEqual(
+            rows["IT"],
+            {
+                "name": "IT",
+                "manager": "Dana Manager",
+                "total_employees": 4,
+                "completed_disclaimers": 2,
+                "disclaimer_rate": "50.0%",
+                "total_assets": 3,
+                "assigned_assets": 2,
+                "available_assets": 1,
+                "maintenance_assets": 0,
+            },
+        )
+        self.assertEqual(rows["HR"]["total_employees"], 1)
+        self.assertEqual(rows["HR"]["completed_disclaimers"], 0)
+        self.assertEqual(rows["HR"]["disclaimer_rate"], "0.0%")
+        self.assertEqual(rows["HR"]["maintenance_assets"], 1)
+        self.assertEqual(
+            {key: rows["Legal"][key] for key in ("manager", "total_employees", "disclaimer_rate", "total_assets")},
+            {"manager": "No Manager", "total_employees": 0, "disclaimer_rate": "0%", "total_assets": 0},
+        )
+
+
+@override_settings(REPORT_JOB_WORKERS=0, REPORT_JOB_TIMEOUT=900)
+class ReportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="user@example.com", password="x")
+        cls.other_user = User.objects.create_user(email="other@example.com", password="x")
+
+    def test_identical_request_joins_pending_job(self):
+        job, created = request_report_job("department-summary", "csv", user=self.user)
+        same_job, same_created = request_report_job("department-summary", "csv", user=self.user)
+        other_job, other_created = request_report_job(
+            "department-summary", "csv", user=self.other_user
+        )
+
+        self.assertTrue(created)
+        self.assertEqual((same_job.pk, same_created), (job.pk, False))
+        self.assertTrue(other_created)
+        self.assertNotEqual(other_job.pk, job.pk)
+
+    def test_claim_once(self):
+        job, _ = request_report_job("department-summary", "csv", user=self.user)
+
+        claimed = claim_report_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, "running")
+        self.assertIsNotNone(claimed.started_at)
+        self.assertIsNone(claim_report_job())
+
+    def test_stale_queued_job_failed(self):
+        job, _ = request_report_job("department-summary", "csv", user=self.user)
+        queued_at = timezone.now() - timedelta(seconds=901)
+        ReportJob.objects.filter(pk=job.pk).update(created_at=queued_at)
+
+        new_job, created = request_report_job("department-summary", "csv", user=self.user)
+        job.refresh_from_db()
+
+        self.assertTrue(created)
+        self.assertNotEqual(new_job.pk, job.pk)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "Timed out")
+
+    def test_download_scoped_to_requester(self):
+        job, _ = request_report_job("department-summary", "csv", user=self.user)
+        job.file.save("department-summary.csv", ContentFile(b"name\n"), save=False)
+        job.status = "completed"
+        job.save()
+        self.addCleanup(job.file.delete, save=False)
+        url = f"/api/reports/jobs/{job.pk}/download/"
+        client = APIClient()
+
+        client.force_authenticate(self.other_user)
+        self.assertEqual(client.get(url).status_code, 404)
+
+        client.force_authenticate(self.user)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"name\n")
+        response.close()
+
+
+class TransactionHistoryExportTests(TestCase):
+    HEADERS = [
+        "Date",
+        "Type",
+        "Asset",
+        "Employee",
+        "Employee ID",
+        "Department",
+        "Processed By",
+        "Face Verified",
+        "Confidence",
+        "Notes",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="IT")
+        employee = Employee.objects.create(
+            user=User.objects.create_user(
+                email="employee@example.com", password="x", first_name="Sam", last_name="Lee"
+            ),
+            employee_id="E1",
+            phone_number="0123456789",
+            department=department,
+        )
+        asset = Asset.objects.create(name="Laptop", serial_number="SN1", department=department)
+        AssetTransaction.objects.bulk_create(
+            [
+                AssetTransaction(
+                    asset=asset,
+                    employee=employee,
+                    department=department,
+                    transaction_type="issue" if index % 2 == 0 else "return",
+                    face_verification_success=index % 3 == 0,
+                    face_verification_confidence=0.9,
+                )
+                for index in range(12)
+            ]
+        )
+
+    def get(self, format_type):
+        return self.client.get("/api/reports/transaction-history/", {"format": format_type})
+
+    def test_excel(self):
+        # Past the width sample, so rows come from both the sample and the stream
+        with mock.patch("apps.reports.views.EXCEL_WIDTH_SAMPLE_ROWS", 5):
+            response = self.get("excel")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        workbook = load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        rows = list(workbook["Transactions"].iter_rows(values_only=True))
+        response.close()
+
+        self.assertEqual(list(rows[0]), self.HEADERS)
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(rows[1][3:6], ("Sam Lee", "E1", "IT"))
+
+    def test_csv(self):
+        response = self.get("csv")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], [key for key, _type in REPORT_TABLES["transaction-history"][0]])
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(rows[1][3:6], ["Sam Lee", "E1", "IT"])
+
+    @skipUnless(parquet_available(), "pyarrow is not installed")
+    def test_parquet(self):
+        import pyarrow.parquet as pq
+
+        response = self.get("parquet")
+
+        self.assertEqual(response.status_code, 200)
+        table = pq.read_table(io.BytesIO(b"".join(response.streaming_content)))
+        response.close()
+        self.assertEqual(
+            table.column_names, [key for key, _type in REPORT_TABLES["transaction-history"][0]]
+        )
+        self.assertEqual(table.num_rows, 12)
+
+    def test_parquet_unavailable(self):
+        # A None entry makes ``import pyarrow`` raise ImportError
+        with mock.patch.dict(sys.modules, {"pyarrow": None, "pyarrow.parquet": None}):
+            reports = self.client.get("/api/reports/").json()
+            response = self.get("parquet")
+
+        self.assertTrue(all("parquet" not in report["formats"] for report in reports))
+        self.assertIn("csv", reports[0]["formats"])
+        self.assertEqual(response.status_code, 501)
@@ -26,6 +26,13 @@ urlpatterns = [
         views.department_summary_report,
         name="department-summary-report",
     ),
+    path("jobs/", views.report_jobs_view, name="report-jobs"),
+    path("jobs/<int:pk>/", views.report_job_detail_view, name="report-job-detail"),
+    path(
+        "jobs/<int:pk>/download/",
+        views.report_job_download_view,
+        name="report-job-download",
+    ),
     path(
         "admin/report-permissions/",
         views.report_permissions_view,
@@ -2,12 +2,14 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.utils import timezone
-from django.db.models import Count, Q, Prefetch
 from django.shortcuts import get_object_or_404
 from datetime import datetime
 import io
+import os
+import tempfile
+from itertools import chain, islice
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 
@@ -35,12 +37,26 @@ from apps.reports.pdf_utils import (
 # Excel Generation
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 
-from apps.assets.models import Employee, Asset, AssetTransaction, Department
-from apps.disclaimer.models import DisclaimerProcess
-from apps.reports.models import ReportPermission
-from apps.reports.serializers import ReportPermissionSerializer
+from apps.reports.data import (
+    REPORT_TABLES,
+    assets_by_status_data,
+    department_summary_data,
+    disclaimer_completion_data,
+    employee_assets_data,
+    transaction_history_rows,
+)
+from apps.reports.exports import (
+    ReportFormatUnavailable,
+    csv_response,
+    parquet_available,
+    parquet_response,
+)
+from apps.reports.jobs import request_report_job
+from apps.reports.models import ReportJob, ReportPermission
+from apps.reports.serializers import ReportJobSerializer, ReportPermissionSerializer
 from apps.disclaimer.permissions import IsAdmin
 
 # ============ UTILITY FUNCTIONS ============
@@ -101,6 +117,38 @@ def style_excel_header(ws, headers, row=1):
         cell.border = border
 
 
+def write_only_header_row(ws, headers):
+    """Header row styled like style_excel_header, for write-only worksheets"""
+    header_fill = PatternFill(start_color="1e40af", end_color="1e40af", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF", size=12)
+    border = Border(
+        left=Side(style="thin"),
+        right=Side(style="thin"),
+        top=Side(style="thin"),
+        bottom=Side(style="thin"),
+    )
+
+    cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+        cell.border = border
+        cells.append(cell)
+    return cells
+
+
+def sample_column_widths(headers, sample_rows):
+    """Column widths like auto_size_columns, from the headers and a sample of rows"""
+    widths = [len(str(header)) for header in headers]
+    for row in sample_rows:
+        for index, value in enumerate(row):
+            if value is not None:
+                widths[index] = max(widths[index], len(str(value)))
+    return [min(width + 2, 50) for width in widths]
+
+
 def auto_size_columns(ws):
     """Auto-size Excel columns"""
     for column in ws.columns:
@@ -117,6 +165,10 @@ def auto_size_columns(ws):
 
 
 
+# Rows the column widths of streamed Excel exports are computed from
+EXCEL_WIDTH_SAMPLE_ROWS = 500
+
+
 # ============ DISCLAIMER REPORTS ============
 
 
@@ -125,61 +177,10 @@ def auto_size_columns(ws):
 def disclaimer_completion_report(request):
     """
     Report showing employees who have completed vs not completed disclaimer process
-    Formats: PDF or Excel
+    Formats: PDF, Excel, CSV or Parquet
     """
     format_type = request.GET.get("format", "pdf").lower()
-
-    # Get all employees with their disclaimer status
-    employees = (
-        Employee.objects.select_related("user", "department")
-        .prefetch_related(
-            Prefetch(
-                "disclaimer_processes",
-                queryset=DisclaimerProcess.objects.filter(status="completed"),
-            )
-        )
-        .all()
-    )
-
-    completed_employees = []
-    not_completed_employees = []
-
-    for emp in employees:
-        emp_data = {
-            "employee_id": emp.employee_id,
-            "name": emp.name,
-            "email": emp.email,
-            "department": emp.department.name,
-            "phone": emp.phone_number,
-        }
-
-        completed_process = emp.disclaimer_processes.filter(status="completed").first()
-        if completed_process:
-            emp_data["completed_date"] = completed_process.completed_at.strftime(
-                "%Y-%m-%d %H:%M"
-            )
-            emp_data["total_steps"] = completed_process.total_steps
-            completed_employees.append(emp_data)
-        else:
-            active_process = emp.disclaimer_processes.filter(
-                status="in_progress"
-            ).first()
-            if active_process:
-                emp_data["status"] = (
-                    f"In Progress ({active_process.current_step}/{active_process.total_steps})"
-                )
-            else:
-                emp_data["status"] = "Not Started"
-            not_completed_employees.append(emp_data)
-
-    if format_type == "excel":
-        return generate_disclaimer_completion_excel(
-            completed_employees, not_completed_employees
-        )
-    else:
-        return generate_disclaimer_completion_pdf(
-            completed_employees, not_completed_employees
-        )
+    return report_response("disclaimer-completion", format_type)
 
 
 def generate_disclaimer_completion_pdf(completed, not_completed):
@@ -426,44 +427,10 @@ def generate_disclaimer_completion_excel(completed, not_completed):
 def assets_by_status_report(request):
     """
     Report showing assets grouped by status
-    Formats: PDF or Excel
+    Formats: PDF, Excel, CSV or Parquet
     """
     format_type = request.GET.get("format", "pdf").lower()
-
-    assets = Asset.objects.select_related("department", "current_holder__user").all()
-
-    # Group by status
-    assets_by_status = {
-        "available": [],
-        "assigned": [],
-        "maintenance": [],
-        "retired": [],
-    }
-
-    for asset in assets:
-        asset_data = {
-            "name": asset.name,
-            "serial_number": asset.serial_number,
-            "department": asset.department.name,
-            "purchase_date": asset.purchase_date.strftime("%Y-%m-%d")
-            if asset.purchase_date
-            else "N/A",
-            "purchase_cost": f"${asset.purchase_cost}"
-            if asset.purchase_cost
-            else "N/A",
-            "current_holder": asset.current_holder.name
-            if asset.current_holder
-            else "N/A",
-            "description": asset.description[:50] + "..."
-            if len(asset.description) > 50
-            else asset.description,
-        }
-        assets_by_status[asset.status].append(asset_data)
-
-    if format_type == "excel":
-        return generate_assets_status_excel(assets_by_status)
-    else:
-        return generate_assets_status_pdf(assets_by_status)
+    return report_response("assets-by-status", format_type)
 
 
 def generate_assets_status_pdf(assets_by_status):
@@ -644,42 +611,10 @@ def generate_assets_status_excel(assets_by_status):
 def employee_assets_report(request):
     """
     Report showing employees with current assets vs no assets
-    Formats: PDF or Excel
+    Formats: PDF, Excel, CSV or Parquet
     """
     format_type = request.GET.get("format", "pdf").lower()
-
-    employees = (
-        Employee.objects.select_related("user", "department")
-        .prefetch_related("current_assets")
-        .all()
-    )
-
-    with_assets = []
-    without_assets = []
-
-    for emp in employees:
-        emp_data = {
-            "employee_id": emp.employee_id,
-            "name": emp.name,
-            "email": emp.email,
-            "department": emp.department.name,
-            "phone": emp.phone_number,
-        }
-
-        current_assets = emp.current_assets.filter(status="assigned")
-        if current_assets.exists():
-            emp_data["asset_count"] = current_assets.count()
-            emp_data["assets"] = ", ".join(
-                [f"{a.name} ({a.serial_number})" for a in current_assets]
-            )
-            with_assets.append(emp_data)
-        else:
-            without_assets.append(emp_data)
-
-    if format_type == "excel":
-        return generate_employee_assets_excel(with_assets, without_assets)
-    else:
-        return generate_employee_assets_pdf(with_assets, without_assets)
+    return report_response("employee-assets", format_type)
 
 
 def generate_employee_assets_pdf(with_assets, without_assets):
@@ -921,45 +856,11 @@ def asset_transaction_history_report(request):
     Includes: issue/return transactions, face verification status
     """
     format_type = request.GET.get("format", "pdf").lower()
-    start_date = request.GET.get("start_date")
-    end_date = request.GET.get("end_date")
-
-    transactions = AssetTransaction.objects.select_related(
-        "asset", "employee__user", "employee__department", "processed_by"
-    ).all()
-
-    if start_date:
-        transactions = transactions.filter(transaction_date__gte=start_date)
-    if end_date:
-        transactions = transactions.filter(transaction_date__lte=end_date)
-
-    transactions = transactions.order_by("-transaction_date")
-
-    transaction_data = []
-    for txn in transactions:
-        transaction_data.append(
-            {
-                "date": txn.transaction_date.strftime("%Y-%m-%d %H:%M"),
-                "type": txn.transaction_type.title(),
-                "asset": f"{txn.asset.name} ({txn.asset.serial_number})",
-                "employee": txn.employee.name,
-                "employee_id": txn.employee.employee_id,
-                "department": txn.employee.department.name,
-                "processed_by": txn.processed_by.get_full_name()
-                if txn.processed_by
-                else "System",
-                "face_verified": "Yes" if txn.face_verification_success else "No",
-                "confidence": f"{txn.face_verification_confidence * 100:.1f}%"
-                if txn.face_verification_success
-                else "N/A",
-                "notes": txn.notes[:50] + "..." if len(txn.notes) > 50 else txn.notes,
-            }
-        )
-
-    if format_type == "excel":
-        return generate_transaction_history_excel(transaction_data)
-    else:
-        return generate_transaction_history_pdf(transaction_data)
+    params = {
+        "start_date": request.GET.get("start_date"),
+        "end_date": request.GET.get("end_date"),
+    }
+    return report_response("transaction-history", format_type, params)
 
 
 def generate_transaction_history_pdf(transactions):
@@ -1047,11 +948,11 @@ def generate_transaction_history_pdf(transactions):
 
 
 def generate_transaction_history_excel(transactions):
-    """Generate Excel for transaction history"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Transactions"
-
+    """
+    Generate Excel for transaction history, streamed: rows go straight from the
+    ``transactions`` iterable into a write-only workbook spooled to a temporary
+    file, so memory does not grow with the number of transactions
+    """
     headers = [
         "Date",
         "Type",
@@ -1064,34 +965,41 @@ def generate_transaction_history_excel(transactions):
         "Confidence",
         "Notes",
     ]
-    style_excel_header(ws, headers)
-
-    for row_num, txn in enumerate(transactions, 2):
-        ws.cell(row=row_num, column=1, value=txn["date"])
-        ws.cell(row=row_num, column=2, value=txn["type"])
-        ws.cell(row=row_num, column=3, value=txn["asset"])
-        ws.cell(row=row_num, column=4, value=txn["employee"])
-        ws.cell(row=row_num, column=5, value=txn["employee_id"])
-        ws.cell(row=row_num, column=6, value=txn["department"])
-        ws.cell(row=row_num, column=7, value=txn["processed_by"])
-        ws.cell(row=row_num, column=8, value=txn["face_verified"])
-        ws.cell(row=row_num, column=9, value=txn["confidence"])
-        ws.cell(row=row_num, column=10, value=txn["notes"])
-
-    auto_size_columns(ws)
-
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    keys = [
+        "date",
+        "type",
+        "asset",
+        "employee",
+        "employee_id",
+        "department",
+        "processed_by",
+        "face_verified",
+        "confidence",
+        "notes",
+    ]
 
-    response = HttpResponse(
-        buffer.read(),
+    rows = ([txn[key] for key in keys] for txn in transactions)
+    # Column widths have to be set before the first row is written
+    sample = list(islice(rows, EXCEL_WIDTH_SAMPLE_ROWS))
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Transactions")
+    for column, width in enumerate(sample_column_widths(headers, sample), 1):
+        ws.column_dimensions[get_column_letter(column)].width = width
+    ws.append(write_only_header_row(ws, headers))
+    for row in chain(sample, rows):
+        ws.append(row)
+
+    file = tempfile.TemporaryFile()
+    wb.save(file)
+    file.seek(0)
+
+    return FileResponse(
+        file,
+        as_attachment=True,
+        filename=f"transaction_history_{timezone.now().strftime('%Y%m%d')}.xlsx",
         content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
-    response["Content-Disposition"] = (
-        f'attachment; filename="transaction_history_{timezone.now().strftime("%Y%m%d")}.xlsx"'
-    )
-    return response
 
 
 @csrf_exempt
@@ -1102,42 +1010,7 @@ def department_summary_report(request):
     Shows: employees count, assets count, disclaimer completion rate
     """
     format_type = request.GET.get("format", "pdf").lower()
-
-    departments = Department.objects.prefetch_related(
-        "employees", "assets", "employees__disclaimer_processes"
-    ).all()
-
-    dept_data = []
-    for dept in departments:
-        total_employees = dept.employees.count()
-        completed_disclaimers = (
-            dept.employees.filter(disclaimer_processes__status="completed")
-            .distinct()
-            .count()
-        )
-
-        dept_data.append(
-            {
-                "name": dept.name,
-                "manager": dept.manager.get_full_name()
-                if dept.manager
-                else "No Manager",
-                "total_employees": total_employees,
-                "completed_disclaimers": completed_disclaimers,
-                "disclaimer_rate": f"{completed_disclaimers / total_employees * 100:.1f}%"
-                if total_employees > 0
-                else "0%",
-                "total_assets": dept.assets.count(),
-                "assigned_assets": dept.assets.filter(status="assigned").count(),
-                "available_assets": dept.assets.filter(status="available").count(),
-                "maintenance_assets": dept.assets.filter(status="maintenance").count(),
-            }
-        )
-
-    if format_type == "excel":
-        return generate_department_summary_excel(dept_data)
-    else:
-        return generate_department_summary_pdf(dept_data)
+    return report_response("department-summary", format_type)
 
 
 def generate_department_summary_pdf(dept_data):
@@ -1269,19 +1142,183 @@ def generate_department_summary_excel(dept_data):
     return response
 
 
+# ============ REPORT RENDERING ============
+
+# Report id -> (row data from the report params, PDF generator, Excel generator);
+# the data is a tuple of the generators' arguments
+REPORTS = {
+    "disclaimer-completion": (
+        lambda params: disclaimer_completion_data(),
+        generate_disclaimer_completion_pdf,
+        generate_disclaimer_completion_excel,
+    ),
+    "employee-assets": (
+        lambda params: employee_assets_data(),
+        generate_employee_assets_pdf,
+        generate_employee_assets_excel,
+    ),
+    "assets-by-status": (
+        lambda params: (assets_by_status_data(),),
+        generate_assets_status_pdf,
+        generate_assets_status_excel,
+    ),
+    "transaction-history": (
+        lambda params: (
+            transaction_history_rows(params.get("start_date"), params.get("end_date")),
+        ),
+        lambda transactions: generate_transaction_history_pdf(list(transactions)),
+        generate_transaction_history_excel,
+    ),
+    "department-summary": (
+        lambda params: (department_summary_data(),),
+        generate_department_summary_pdf,
+        generate_department_summary_excel,
+    ),
+}
+REPORT_FORMATS = ("pdf", "excel", "csv", "parquet")
+
+
+def available_report_formats():
+    """REPORT_FORMATS that can be generated here (Parquet needs the columnar extra)"""
+    return [
+        format_type
+        for format_type in REPORT_FORMATS
+        if format_type != "parquet" or parquet_available()
+    ]
+
+
+def render_report(report, format_type="pdf", params=None):
+    """
+    HttpResponse with report ``report`` (a REPORTS id) in ``format_type`` (one
+    of REPORT_FORMATS, PDF otherwise); used by the report views and the report
+    job worker. The data is built once and CSV/Parquet get it flattened by
+    data.REPORT_TABLES. Raises ReportFormatUnavailable for Parquet without pyarrow.
+    """
+    build_data, generate_pdf, generate_excel = REPORTS[report]
+    data = build_data(params or {})
+    if format_type in ("csv", "parquet"):
+        columns, flatten = REPORT_TABLES[report]
+        filename = f"{report.replace('-', '_')}_{timezone.now().strftime('%Y%m%d')}.{format_type}"
+        if format_type == "csv":
+            return csv_response(filename, columns, flatten(*data))
+        return parquet_response(filename, columns, flatten(*data))
+    if format_type == "excel":
+        return generate_excel(*data)
+    return generate_pdf(*data)
+
+
+def report_response(report, format_type="pdf", params=None):
+    """render_report for the report views"""
+    try:
+        return render_report(report, format_type, params)
+    except ReportFormatUnavailable as e:
+        return JsonResponse({"error": str(e)}, status=501)
+
+
+# ============ BACKGROUND REPORT JOBS ============
+
+
+def _report_jobs(user):
+    """Report jobs ``user`` may see: their own, or every job for staff"""
+    if user.is_superuser or user.is_staff:
+        return ReportJob.objects.all()
+    return ReportJob.objects.filter(requested_by=user)
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def report_jobs_view(request):
+    """
+    GET: The current user's recent report jobs
+    POST: Generate a report in the background ({"report", "format", and for
+    transaction-history optional "start_date"/"end_date"}). Returns the job
+    (202); identical requests share one queued/running job. Poll
+    jobs/{id}/ until status is completed, then fetch its download_url.
+    """
+    if request.method == "GET":
+        jobs = ReportJob.objects.filter(requested_by=request.user)[:50]
+        serializer = ReportJobSerializer(jobs, many=True, context={"request": request})
+        return Response(serializer.data)
+
+    report = request.data.get("report")
+    format_type = str(request.data.get("format", "pdf")).lower()
+    if report not in REPORTS:
+        return Response(
+            {"error": f"Unknown report. Choose one of: {', '.join(REPORTS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if format_type not in REPORT_FORMATS:
+        return Response(
+            {"error": f"Unknown format. Choose one of: {', '.join(REPORT_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if format_type == "parquet" and not parquet_available():
+        return Response(
+            {"error": "Parquet export requires pyarrow"},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    params = {}
+    if report == "transaction-history":
+        params = {
+            "start_date": request.data.get("start_date"),
+            "end_date": request.data.get("end_date"),
+        }
+
+    job, created = request_report_job(report, format_type, params, user=request.user)
+    serializer = ReportJobSerializer(job, context={"request": request})
+    return Response(
+        {**serializer.data, "deduplicated": not created},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def report_job_detail_view(request, pk):
+    """
+    GET: Status of a report job
+    """
+    job = get_object_or_404(_report_jobs(request.user), pk=pk)
+    serializer = ReportJobSerializer(job, context={"request": request})
+    return Response(serializer.data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def report_job_download_view(request, pk):
+    """
+    GET: The generated file of a completed report job
+    """
+    job = get_object_or_404(_report_jobs(request.user), pk=pk)
+    if job.status != "completed":
+        return Response(
+            {"error": f"Report is not ready (status: {job.status})"},
+            status=status.HTTP_409_CONFLICT,
+        )
+    try:
+        file = job.file.open("rb")
+    except (FileNotFoundError, ValueError):
+        return Response(
+            {"error": "Report file no longer exists"}, status=status.HTTP_404_NOT_FOUND
+        )
+    return FileResponse(file, as_attachment=True, filename=os.path.basename(job.file.name))
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def reports_list_view(request):
     """
     GET: List all available reports with descriptions
     """
+    formats = available_report_formats()
     reports = [
         {
             "id": "transaction-history",
             "name": "Asset Transaction History",
             "description": "Complete history of all asset transactions with face verification details",
             "endpoint": "/api/reports/transaction-history/",
-            "formats": ["pdf", "excel"],
+            "formats": formats,
             "parameters": ["start_date (optional)", "end_date (optional)"],
         },
         {
@@ -1289,28 +1326,28 @@ def reports_list_view(request):
             "name": "Disclaimer Completion Report",
             "description": "Shows which employees have completed disclaimer process vs those who haven't",
             "endpoint": "/api/reports/disclaimer-completion/",
-            "formats": ["pdf", "excel"],
+            "formats": formats,
         },
         {
             "id": "employee-assets",
             "name": "Employee Assets Report",
             "description": "Shows employees with current assigned assets vs those without any assets",
             "endpoint": "/api/reports/employee-assets/",
-            "formats": ["pdf", "excel"],
+            "formats": formats,
         },
         {
             "id": "assets-by-status",
             "name": "Assets by Status Report",
             "description": "Categorizes all assets by their status (available, assigned, maintenance, retired)",
             "endpoint": "/api/reports/assets-by-status/",
-            "formats": ["pdf", "excel"],
+            "formats": formats,
         },
         {
             "id": "department-summary",
             "name": "Department Summary Report",
             "description": "Comprehensive overview of each department including employees, assets, and disclaimer completion",
             "endpoint": "/api/reports/department-summary/",
-            "formats": ["pdf", "excel"],
+            "formats": formats,
         },
     ]
 
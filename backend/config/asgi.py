@@ -3,6 +3,9 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+HTTP is served by Django; the live-capture face verification WebSocket
+(apps.assets.face_stream) is routed here, other WebSocket paths are refused.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +16,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after the app registry is set up by get_asgi_application()
+from django.apps import apps  # noqa: E402
+
+from apps.assets.face_stream import FACE_STREAM_PATH, face_verification_stream  # noqa: E402
+
+apps.get_app_config('assets').start_face_recognition_warmup()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        if scope['path'].rstrip('/') == FACE_STREAM_PATH.rstrip('/'):
+            return await face_verification_stream(scope, receive, send)
+        await receive()  # websocket.connect
+        return await send({'type': 'websocket.close', 'code': 4404})
+    return await django_application(scope, receive, send)
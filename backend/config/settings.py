@@ -202,6 +202,21 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# In-process memory by default; with several worker processes point CACHE_URL
+# at a shared cache (e.g. redis://localhost:6379/1) so an invalidation in one
+# worker reaches the others
+
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://'),
+}
+
+# Dashboard payloads are cached until an asset, transaction, employee or
+# department changes, and at most this long (their last-24h/7-day windows move)
+DASHBOARD_CACHE_TIMEOUT = env.int('DASHBOARD_CACHE_TIMEOUT', default=300)  # seconds
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -259,6 +274,68 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Lower tolerance = stricter matching, fewer false positives
 FACE_RECOGNITION_TOLERANCE = env.float('FACE_RECOGNITION_TOLERANCE', default=0.4)  # CRITICAL: Reduced from 0.6 for security
 FACE_RECOGNITION_MODEL = env.str('FACE_RECOGNITION_MODEL', default='hog')  # 'hog' or 'cnn'
+# Landmark model used to align faces for the encoder: 'large' (68 points) or
+# 'small' (5 points). Changing it changes the embeddings - re-encode stored
+# templates with: manage.py reencode_face_embeddings
+FACE_ENCODER_LANDMARKS = env.str('FACE_ENCODER_LANDMARKS', default='large')
+# Channel order of the image given to the encoder. Templates have always been
+# encoded from BGR data; 'rgb' is what dlib's model was trained on but is a new
+# encoder, so stored templates need re-encoding when switching
+FACE_ENCODER_COLOR_ORDER = env.str('FACE_ENCODER_COLOR_ORDER', default='bgr')
+# Keep enrollment photos (MEDIA_ROOT/face_enrollments/) so templates can be
+# re-encoded for a new encoder without employees re-enrolling
+FACE_RETAIN_ENROLLMENT_IMAGES = env.bool('FACE_RETAIN_ENROLLMENT_IMAGES', default=True)
+# Load the dlib models and start the face worker pool (each worker process
+# loading its own copy) when a server process (config/wsgi.py, config/asgi.py,
+# runserver) starts instead of on the first verification; management commands
+# never warm up
+FACE_RECOGNITION_WARMUP = env.bool('FACE_RECOGNITION_WARMUP', default=False)
+# Faces are detected on a copy whose longest side is at most this many pixels,
+# then located on the full-resolution frame for encoding and quality checks
+# (0 detects on the full frame)
+FACE_DETECTION_MAX_DIMENSION = env.int('FACE_DETECTION_MAX_DIMENSION', default=640)
+
+# Decoded face encodings kept in memory per worker process (0 disables the cache)
+FACE_ENCODING_CACHE_SIZE = env.int('FACE_ENCODING_CACHE_SIZE', default=1024)
+# Face templates (enrollments) kept per employee; verification matches the closest
+FACE_MAX_TEMPLATES = env.int('FACE_MAX_TEMPLATES', default=5)
+# Max age of a worker's 1:N identification index before it is rebuilt from the
+# database (picks up registrations made through other worker processes)
+FACE_INDEX_REFRESH_SECONDS = env.int('FACE_INDEX_REFRESH_SECONDS', default=300)
+# 'exact' scores every registered face; 'ivf' only scores the FACE_INDEX_NPROBE
+# closest k-means buckets (train with: manage.py rebuild_face_index)
+FACE_INDEX_BACKEND = env.str('FACE_INDEX_BACKEND', default='exact')
+FACE_INDEX_NPROBE = env.int('FACE_INDEX_NPROBE', default=8)
+FACE_INDEX_PATH = env.str('FACE_INDEX_PATH', default=os.path.join(MEDIA_ROOT, 'face_index', 'ivf_centroids.npz'))
+# Face detection/encoding can run in a pool of worker processes per web worker
+# (0, the default, runs it inline on the request thread). Each worker process
+# holds its own copy of the dlib models, about 170 MB resident, so the total is
+# web workers x FACE_WORKER_PROCESSES x 170 MB on top of the web workers
+# themselves. Requests beyond FACE_WORKER_MAX_PENDING queued or running jobs
+# get a 503 instead of waiting.
+FACE_WORKER_PROCESSES = env.int('FACE_WORKER_PROCESSES', default=0)
+FACE_WORKER_MAX_PENDING = env.int('FACE_WORKER_MAX_PENDING', default=8)
+FACE_WORKER_TIMEOUT = env.float('FACE_WORKER_TIMEOUT', default=10.0)  # seconds
+# Employees the admin "Register faces from a zip of photos" action takes at once;
+# it encodes within the request, so bigger batches use manage.py register_faces
+FACE_ADMIN_REGISTRATION_LIMIT = env.int('FACE_ADMIN_REGISTRATION_LIMIT', default=50)
+# Live-capture verification socket (ws/face-verify/, served by config/asgi.py):
+# frames verified per connection, connection lifetime and largest frame accepted
+FACE_STREAM_MAX_FRAMES = env.int('FACE_STREAM_MAX_FRAMES', default=30)
+FACE_STREAM_TIMEOUT = env.int('FACE_STREAM_TIMEOUT', default=30)  # seconds
+FACE_STREAM_MAX_FRAME_BYTES = env.int('FACE_STREAM_MAX_FRAME_BYTES', default=5 * 1024 * 1024)
+# How long a verification token from the stream can be used to issue/return.
+# Tokens are single use, tracked in the cache (CACHE_URL must be shared when
+# the stream and the API run in different processes)
+FACE_VERIFICATION_TOKEN_MAX_AGE = env.int('FACE_VERIFICATION_TOKEN_MAX_AGE', default=120)  # seconds
+
+# Background report jobs (api/reports/jobs/), generated into MEDIA_ROOT/reports/:
+# threads per web process running them (0 leaves them to manage.py
+# process_report_jobs), how long a job may run before it counts as abandoned,
+# and how long finished jobs and their files are kept (purged by process_report_jobs)
+REPORT_JOB_WORKERS = env.int('REPORT_JOB_WORKERS', default=2)
+REPORT_JOB_TIMEOUT = env.int('REPORT_JOB_TIMEOUT', default=900)  # seconds
+REPORT_JOB_RETENTION_HOURS = env.int('REPORT_JOB_RETENTION_HOURS', default=24)
 
 # Quality Validation Thresholds - SECURITY CRITICAL
 # These ensure FULL FACE is captured - NO PARTIAL FACES ALLOWED
@@ -273,6 +350,11 @@ FACE_QUALITY_THRESHOLDS = {
     'min_center_offset': env.float('FACE_MIN_CENTER_OFFSET', default=0.30),  # Face must be reasonably centered
     'min_face_aspect_ratio': env.float('FACE_MIN_ASPECT_RATIO', default=0.75),  # CRITICAL: Face width/height ratio (prevents horizontal slices)
     'max_face_aspect_ratio': env.float('FACE_MAX_ASPECT_RATIO', default=1.35),  # CRITICAL: Face width/height ratio (prevents vertical slices)
+    # Whole-frame pre-check before face detection (320px grayscale copy) - only
+    # meant to catch obviously unusable frames, the face checks above still apply
+    'precheck_min_sharpness': env.float('FACE_PRECHECK_MIN_SHARPNESS', default=8.0),  # Laplacian variance
+    'precheck_min_brightness': env.float('FACE_PRECHECK_MIN_BRIGHTNESS', default=40.0),
+    'precheck_max_brightness': env.float('FACE_PRECHECK_MAX_BRIGHTNESS', default=235.0),
 }
 
 # Logging